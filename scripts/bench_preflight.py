@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark and regression check for server/preflight_engine.py.
+
+Builds deterministic synthetic page corpora (clean text, heavy mojibake,
+control chars, Latin-extended clusters, a realistic mix) at several sizes,
+times compute_text_metrics, extract_corruption_samples and run_preflight on
+each, and reports chars/sec (best of --repeat timed samples; small cases are
+looped so each sample lasts at least 50ms). Corruption samples are
+collected uncapped so the whole corpus is scanned.
+
+Throughput is compared to tests/preflight_bench/baseline.json. Baseline
+numbers are scaled by a fixed pure-Python reference loop timed on both
+machines, so a baseline recorded on one box stays usable on another. A
+function fails when the geometric mean of its cases' scaled throughput drops
+more than --tolerance below baseline.
+
+Run:
+    python scripts/bench_preflight.py                    # check against baseline
+    python scripts/bench_preflight.py --update-baseline  # re-record baseline
+    python scripts/bench_preflight.py --quick            # small sizes only, 1 repeat
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.preflight_engine import (
+    compute_text_metrics, extract_corruption_samples, run_preflight,
+)
+
+BASELINE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "tests", "preflight_bench", "baseline.json",
+)
+DEFAULT_TOLERANCE = 0.25
+SEED = 1729
+
+_WORDS = (
+    "agreement party term license territory royalty payment schedule effective "
+    "date renewal notice obligation warranty indemnity the of and to in for "
+    "shall be by with under this such any all"
+).split()
+
+# Corruption injected per corpus, as (generator, share of tokens)
+_MOJIBAKE = ["\u00c3\u00a9", "\u00e2\u0080\u0099", "\u00c2\u00a0", "\u00ef\u00bf\u00bd", "\ufffd"]
+_CONTROL = [chr(c) for c in (1, 2, 3, 7, 11, 12, 27)]
+_LATIN_EXT = "\u0100\u0101\u0107\u0111\u0141\u0150\u0161\u017e\u01a1\u0219\u0301\u0308"
+
+CORPORA = {
+    "clean": {},
+    "mojibake": {"mojibake": 0.15},
+    "control": {"control": 0.05},
+    "latin_ext": {"latin_ext": 0.10},
+    "mixed": {"mojibake": 0.01, "control": 0.002, "latin_ext": 0.005},
+}
+
+# (label, pages, chars per page)
+SIZES = [
+    ("small", 10, 2000),
+    ("medium", 50, 4000),
+    ("large", 200, 4000),
+]
+QUICK_SIZES = SIZES[:1]
+
+
+def _token(rng, corruption):
+    roll = rng.random()
+    for kind, share in corruption.items():
+        if roll < share:
+            if kind == "mojibake":
+                return rng.choice(_WORDS) + rng.choice(_MOJIBAKE)
+            if kind == "control":
+                return rng.choice(_CONTROL)
+            if kind == "latin_ext":
+                return "".join(rng.choice(_LATIN_EXT) for _ in range(rng.randint(3, 6)))
+        roll -= share
+    return rng.choice(_WORDS)
+
+
+def build_pages(corpus, pages, chars_per_page):
+    """Deterministic page texts for one corpus and size."""
+    rng = random.Random("%s:%d:%d:%d" % (corpus, pages, chars_per_page, SEED))
+    corruption = CORPORA[corpus]
+    texts = []
+    for _ in range(pages):
+        parts, length = [], 0
+        while length < chars_per_page:
+            tok = _token(rng, corruption)
+            parts.append(tok)
+            length += len(tok) + 1
+        texts.append(" ".join(parts)[:chars_per_page])
+    return texts
+
+
+def _best_of(fn, repeat, min_time=0.05):
+    """Best per-call seconds over `repeat` samples of at least min_time each."""
+    calls = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        calls *= 2
+    best = elapsed / calls
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        best = min(best, (time.perf_counter() - start) / calls)
+    return best
+
+
+def reference_speed(repeat=3):
+    """Ops/sec of a fixed pure-Python loop; normalizes baselines across machines."""
+    def loop():
+        total = 0
+        for i in range(100000):
+            total += i % 7
+        return total
+    return 100000 / _best_of(loop, repeat)
+
+
+def run_benchmarks(sizes, repeat):
+    results = {}
+    for corpus in CORPORA:
+        for label, pages, chars_per_page in sizes:
+            texts = build_pages(corpus, pages, chars_per_page)
+            pages_data = [
+                {"page": i + 1, "text": t, "image_coverage_ratio": 0.1}
+                for i, t in enumerate(texts)
+            ]
+            total_chars = sum(len(t) for t in texts)
+            cases = {
+                "compute_text_metrics": lambda: compute_text_metrics(texts),
+                # Uncapped so every match is visited; the default cap of 20
+                # stops corrupted corpora after a few hundred chars.
+                "extract_corruption_samples": lambda: extract_corruption_samples(texts, max_samples=sys.maxsize),
+                "run_preflight": lambda: run_preflight(pages_data),
+            }
+            for fn_name, fn in cases.items():
+                elapsed = _best_of(fn, repeat)
+                key = "%s/%s/%s" % (fn_name, corpus, label)
+                results[key] = {
+                    "chars": total_chars,
+                    "seconds": round(elapsed, 6),
+                    "chars_per_sec": round(total_chars / elapsed, 1) if elapsed > 0 else None,
+                }
+                print("  %-55s %10.0f chars/s  (%d chars, %.4fs)" % (
+                    key, results[key]["chars_per_sec"] or 0, total_chars, elapsed))
+    return results
+
+
+def compare(results, baseline, speed_ratio, tolerance):
+    """Return the functions whose throughput regressed.
+
+    Each function is judged on the geometric mean of its per-case ratios to
+    the scaled baseline, which absorbs per-case timing noise; individual
+    cases past the tolerance are reported as warnings.
+    """
+    ratios = {}
+    print("\n=== Regression Check (tolerance %.0f%%, machine speed ratio %.2f) ===" % (tolerance * 100, speed_ratio))
+    for key, cur in sorted(results.items()):
+        base = baseline.get("results", {}).get(key)
+        if not base or not base.get("chars_per_sec") or not cur["chars_per_sec"]:
+            print("  SKIP: %s (no baseline)" % key)
+            continue
+        ratio = cur["chars_per_sec"] / (base["chars_per_sec"] * speed_ratio)
+        ratios.setdefault(key.split("/")[0], []).append(ratio)
+        if ratio - 1 < -tolerance:
+            print("  WARN: %s %+.1f%%" % (key, (ratio - 1) * 100))
+
+    regressions = []
+    for fn_name, fn_ratios in sorted(ratios.items()):
+        mean = math.exp(sum(math.log(r) for r in fn_ratios) / len(fn_ratios))
+        if mean - 1 < -tolerance:
+            regressions.append(fn_name)
+            print("  FAIL: %s %+.1f%% over %d cases" % (fn_name, (mean - 1) * 100, len(fn_ratios)))
+        else:
+            print("  PASS: %s %+.1f%% over %d cases" % (fn_name, (mean - 1) * 100, len(fn_ratios)))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Preflight engine throughput benchmark")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per case; best is kept")
+    parser.add_argument("--quick", action="store_true", help="small corpora only, one run per case")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed fractional throughput drop (default 0.25)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true", help="record this run as the baseline")
+    parser.add_argument("--json", dest="json_path", help="write this run's results to a file")
+    args = parser.parse_args()
+
+    sizes = QUICK_SIZES if args.quick else SIZES
+    repeat = 1 if args.quick else max(1, args.repeat)
+
+    ref = reference_speed(repeat)
+    print("=== Preflight Engine Benchmark ===")
+    print("python %s on %s, reference loop %.0f ops/s" % (platform.python_version(), platform.machine(), ref))
+    results = run_benchmarks(sizes, repeat)
+    # Re-time the reference after the run and keep the faster reading
+    ref = max(ref, reference_speed(repeat))
+    run = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "reference_ops_per_sec": round(ref, 1),
+        "results": results,
+    }
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(run, f, indent=2, sort_keys=True)
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(run, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print("\nBaseline written to %s" % args.baseline)
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("\nNo baseline at %s; run with --update-baseline" % args.baseline)
+        return 1
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    speed_ratio = ref / baseline["reference_ops_per_sec"] if baseline.get("reference_ops_per_sec") else 1.0
+    regressions = compare(results, baseline, speed_ratio, args.tolerance)
+
+    print("\n=== Results ===")
+    if regressions:
+        print("THROUGHPUT REGRESSED: %s" % ", ".join(regressions))
+        return 1
+    print("NO REGRESSIONS")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
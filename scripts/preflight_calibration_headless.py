@@ -0,0 +1,552 @@
+#!/usr/bin/env python3
+"""Headless pre-flight calibration runner (no browser).
+
+Evaluates the fixtures in fixtures_manifest.json with a Python port of the
+viewer's pre-flight detection instead of driving ui/viewer/index.html through
+Playwright:
+
+  - unknown columns: detectUnknownColumns() + normalizeColumnName() against
+    the glossary key set (field_meta.json + column_aliases.json)
+  - routing: ContractIndex._routeUnknownColumns() thresholds (warn >0,
+    blocker >3 non-empty values) and majority-vote contract attachment;
+    only contract-attached columns reach the triage queue
+  - meta/reference sheet exclusion (META_SHEET_PATTERNS,
+    REFERENCE_SHEET_PATTERNS)
+  - blocker type registration, read from the viewer source as the browser
+    runner does
+  - the PDF batch scan (_p1fScanContract: _p1eDetectNonSearchable, then
+    _p1eDetectMojibake on the joined page text), which routes
+    TEXT_NOT_SEARCHABLE / OCR_UNREADABLE / OCR_MOJIBAKE blockers for every
+    contract with a file_url
+  - per-type counts (ocr_unreadable, low_confidence, mojibake,
+    document_type) taken from the routed items exactly as the browser hook
+    counts them
+
+The PDF text comes from the fixture's "preflight_pages" (preflight_engine
+page dicts: page, text, image_coverage_ratio), which stand in for the
+contract PDF's /api/pdf/text pages. They are also run through
+server.preflight_engine.run_preflight and checked against "gate_color" /
+"doc_mode" expectations. The viewer raises LOW_CONFIDENCE only from
+contract rollup extraction signals and never routes DOCUMENT_TYPE_MISSING
+items from sheet data, so fixtures cannot drive those counts here either.
+A fixture with inputs this port does not read, or that expects signals
+without the pages to derive them from, stops the run with an error rather
+than being scored against zeros.
+
+Fixtures are evaluated in parallel on a process pool. Results are checked
+with the same evaluate_fixture()/report_results() as
+preflight_calibration_runner.py.
+
+With --sweep, the fixtures that carry preflight_pages and a "gate_color"
+expectation are replayed through server.preflight_batch.sweep_thresholds()
+instead: each --grid NAME=V1,V2,... names a preflight_batch.Thresholds field
+and its candidate values, and every combination is reported with the number
+of fixtures whose gate matches the expectation. Without --grid the sweep
+scores the locked engine thresholds only.
+
+Usage:
+    python3 scripts/preflight_calibration_headless.py [--workers N] [--json PATH]
+    python3 scripts/preflight_calibration_headless.py --sweep [--grid NAME=V1,V2,...]... [--json PATH]
+
+Console prefix: [PREFLIGHT-CAL][RUN], [PREFLIGHT-CAL][RESULT], [PREFLIGHT-CAL][SWEEP]
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, SCRIPT_DIR)
+
+from preflight_calibration_runner import FIXTURE_IDS, MANIFEST, report_results
+
+VIEWER_PATH = os.path.join(REPO_ROOT, "ui", "viewer", "index.html")
+FIELD_META_PATH = os.path.join(REPO_ROOT, "rules", "rules_bundle", "field_meta.json")
+COLUMN_ALIASES_PATH = os.path.join(REPO_ROOT, "rules", "rules_bundle", "column_aliases.json")
+
+META_SHEET_PATTERNS = ["_change_log", "RFIs & Analyst Notes", "_meta", "_audit"]
+REFERENCE_SHEET_PATTERNS = [
+    "glossary", "field_dictionary", "field dictionary",
+    "opportunity_field_catalog", "opportunity field catalog",
+    "qa_flags", "hinge", "mapping", "dictionary", "catalog_meta",
+    "field_catalog", "field catalog", "reference", "lookup",
+    "fields definitions", "fields definit", "field definitions",
+]
+BASE_KNOWN_KEYS = [
+    "contract_key", "file_name", "file_url", "status", "sheet", "record_id",
+    "dataset_id", "group_id", "document_type", "artists", "amountbreakdown",
+    "amount_breakdown", "addons", "add_ons", "totalamount", "thresholdnumberofdays",
+]
+SHEET_EQUIV_MAP = {
+    "opportunity": "opportunities",
+    "opportunities": "opportunities",
+    "add_ons": "add_ons",
+    "v2_add_ons": "add_ons",
+    "schedule_catalog": "schedule_catalog",
+    "accounts": "accounts",
+    "catalog": "catalog",
+    "contacts": "contacts",
+    "financials": "financials",
+    "schedule": "schedule",
+}
+
+# Fixture keys this port reads; anything else would be silently ignored
+FIXTURE_KEYS = {"id", "description", "sheets", "expected", "preflight_pages"}
+# Expectations that need PDF text ("preflight_pages") to be derived
+PDF_EXPECTATIONS = {"mojibake_detected", "gate_color", "doc_mode"}
+
+UNKNOWN_WARN_THRESHOLD = 0
+UNKNOWN_BLOCKER_THRESHOLD = 3
+UNKNOWN_SAMPLE_ROWS = 20
+
+HEADER_LIKE_RE = re.compile(
+    r"^(file_name_c|file_name|file_url|file_url_c|contract_key|sheet|status|record_id|dataset_id|group_id|document_type|capabilities)$",
+    re.IGNORECASE,
+)
+
+
+def _norm(s):
+    return re.sub(r"^_+|_+$", "", re.sub(r"[^a-z0-9]+", "_", str(s).lower()))
+
+
+def _norm_token(s):
+    return re.sub(r"_{1,2}[cr]$", "", _norm(s))
+
+
+def _norm_sheet_name(s):
+    n = re.sub(r"^v\d+_", "", _norm(s))
+    if len(n) > 1 and n.endswith("s"):
+        singular = re.sub(r"s$", "", re.sub(r"ses$", "se", re.sub(r"ies$", "y", n)))
+        if singular in SHEET_EQUIV_MAP:
+            return SHEET_EQUIV_MAP[singular]
+    return SHEET_EQUIV_MAP.get(n, n)
+
+
+def is_meta_sheet(name):
+    return bool(name) and any(p in name for p in META_SHEET_PATTERNS)
+
+
+def is_reference_sheet(name):
+    return bool(name) and any(p.lower() in name.lower() for p in REFERENCE_SHEET_PATTERNS)
+
+
+def load_alias_map(path=COLUMN_ALIASES_PATH):
+    """Port of loadColumnAliases(): normalized alias -> [{canonical_key, sheet}]."""
+    with open(path) as f:
+        data = json.load(f)
+    alias_map = {}
+    for entry in data.get("aliases", []):
+        for alias in entry.get("aliases", []):
+            norm = _norm(alias)
+            if not norm:
+                continue
+            entries = alias_map.setdefault(norm, [])
+            target = {"canonical_key": entry["canonical_key"], "sheet": entry.get("sheet", "")}
+            if target not in entries:
+                entries.append(target)
+    return alias_map
+
+
+def build_known_keys(alias_map, field_meta_path=FIELD_META_PATH):
+    """Port of _buildGlossaryKeySet()."""
+    known = set(BASE_KNOWN_KEYS)
+    with open(field_meta_path) as f:
+        fields = json.load(f).get("fields", [])
+    for field in fields:
+        for attr in ("canonical_key", "label", "key", "field_key", "field_label"):
+            if field.get(attr):
+                known.add(_norm(field[attr]))
+                known.add(_norm_token(field[attr]))
+    for alias, entries in alias_map.items():
+        known.add(alias)
+        known.add(_norm_token(alias))
+        for entry in entries:
+            known.add(_norm(entry["canonical_key"]))
+            known.add(_norm_token(entry["canonical_key"]))
+    return known
+
+
+def normalize_column_name(name, sheet_hint, alias_map):
+    normalized = _norm(name)
+    entries = alias_map.get(normalized) or alias_map.get(_norm_token(name))
+    if entries:
+        if sheet_hint:
+            for entry in entries:
+                if entry["sheet"] == sheet_hint:
+                    return entry["canonical_key"]
+            for entry in entries:
+                if _norm_sheet_name(entry["sheet"]) == _norm_sheet_name(sheet_hint):
+                    return entry["canonical_key"]
+        return entries[0]["canonical_key"]
+    return normalized
+
+
+def detect_unknown_columns(sheets, known, alias_map):
+    """Port of detectUnknownColumns(): {sheet: [column info]} for data sheets."""
+    stored = {}
+    for sheet_name, sheet in sheets.items():
+        if is_reference_sheet(sheet_name) or is_meta_sheet(sheet_name):
+            continue
+        if not sheet or not sheet.get("headers"):
+            continue
+        rows = sheet.get("rows") or []
+        unknown = []
+        seen = set()
+        for header in sheet["headers"]:
+            if not header or header.startswith("_"):
+                continue
+            norm = _norm(header)
+            if not norm or norm in seen:
+                continue
+            resolved = normalize_column_name(header, sheet_name, alias_map)
+            if {norm, resolved, _norm_token(header), _norm_token(resolved)} & known:
+                continue
+            seen.add(norm)
+            non_empty = sum(
+                1 for row in rows[:UNKNOWN_SAMPLE_ROWS]
+                if row and row.get(header) not in (None, "")
+            )
+            unknown.append({"original_name": header, "normalized_name": norm, "count_nonempty": non_empty})
+        if unknown:
+            stored[sheet_name] = unknown
+    return stored
+
+
+def _sanitize_url(url):
+    url = re.sub(r"^[/\s]+", "", url).strip()
+    dbl = url.find("//")
+    if dbl > 8:
+        before = url[:dbl].strip()
+        if before.startswith("http") or "/" in before:
+            return before
+    return url
+
+
+def _sanitize_annotation(val):
+    dbl = val.find("//")
+    if dbl > 0 and val[dbl - 1] != ":":
+        return val[:dbl].strip()
+    return val
+
+
+def _is_header_like(val):
+    v = (val or "").strip()
+    return len(v) < 2 or bool(HEADER_LIKE_RE.match(v))
+
+
+def derive_contract_id(row):
+    """Port of ContractIndex.deriveContractId(), keyed by the canonical string instead of its hash."""
+    file_url = _sanitize_url(str(row.get("file_url") or row.get("File_URL_c") or "").strip())
+    file_name = _sanitize_annotation(str(row.get("file_name") or row.get("contract_key") or "").strip())
+    if file_url and not _is_header_like(file_url):
+        canon = file_url.rstrip("/").split("?")[0].split("#")[0].lower()
+        file_id = canon.split("/")[-1]
+        if file_id and not _is_header_like(file_id):
+            return "ctr:" + file_id
+        return "ctr:" + canon
+    if file_name and not _is_header_like(file_name):
+        return "ctr:" + file_name
+    return None
+
+
+def _attach_contract(rows):
+    """Majority-vote contract attachment from _routeUnknownColumns()."""
+    votes = {}
+    for row in rows:
+        cid = derive_contract_id(row)
+        if cid:
+            votes[cid] = votes.get(cid, 0) + 1
+    if not votes:
+        return None
+    ranked = sorted(votes, key=lambda c: -votes[c])
+    total = sum(votes.values())
+    top_share = votes[ranked[0]] / total
+    second = votes[ranked[1]] if len(ranked) > 1 else 0
+    if top_share >= 0.6 or (second > 0 and votes[ranked[0]] >= 2 * second):
+        return ranked[0]
+    return None
+
+
+def route_unknown_columns(sheets, unknown):
+    """Triage items for unknown columns that attach to a contract."""
+    items = []
+    seen = set()
+    for sheet_name, cols in unknown.items():
+        for col in cols:
+            if col["count_nonempty"] <= UNKNOWN_WARN_THRESHOLD:
+                continue
+            contract_id = _attach_contract(sheets[sheet_name].get("rows") or [])
+            if contract_id is None:
+                continue
+            key = (contract_id, sheet_name, col["normalized_name"])
+            if key in seen:
+                continue
+            seen.add(key)
+            items.append({
+                "blocker_type": "UNKNOWN_COLUMN",
+                "field_name": col["original_name"],
+                "sheet_name": sheet_name,
+                "severity": "blocker" if col["count_nonempty"] > UNKNOWN_BLOCKER_THRESHOLD else "warning",
+                "record_id": contract_id,
+            })
+    return items
+
+
+def detect_mojibake(text):
+    """Port of _p1eDetectMojibake(): impact "high" / "medium" / "low", or None for clean text."""
+    total = len(text)
+    if total < 5:
+        return None
+    replacement = control = high_non_latin = 0
+    for ch in text:
+        code = ord(ch)
+        if code == 0xFFFD:
+            replacement += 1
+        elif code < 32 and code not in (9, 10, 13):
+            control += 1
+        elif 0x00FF < code < 0x3000:
+            high_non_latin += 1
+    replacement_ratio = replacement / total
+    control_ratio = control / total
+    high_ratio = high_non_latin / total
+    if replacement_ratio > 0.15 or control_ratio > 0.08 or (high_ratio > 0.4 and total > 20):
+        return "high"
+    if replacement_ratio > 0.05 or control_ratio > 0.03:
+        return "medium"
+    if replacement_ratio > 0.01 or control_ratio > 0.005:
+        return "low"
+    return None
+
+
+def scan_pdf_pages(pages):
+    """Port of the _p1fScanContract() classification: blocker type, or None (clean or no pages)."""
+    if not pages:
+        return None
+    empty = sum(1 for p in pages if not (p.get("text") or "").strip())
+    if empty / len(pages) > 0.8:
+        return "TEXT_NOT_SEARCHABLE"
+    impact = detect_mojibake(" ".join(p.get("text") or "" for p in pages))
+    if impact is None:
+        return None
+    return "OCR_UNREADABLE" if impact == "high" else "OCR_MOJIBAKE"
+
+
+def route_pdf_scan(sheets, pages):
+    """Port of _p1fRouteToPreFlight(): one file_url item per scanned contract and sheet."""
+    blocker_type = scan_pdf_pages(pages)
+    if blocker_type is None:
+        return []
+    contracts = {}
+    for sheet_name, sheet in sheets.items():
+        if is_meta_sheet(sheet_name) or is_reference_sheet(sheet_name):
+            continue
+        for row in (sheet or {}).get("rows") or []:
+            contract_id = derive_contract_id(row)
+            if contract_id and str(row.get("file_url") or "").strip():
+                sheet_names = contracts.setdefault(contract_id, [])
+                if sheet_name not in sheet_names:
+                    sheet_names.append(sheet_name)
+    return [
+        {
+            "blocker_type": blocker_type,
+            "field_name": "file_url",
+            "sheet_name": sheet_name,
+            "severity": "blocker" if blocker_type == "OCR_UNREADABLE" else "warning",
+            "record_id": contract_id,
+        }
+        for contract_id, sheet_names in contracts.items()
+        for sheet_name in sheet_names
+    ]
+
+
+def check_fixture_inputs(fixture_id, fixture):
+    """Refuse fixtures this port cannot evaluate faithfully."""
+    unread = set(fixture) - FIXTURE_KEYS
+    if unread:
+        raise ValueError("%s: fixture keys not supported by the headless runner: %s"
+                         % (fixture_id, ", ".join(sorted(unread))))
+    needs_pages = PDF_EXPECTATIONS & set(fixture.get("expected") or {})
+    if needs_pages and not fixture.get("preflight_pages"):
+        raise ValueError("%s: expects %s but has no preflight_pages to derive them from"
+                         % (fixture_id, ", ".join(sorted(needs_pages))))
+
+
+def viewer_registrations(viewer_path=VIEWER_PATH):
+    """Blocker type registration, read from the viewer source like the browser runner."""
+    with open(viewer_path, encoding="utf-8") as f:
+        src = f.read()
+    document_type_registered = "DOCUMENT_TYPE_MISSING" in src and (
+        "label: 'Document Type'" in src or "label: 'Document Type Missing'" in src
+    )
+    if "MOJIBAKE: { label: 'OCR / Encoding'" in src:
+        mojibake_label = "OCR / Encoding"
+    elif "MOJIBAKE:" in src:
+        mojibake_label = "FOUND_OTHER"
+    else:
+        mojibake_label = "NOT_FOUND"
+    return {"document_type_registered": document_type_registered, "mojibake_label": mojibake_label}
+
+
+def run_fixture(fixture_id, fixture, known, alias_map, registrations):
+    """Evaluate one fixture. Returns the same result shape the browser hook produces."""
+    sheets = fixture.get("sheets") or {}
+    unknown = detect_unknown_columns(sheets, known, alias_map)
+    items = route_unknown_columns(sheets, unknown) + route_pdf_scan(sheets, fixture.get("preflight_pages"))
+    types = [i["blocker_type"] for i in items]
+
+    result = {
+        "fixture_id": fixture_id,
+        "manual_items_count": len(items),
+        "preflight_items": [
+            {"type": i["blocker_type"], "field": i["field_name"], "severity": i["severity"], "record_id": i["record_id"]}
+            for i in items
+        ],
+        "unknown_columns": types.count("UNKNOWN_COLUMN"),
+        "ocr_unreadable": types.count("OCR_UNREADABLE"),
+        "low_confidence": types.count("LOW_CONFIDENCE"),
+        "mojibake": types.count("MOJIBAKE") + types.count("MOJIBAKE_DETECTED"),
+        "document_type": types.count("DOCUMENT_TYPE_MISSING"),
+        "meta_in_triage": sum(1 for i in items if is_meta_sheet(i["sheet_name"])),
+        "ref_in_triage": sum(1 for i in items if is_reference_sheet(i["sheet_name"])),
+        "blocker_severities": [i["severity"] for i in items],
+        "sheets_loaded": list(sheets),
+    }
+    result.update(registrations)
+
+    if fixture.get("preflight_pages"):
+        from server.preflight_engine import run_preflight
+        engine = run_preflight(fixture["preflight_pages"])
+        result["gate_color"] = engine["gate_color"]
+        result["doc_mode"] = engine["doc_mode"]
+        result["gate_reasons"] = engine["gate_reasons"]
+
+    print(f"[PREFLIGHT-CAL][RESULT] {fixture_id}: items={result['manual_items_count']}, "
+          f"unk={result['unknown_columns']}, ocr={result['ocr_unreadable']}, mojibake={result['mojibake']}, "
+          f"doctype={result['document_type']}, meta_leak={result['meta_in_triage']}, ref_leak={result['ref_in_triage']}")
+    return result
+
+
+def _grid_value(text):
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def parse_grid(specs):
+    """--grid NAME=V1,V2,... options -> {name: [values]} for sweep_thresholds()."""
+    grid = {}
+    for spec in specs:
+        name, sep, values = spec.partition("=")
+        if not sep or not values.strip():
+            raise ValueError("--grid expects NAME=V1,V2,...: %r" % spec)
+        try:
+            grid[name.strip()] = [_grid_value(v.strip()) for v in values.split(",")]
+        except ValueError:
+            raise ValueError("--grid values must be numbers: %r" % spec)
+    return grid
+
+
+def sweep_fixtures(grid, fixture_ids=FIXTURE_IDS):
+    """Replay the gate-expectation fixtures through sweep_thresholds().
+
+    Returns (fixture ids in the corpus, sweep rows).
+    """
+    from server.preflight_engine import run_preflight
+    from server.preflight_batch import corpus_from_results, sweep_thresholds
+
+    swept, results, expected = [], [], []
+    for fid in fixture_ids:
+        fixture = MANIFEST["fixtures"][fid]
+        gate = (fixture.get("expected") or {}).get("gate_color")
+        if not fixture.get("preflight_pages") or gate is None:
+            continue
+        check_fixture_inputs(fid, fixture)
+        swept.append(fid)
+        results.append(run_preflight(fixture["preflight_pages"]))
+        expected.append(gate)
+    if not swept:
+        raise ValueError("no fixtures with preflight_pages and a gate_color expectation to sweep")
+    return swept, sweep_thresholds(corpus_from_results(results), grid, expected_gates=expected)
+
+
+def run_sweep(args):
+    grid = parse_grid(args.grid)
+    print("=" * 70)
+    print("[PREFLIGHT-CAL][SWEEP] ===== THRESHOLD SWEEP START =====")
+    swept, rows = sweep_fixtures(grid)
+    print(f"[PREFLIGHT-CAL][SWEEP] Fixtures: {', '.join(swept)}")
+    for row in rows:
+        overrides = ", ".join(f"{k}={v}" for k, v in row["thresholds"].items()) or "locked thresholds"
+        counts = row["gate_counts"]
+        print(f"[PREFLIGHT-CAL][SWEEP] {overrides}: matched={row['matched']}/{len(swept)}, "
+              f"GREEN={counts['GREEN']}, YELLOW={counts['YELLOW']}, RED={counts['RED']}")
+    best = max(row["matched"] for row in rows)
+    print(f"[PREFLIGHT-CAL][SWEEP] {sum(1 for row in rows if row['matched'] == best)}/{len(rows)} "
+          f"combinations match {best}/{len(swept)} fixtures")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"fixtures": swept, "rows": rows}, f, indent=2)
+    return best == len(swept)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless pre-flight calibration runner")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1),
+                        help="worker processes (0 runs fixtures inline)")
+    parser.add_argument("--json", dest="json_path", help="write observed results to this file")
+    parser.add_argument("--sweep", action="store_true",
+                        help="replay gate-expectation fixtures over a threshold grid")
+    parser.add_argument("--grid", action="append", default=[], metavar="NAME=V1,V2,...",
+                        help="threshold candidates for --sweep (repeatable)")
+    args = parser.parse_args()
+    if args.grid and not args.sweep:
+        parser.error("--grid requires --sweep")
+    if args.sweep:
+        return "GREEN" if run_sweep(args) else "RED"
+
+    started = time.monotonic()
+    print("=" * 70)
+    print("[PREFLIGHT-CAL][RUN] ===== HEADLESS CALIBRATION SUITE START =====")
+    print(f"[PREFLIGHT-CAL][RUN] Fixtures: {len(FIXTURE_IDS)}, workers: {args.workers}")
+
+    alias_map = load_alias_map()
+    known = build_known_keys(alias_map)
+    registrations = viewer_registrations()
+    fixtures = [MANIFEST["fixtures"][fid] for fid in FIXTURE_IDS]
+    for fid, fixture in zip(FIXTURE_IDS, fixtures):
+        check_fixture_inputs(fid, fixture)
+    shared = ([known] * len(fixtures), [alias_map] * len(fixtures), [registrations] * len(fixtures))
+
+    if args.workers > 0:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            observed = list(pool.map(run_fixture, FIXTURE_IDS, fixtures, *shared))
+    else:
+        observed = list(map(run_fixture, FIXTURE_IDS, fixtures, *shared))
+    results = dict(zip(FIXTURE_IDS, observed))
+
+    overall, fixture_results = report_results(results)
+    print(f"[PREFLIGHT-CAL][RUN] Completed in {time.monotonic() - started:.2f}s")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"overall_status": overall, "results": fixture_results}, f, indent=2)
+
+    fails = [fid for fid, v in fixture_results.items() if v["status"] == "FAIL"]
+    if fails:
+        print(f"\n[PREFLIGHT-CAL] FAILED fixtures: {fails}")
+        for fid in fails:
+            print(f"  {fid}: {fixture_results[fid]['details']}")
+
+    return overall
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() == "GREEN" else 1)
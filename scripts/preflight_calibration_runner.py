@@ -3,6 +3,8 @@
 
 Loads each fixture from fixtures_manifest.json into the live app,
 runs pre-flight detection, and validates results against expectations.
+For a browser-free pass see preflight_calibration_headless.py, which
+shares evaluate_fixture() and report_results() with this runner.
 
 Console prefix: [PREFLIGHT-CAL][RUN], [PREFLIGHT-CAL][RESULT]
 """
@@ -13,16 +15,16 @@ import os
 import subprocess
 import sys
 
-from playwright.async_api import async_playwright
-
 BASE_URL = "http://127.0.0.1:5000/ui/viewer/index.html"
 MANIFEST_PATH = os.path.join(os.path.dirname(__file__), "..", "tests", "preflight_calibration", "fixtures_manifest.json")
-CHROMIUM_PATH = subprocess.check_output(["which", "chromium"]).decode().strip()
 
 with open(MANIFEST_PATH) as f:
     MANIFEST = json.load(f)
 
 FIXTURE_IDS = list(MANIFEST["fixtures"].keys())
+# The browser hook cannot feed PDF text to the viewer's scan, so fixtures
+# carrying preflight_pages are only scored by the headless runner.
+BROWSER_FIXTURE_IDS = [fid for fid in FIXTURE_IDS if not MANIFEST["fixtures"][fid].get("preflight_pages")]
 
 INJECT_HOOKS_JS = """
 (function() {
@@ -244,6 +246,16 @@ def evaluate_fixture(fixture_id, result, expected):
     if "low_confidence_category_exists" in exp and exp["low_confidence_category_exists"]:
         checks.append("low_confidence_category: exists=True, PASS")
 
+    if "gate_color" in exp:
+        ok = result.get("gate_color") == exp["gate_color"]
+        checks.append(f"gate_color: exp={exp['gate_color']}, obs={result.get('gate_color')}, {'PASS' if ok else 'FAIL'}")
+        if not ok: all_pass = False
+
+    if "doc_mode" in exp:
+        ok = result.get("doc_mode") == exp["doc_mode"]
+        checks.append(f"doc_mode: exp={exp['doc_mode']}, obs={result.get('doc_mode')}, {'PASS' if ok else 'FAIL'}")
+        if not ok: all_pass = False
+
     if "meta_leakage" in exp:
         ok = (result.get("meta_in_triage", 0) == 0) == (not exp["meta_leakage"])
         checks.append(f"meta_leakage: exp={exp['meta_leakage']}, obs={result.get('meta_in_triage')}, {'PASS' if ok else 'FAIL'}")
@@ -257,15 +269,81 @@ def evaluate_fixture(fixture_id, result, expected):
     return all_pass, "; ".join(checks)
 
 
+def report_results(results, fixture_ids=FIXTURE_IDS):
+    """Print the fixture and policy tables. Returns (overall_status, fixture_results)."""
+    # Evaluate each fixture
+    print("\n" + "=" * 70)
+    print("[PREFLIGHT-CAL][RESULT] ===== CALIBRATION RESULTS =====")
+    print(f"{'Fixture':<30} | {'Status':<6} | Details")
+    print("-" * 100)
+
+    all_pass = True
+    fixture_results = {}
+
+    for fid in fixture_ids:
+        result = results.get(fid)
+        expected = MANIFEST["fixtures"][fid].get("expected", {})
+        ok, details = evaluate_fixture(fid, result, expected)
+        status = "PASS" if ok else "FAIL"
+        if not ok:
+            all_pass = False
+
+        print(f"{fid:<30} | {status:<6} | {details[:90]}")
+        if len(details) > 90:
+            print(f"{'':>39}{details[90:]}")
+        fixture_results[fid] = {"status": status, "details": details, "observed": result}
+
+    # Policy checks
+    print("\n[PREFLIGHT-CAL][RESULT] Policy Checks:")
+    policy_results = {}
+
+    warn_r = results.get("PF_FAIL_UNKNOWN_WARN") or {}
+    blocker_r = results.get("PF_FAIL_UNKNOWN_BLOCKER") or {}
+    warn_ok = warn_r.get("unknown_columns", 0) > 0
+    blocker_ok = "blocker" in (blocker_r.get("blocker_severities", []))
+    policy_results["unknown_threshold"] = warn_ok and blocker_ok
+    print(f"  unknown_column_thresholds: warn={warn_ok}, blocker={blocker_ok} -> {'PASS' if warn_ok and blocker_ok else 'FAIL'}")
+
+    ocr_r = results.get("PF_FAIL_OCR_UNREADABLE") or {}
+    mojibake_label = ocr_r.get("mojibake_label", "")
+    mojibake_merged = mojibake_label in ("OCR / Encoding", "OCR Unreadable")
+    policy_results["mojibake_ocr_merge"] = mojibake_merged
+    print(f"  mojibake_ocr_merge: label={mojibake_label} -> {'PASS' if mojibake_merged else 'FAIL'}")
+
+    dt_r = results.get("PF_FAIL_DOCUMENT_TYPE") or {}
+    dt_registered = dt_r.get("document_type_registered", False)
+    policy_results["document_type_category"] = dt_registered
+    print(f"  document_type_category: registered={dt_registered} -> {'PASS' if dt_registered else 'FAIL'}")
+
+    mixed_r = results.get("PF_FAIL_MIXED") or {}
+    meta_leak = mixed_r.get("meta_in_triage", 0)
+    ref_leak = mixed_r.get("ref_in_triage", 0)
+    no_leakage = meta_leak == 0 and ref_leak == 0
+    policy_results["no_leakage"] = no_leakage
+    print(f"  no_meta_glossary_leakage: meta={meta_leak}, ref={ref_leak} -> {'PASS' if no_leakage else 'FAIL'}")
+
+    policies_pass = all(policy_results.values())
+    overall = "GREEN" if all_pass and policies_pass else "YELLOW" if policies_pass else "RED"
+
+    print(f"\n[PREFLIGHT-CAL][RESULT] Fixtures: {sum(1 for v in fixture_results.values() if v['status'] == 'PASS')}/{len(fixture_ids)} PASS")
+    print(f"[PREFLIGHT-CAL][RESULT] Policies: {sum(1 for v in policy_results.values() if v)}/{len(policy_results)} PASS")
+    print(f"[PREFLIGHT-CAL][RESULT] Calibration Final Status: {overall}")
+
+    return overall, fixture_results
+
+
 async def main():
     print("=" * 70)
     print("[PREFLIGHT-CAL][RUN] ===== CALIBRATION SUITE START =====")
-    print(f"[PREFLIGHT-CAL][RUN] Fixtures: {len(FIXTURE_IDS)}")
+    print(f"[PREFLIGHT-CAL][RUN] Fixtures: {len(BROWSER_FIXTURE_IDS)}")
+
+    from playwright.async_api import async_playwright
+    chromium_path = subprocess.check_output(["which", "chromium"]).decode().strip()
 
     async with async_playwright() as p:
         browser = await p.chromium.launch(
             headless=True,
-            executable_path=CHROMIUM_PATH,
+            executable_path=chromium_path,
             args=["--no-sandbox", "--disable-gpu", "--disable-dev-shm-usage"]
         )
         ctx = await browser.new_context(viewport={"width": 1280, "height": 900})
@@ -287,7 +365,7 @@ async def main():
 
         # Run each fixture individually
         results = {}
-        for fid in FIXTURE_IDS:
+        for fid in BROWSER_FIXTURE_IDS:
             try:
                 result = await page.evaluate(f"window.runPreflightCalibration('{fid}')")
                 results[fid] = result
@@ -296,63 +374,7 @@ async def main():
                 results[fid] = None
             await page.wait_for_timeout(300)
 
-        # Evaluate each fixture
-        print("\n" + "=" * 70)
-        print("[PREFLIGHT-CAL][RESULT] ===== CALIBRATION RESULTS =====")
-        print(f"{'Fixture':<30} | {'Status':<6} | Details")
-        print("-" * 100)
-
-        all_pass = True
-        fixture_results = {}
-
-        for fid in FIXTURE_IDS:
-            result = results.get(fid)
-            expected = MANIFEST["fixtures"][fid].get("expected", {})
-            ok, details = evaluate_fixture(fid, result, expected)
-            status = "PASS" if ok else "FAIL"
-            if not ok:
-                all_pass = False
-
-            print(f"{fid:<30} | {status:<6} | {details[:90]}")
-            if len(details) > 90:
-                print(f"{'':>39}{details[90:]}")
-            fixture_results[fid] = {"status": status, "details": details, "observed": result}
-
-        # Policy checks
-        print("\n[PREFLIGHT-CAL][RESULT] Policy Checks:")
-        policy_results = {}
-
-        warn_r = results.get("PF_FAIL_UNKNOWN_WARN") or {}
-        blocker_r = results.get("PF_FAIL_UNKNOWN_BLOCKER") or {}
-        warn_ok = warn_r.get("unknown_columns", 0) > 0
-        blocker_ok = "blocker" in (blocker_r.get("blocker_severities", []))
-        policy_results["unknown_threshold"] = warn_ok and blocker_ok
-        print(f"  unknown_column_thresholds: warn={warn_ok}, blocker={blocker_ok} -> {'PASS' if warn_ok and blocker_ok else 'FAIL'}")
-
-        ocr_r = results.get("PF_FAIL_OCR_UNREADABLE") or {}
-        mojibake_label = ocr_r.get("mojibake_label", "")
-        mojibake_merged = mojibake_label in ("OCR / Encoding", "OCR Unreadable")
-        policy_results["mojibake_ocr_merge"] = mojibake_merged
-        print(f"  mojibake_ocr_merge: label={mojibake_label} -> {'PASS' if mojibake_merged else 'FAIL'}")
-
-        dt_r = results.get("PF_FAIL_DOCUMENT_TYPE") or {}
-        dt_registered = dt_r.get("document_type_registered", False)
-        policy_results["document_type_category"] = dt_registered
-        print(f"  document_type_category: registered={dt_registered} -> {'PASS' if dt_registered else 'FAIL'}")
-
-        mixed_r = results.get("PF_FAIL_MIXED") or {}
-        meta_leak = mixed_r.get("meta_in_triage", 0)
-        ref_leak = mixed_r.get("ref_in_triage", 0)
-        no_leakage = meta_leak == 0 and ref_leak == 0
-        policy_results["no_leakage"] = no_leakage
-        print(f"  no_meta_glossary_leakage: meta={meta_leak}, ref={ref_leak} -> {'PASS' if no_leakage else 'FAIL'}")
-
-        policies_pass = all(policy_results.values())
-        overall = "GREEN" if all_pass and policies_pass else "YELLOW" if policies_pass else "RED"
-
-        print(f"\n[PREFLIGHT-CAL][RESULT] Fixtures: {sum(1 for v in fixture_results.values() if v['status'] == 'PASS')}/{len(FIXTURE_IDS)} PASS")
-        print(f"[PREFLIGHT-CAL][RESULT] Policies: {sum(1 for v in policy_results.values() if v)}/{len(policy_results)} PASS")
-        print(f"[PREFLIGHT-CAL][RESULT] Calibration Final Status: {overall}")
+        overall, fixture_results = report_results(results, BROWSER_FIXTURE_IDS)
 
         # Print relevant console lines
         cal_lines = [l for l in console_lines if "[PREFLIGHT-CAL]" in l]
@@ -1,15 +1,21 @@
 """
-Tests for Preflight Engine thresholds and gate logic.
+Tests for Preflight Engine thresholds and gate logic, and PDF page selection.
 Run: python scripts/test_preflight.py
 """
 import sys
 import os
+import json
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import server.preflight_engine as preflight_engine
 from server.preflight_engine import (
     classify_page, classify_document, compute_text_metrics,
-    compute_gate, derive_cache_identity, run_preflight
+    compute_gate, derive_cache_identity, run_preflight, IncrementalPreflight,
+    union_area, compute_page_partial, pack_page_metrics, unpack_page_metrics,
 )
+from server.preflight_regate import REGATED_FIELDS, regate_result
+from server.preflight_batch import Corpus, classify_corpus, sweep_thresholds
+from server.pdf_text import PageRangeError, parse_page_spec, resolve_pages
 
 passed = 0
 failed = 0
@@ -43,32 +49,100 @@ check("50/50 mixed", classify_document(["SEARCHABLE"] * 5 + ["SCANNED"] * 5), "M
 check("empty", classify_document([]), "MIXED")
 
 print("\n=== Text Metrics ===")
-r1, c1 = compute_text_metrics(["hello world"])
+r1, c1, _ = compute_text_metrics(["hello world"])
 check("clean text replacement", r1, 0.0)
 check("clean text control", c1, 0.0)
-r2, c2 = compute_text_metrics(["\ufffd" * 6 + "x" * 94])
+r2, c2, _ = compute_text_metrics(["\ufffd" * 6 + "x" * 94])
 check("6% replacement (>5% threshold)", r2 > 0.05, True)
-r3, c3 = compute_text_metrics([chr(1) * 4 + "x" * 96])
+r3, c3, _ = compute_text_metrics([chr(1) * 4 + "x" * 96])
 check("4% control (>3% threshold)", c3 > 0.03, True)
-r4, c4 = compute_text_metrics([""])
+r4, c4, _ = compute_text_metrics([""])
 check("empty text replacement", r4, 0.0)
 check("empty text control", c4, 0.0)
 
 print("\n=== Gate Computation ===")
-g1, reasons1 = compute_gate("SEARCHABLE", 0.0, 0.0, 500, [500] * 10)
+g1, reasons1, _ = compute_gate("SEARCHABLE", 0.0, 0.0, 500, [500] * 10)
 check("clean doc = GREEN", g1, "GREEN")
-g2, reasons2 = compute_gate("SEARCHABLE", 0.06, 0.0, 500, [500] * 10)
+g2, reasons2, _ = compute_gate("SEARCHABLE", 0.06, 0.0, 500, [500] * 10)
 check("high replacement = RED", g2, "RED")
 check("RED has replacement reason", "replacement_char_ratio_exceeded" in reasons2[0], True)
-g3, reasons3 = compute_gate("SEARCHABLE", 0.0, 0.04, 500, [500] * 10)
+g3, reasons3, _ = compute_gate("SEARCHABLE", 0.0, 0.04, 500, [500] * 10)
 check("high control = RED", g3, "RED")
-g4, reasons4 = compute_gate("MIXED", 0.0, 0.0, 500, [500] * 10)
+g4, reasons4, _ = compute_gate("MIXED", 0.0, 0.0, 500, [500] * 10)
 check("mixed mode = YELLOW", g4, "YELLOW")
-g5, reasons5 = compute_gate("SEARCHABLE", 0.0, 0.0, 20, [20] * 10)
+g5, reasons5, _ = compute_gate("SEARCHABLE", 0.0, 0.0, 20, [20] * 10)
 check("low avg chars = YELLOW", g5, "YELLOW")
-g6, reasons6 = compute_gate("SEARCHABLE", 0.0, 0.0, 500, [5] * 9 + [5000])
+g6, reasons6, _ = compute_gate("SEARCHABLE", 0.0, 0.0, 500, [5] * 9 + [5000])
 check("sparse pages = YELLOW", g6, "YELLOW")
 
+print("\n=== Image Union Area ===")
+check("no rects", union_area([]), 0.0)
+check("single rect", union_area([(0, 0, 10, 20)]), 200.0)
+check("disjoint rects add", union_area([(0, 0, 10, 10), (20, 20, 30, 30)]), 200.0)
+check("partial overlap counts once", union_area([(0, 0, 10, 10), (5, 5, 15, 15)]), 175.0)
+check("contained rect adds nothing", union_area([(0, 0, 10, 10), (2, 2, 4, 4)]), 100.0)
+check("duplicate rects count once", union_area([(0, 0, 10, 10)] * 3), 100.0)
+check("edge-touching rects", union_area([(0, 0, 10, 10), (10, 0, 20, 10)]), 200.0)
+check("cross shape", union_area([(0, 4, 10, 6), (4, 0, 6, 10)]), 36.0)
+check("zero-width rect ignored", union_area([(5, 0, 5, 10)]), 0.0)
+check("zero-height rect ignored", union_area([(0, 5, 10, 5), (0, 0, 1, 1)]), 1.0)
+check("reversed rect ignored", union_area([(10, 10, 0, 0)]), 0.0)
+
+import random
+rng = random.Random(7)
+grid_ok = True
+for _ in range(200):
+    rects = []
+    for _ in range(rng.randint(1, 6)):
+        x0, y0 = rng.randint(0, 15), rng.randint(0, 15)
+        rects.append((x0, y0, x0 + rng.randint(0, 8), y0 + rng.randint(0, 8)))
+    cells = {(x, y) for x0, y0, x1, y1 in rects for x in range(x0, x1) for y in range(y0, y1)}
+    if union_area(rects) != float(len(cells)):
+        grid_ok = False
+        break
+check("random rects match unit-grid count", grid_ok, True)
+
+print("\n=== Page Selection ===")
+
+def page_spec_error(**kwargs):
+    try:
+        parse_page_spec(**kwargs)
+    except PageRangeError:
+        return True
+    return False
+
+def resolve_error(spec, page_count):
+    try:
+        resolve_pages(spec, page_count)
+    except PageRangeError:
+        return True
+    return False
+
+check("no selection = all pages", parse_page_spec(), None)
+check("blank pages = all pages", parse_page_spec(pages="  "), None)
+check("list and ranges", parse_page_spec(pages="1,3,5-7"), [(1, 1), (3, 3), (5, 7)])
+check("open-ended range", parse_page_spec(pages="10-"), [(10, None)])
+check("whitespace tolerated", parse_page_spec(pages=" 2 , 4 - 6 "), [(2, 2), (4, 6)])
+check("start/end range", parse_page_spec(start_page="2", end_page="4"), [(2, 4)])
+check("start only", parse_page_spec(start_page=3), [(3, None)])
+check("end only", parse_page_spec(end_page=3), [(1, 3)])
+check("reversed range rejected", page_spec_error(pages="7-5"), True)
+check("reversed start/end rejected", page_spec_error(start_page=5, end_page=2), True)
+check("page zero rejected", page_spec_error(pages="0"), True)
+check("negative rejected", page_spec_error(start_page="-1"), True)
+check("non-numeric rejected", page_spec_error(pages="a-b"), True)
+check("empty list item rejected", page_spec_error(pages="1,,2"), True)
+check("pages with start_page rejected", page_spec_error(pages="1", start_page=1), True)
+
+check("resolve all", resolve_pages(None, 3), [1, 2, 3])
+check("resolve empty doc", resolve_pages(None, 0), [])
+check("duplicates and overlaps merged", resolve_pages(parse_page_spec(pages="3,1-3,2"), 5), [1, 2, 3])
+check("open end runs to last page", resolve_pages([(4, None)], 6), [4, 5, 6])
+check("last page in range", resolve_pages([(5, 5)], 5), [5])
+check("page past end rejected", resolve_error([(6, 6)], 5), True)
+check("range past end rejected", resolve_error([(2, 9)], 5), True)
+check("open range past end rejected", resolve_error([(6, None)], 5), True)
+
 print("\n=== Cache Identity ===")
 id1 = derive_cache_identity("ws_123", "https://example.com/doc.pdf")
 id2 = derive_cache_identity("ws_123", "https://example.com/doc.pdf")
@@ -95,6 +169,138 @@ scanned_result = run_preflight([
 ])
 check("scanned doc mode", scanned_result["doc_mode"], "SCANNED")
 
+print("\n=== Early Gate Decisions ===")
+
+def early_gate(pages):
+    """First gate IncrementalPreflight decides, and the page it was decided on."""
+    inc = IncrementalPreflight(len(pages))
+    for page in pages:
+        gate = inc.add_page(page)
+        if gate is not None:
+            return gate, inc.pages_seen
+    return None, inc.pages_seen
+
+def clean(n, chars=5000):
+    return [{"page": i + 1, "text": "x" * chars, "image_coverage_ratio": 0.0} for i in range(n)]
+
+def scanned(n):
+    return [{"page": i + 1, "text": "", "image_coverage_ratio": 0.9} for i in range(n)]
+
+early_cases = [
+    ("clean doc", clean(100)),
+    ("U+FFFD page after clean pages", clean(56) + [{"page": 57, "text": "\ufffd" * 8000, "image_coverage_ratio": 0.0}]),
+    ("mojibake page after clean pages", clean(56) + [{"page": 57, "text": "\u00c3\u00a9" * 4000, "image_coverage_ratio": 0.0}]),
+    ("control chars after clean pages", clean(30) + [{"page": 31, "text": chr(1) * 8000, "image_coverage_ratio": 0.0}]),
+    ("corrupt first pages", [{"page": i + 1, "text": "\ufffd" * 4000, "image_coverage_ratio": 0.0} for i in range(5)] + clean(5)),
+    ("scanned doc", scanned(50)),
+    ("half scanned", clean(25) + scanned(25)),
+]
+for name, pages in early_cases:
+    gate, seen = early_gate(pages)
+    check("early gate matches run_preflight: %s" % name, gate, run_preflight(pages)["gate_color"])
+
+gate, seen = early_gate(clean(100))
+check("clean doc decided before last page", seen < 100, True)
+gate, seen = early_gate(clean(56) + [{"page": 57, "text": "\ufffd" * 8000, "image_coverage_ratio": 0.0}])
+check("reachable RED is not settled GREEN early", seen, 57)
+
+print("\n=== Stored Page Metrics ===")
+
+regate_docs = [
+    ("clean doc", clean(6)),
+    ("scanned doc", scanned(5)),
+    ("half scanned", [dict(p, page=i + 1) for i, p in enumerate(clean(3, chars=40) + scanned(3))]),
+    ("U+FFFD pages", clean(4) + [{"page": 5, "text": "\ufffd" * 600 + "x" * 400, "image_coverage_ratio": 0.0}]),
+    ("control chars", [{"page": 1, "text": chr(1) * 50 + "y" * 950, "image_coverage_ratio": 0.1}]),
+    ("mojibake and sizes", [
+        {"page": i + 1, "text": "caf\u00c3\u00a9 " * 20, "image_coverage_ratio": 0.5,
+         "page_width": 612, "page_height": 792}
+        for i in range(3)
+    ]),
+]
+# Stored metrics cover whole documents, pages numbered 1..n
+for name, pages in regate_docs:
+    partials = [compute_page_partial(p) for p in pages]
+    packed = json.loads(json.dumps(pack_page_metrics(partials)))
+    expected_partials = [dict(p, corruption_samples=[]) for p in partials]
+    check("pack/unpack round-trips: %s" % name, unpack_page_metrics(packed), expected_partials)
+check("empty doc packs to no pages", unpack_page_metrics(pack_page_metrics([])), [])
+
+def regated_matches_run(pages):
+    """regate_result() over stored metrics gives the engine fields run_preflight() does."""
+    stored = run_preflight(pages)
+    stored.update(content_hash="c" * 64, doc_id="doc_1", action_taken="accept_risk")
+    packed = json.loads(json.dumps(pack_page_metrics([compute_page_partial(p) for p in pages])))
+    engine_result, updated = regate_result(stored, packed)
+    fresh = run_preflight(pages)
+    return (
+        all(updated[f] == fresh[f] and engine_result[f] == fresh[f] for f in REGATED_FIELDS)
+        and updated["corruption_samples"] == stored["corruption_samples"]
+        and updated["action_taken"] == "accept_risk"
+    )
+
+for name, pages in regate_docs:
+    check("regate matches run_preflight: %s" % name, regated_matches_run(pages), True)
+
+# Re-gating under new thresholds: stored metrics, gate from the current constants
+saved = preflight_engine.GATE_YELLOW_AVG_CHARS, preflight_engine.PAGE_CHARS_MIN_SEARCHABLE
+pages = clean(6, chars=400)
+stored = run_preflight(pages)
+stored["content_hash"] = "c" * 64
+packed = pack_page_metrics([compute_page_partial(p) for p in pages])
+try:
+    preflight_engine.GATE_YELLOW_AVG_CHARS = 1000
+    preflight_engine.PAGE_CHARS_MIN_SEARCHABLE = 500
+    _, updated = regate_result(stored, packed)
+    check("new thresholds: regate matches run_preflight",
+          [updated[f] for f in REGATED_FIELDS], [run_preflight(pages)[f] for f in REGATED_FIELDS])
+finally:
+    preflight_engine.GATE_YELLOW_AVG_CHARS, preflight_engine.PAGE_CHARS_MIN_SEARCHABLE = saved
+check("new thresholds: gate changed", (stored["gate_color"], updated["gate_color"]), ("GREEN", "YELLOW"))
+check("new thresholds: previous gate recorded", updated["previous_gate_color"], "GREEN")
+
+print("\n=== Corpus Classification ===")
+
+def engine_classify(pages, replacement, control):
+    """Page modes, doc mode and gate from the per-page engine rules."""
+    modes = [classify_page(c, r) for c, r in pages]
+    if not pages:
+        return modes, "MIXED", "RED"
+    chars = [c for c, _ in pages]
+    doc_mode = classify_document(modes)
+    gate, _, _ = compute_gate(doc_mode, replacement, control, sum(chars) / len(chars), chars)
+    return modes, doc_mode, gate
+
+rng = random.Random(34)
+docs = []
+for _ in range(300):
+    kind = rng.random()
+    pages = []
+    for _ in range(rng.randint(0, 12)):
+        if kind < 0.3:
+            pages.append((rng.choice([0, 5, 9, 10, 49, 50, 51, 200]), rng.choice([0.0, 0.29, 0.3, 0.7, 0.71, 1.0])))
+        else:
+            pages.append((rng.randint(0, 120), round(rng.random(), 2)))
+    docs.append((pages, rng.choice([0.0, 0.05, 0.051, rng.random() * 0.1]), rng.choice([0.0, 0.03, 0.031, rng.random() * 0.06])))
+corpus = Corpus(
+    [c for pages, _, _ in docs for c, _ in pages],
+    [r for pages, _, _ in docs for _, r in pages],
+    [len(pages) for pages, _, _ in docs],
+    [rep for _, rep, _ in docs],
+    [ctl for _, _, ctl in docs],
+)
+expected = [engine_classify(*doc) for doc in docs]
+expected_pages = [m for modes, _, _ in expected for m in modes]
+for label, use_numpy in (("numpy", True), ("pure Python", False)):
+    out = classify_corpus(corpus, use_numpy=use_numpy)
+    check("%s page modes match classify_page" % label, out["page_modes"], expected_pages)
+    check("%s doc modes match classify_document" % label, out["doc_modes"], [d for _, d, _ in expected])
+    check("%s gates match compute_gate" % label, out["gate_colors"], [g for _, _, g in expected])
+
+rows = sweep_thresholds(corpus, {"gate_yellow_avg_chars": [30, 0]}, expected_gates=[g for _, _, g in expected])
+check("sweep at locked thresholds matches every doc", rows[0]["matched"], len(docs))
+check("sweep override changes gates", rows[1]["gate_counts"] != rows[0]["gate_counts"], True)
+
 print("\n=== Results ===")
 print("Passed: %d, Failed: %d" % (passed, failed))
 if failed > 0:
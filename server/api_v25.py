@@ -4,7 +4,10 @@ from datetime import datetime, timezone
 
 from fastapi import APIRouter
 
-from server.db import check_health
+from server.db import check_health, pool_stats
+from server.db_async import pool_stats as async_pool_stats
+from server.doc_executor import executor_stats
+from server.pdf_extract_service import extraction_stats
 
 logger = logging.getLogger(__name__)
 
@@ -43,10 +46,12 @@ def error_envelope(code, message, details=None, request_id=None):
 def health_check():
     db_ok = check_health()
     if db_ok:
-        return {"status": "ok", "db": "connected", "version": "2.5.0"}
+        return {"status": "ok", "db": "connected", "version": "2.5.0",
+                "document_work": executor_stats(), "pdf_extraction": extraction_stats(), "db_pool": pool_stats(), "db_async_pool": async_pool_stats()}
     else:
         from fastapi.responses import JSONResponse
         return JSONResponse(
             status_code=503,
-            content={"status": "degraded", "db": "disconnected", "version": "2.5.0"},
+            content={"status": "degraded", "db": "disconnected", "version": "2.5.0",
+                     "document_work": executor_stats(), "pdf_extraction": extraction_stats(), "db_pool": pool_stats(), "db_async_pool": async_pool_stats()},
         )
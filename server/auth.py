@@ -1,17 +1,75 @@
+"""
+Request authentication: bearer tokens (JWT, or a user id/email in dev),
+API keys, workspace roles.
+
+Resolved identities are cached in-process for AUTH_CACHE_TTL_SECONDS so
+an authenticated request does not wait on Postgres:
+  - JWT: the signature and expiry are checked on every request; only the
+    user's status lookup is cached, by user id
+  - other bearer tokens: the user row, by sha256 of the token
+  - API keys: the key row, by key hash; expires_at is re-checked on every
+    hit. last_used_at is written on a cache miss, so it is accurate to
+    within the TTL
+Identity lookups run on server/db_async.py. Role checks come in two
+forms: require_role() for sync (threadpool) handlers, on the request's
+server/db.py connection that the handler goes on to use, and
+require_role_async() for async handlers, on db_async, so an async request
+draws from one pool only.
+
+Only active users and unrevoked keys are cached. invalidate_user() (member
+deactivated or edited) and invalidate_api_key() (for code that revokes or
+rotates a key) drop entries at once in this process; other worker
+processes see the change when their entries expire. The user ->
+token index that invalidate_user() needs is pruned as token entries leave
+the cache, so it never outgrows it.
+
+Environment Variables:
+    AUTH_CACHE_TTL_SECONDS: Lifetime of a cached identity (0 disables the cache)
+        Default: 30
+    AUTH_CACHE_MAX_ENTRIES: Entries per cache
+        Default: 4096
+"""
 import hashlib
 import logging
 import os
+import threading
 from enum import Enum
 from typing import Optional
 
 from fastapi import Request
 from fastapi.responses import JSONResponse
 
-from server.db import get_conn, put_conn
+from server import db_async
+from server.db import PoolExhausted, get_conn, put_conn
 from server.api_v25 import error_envelope
+from server.lru import LRUCache
 
 logger = logging.getLogger(__name__)
 
+CACHE_TTL_SECONDS = float(os.environ.get("AUTH_CACHE_TTL_SECONDS", "30"))
+CACHE_MAX_ENTRIES = int(os.environ.get("AUTH_CACHE_MAX_ENTRIES", "4096"))
+
+# Reverse index for invalidate_user(): user_id -> hashes of their cached tokens
+_tokens_by_user = {}
+_index_lock = threading.Lock()
+
+
+def _unindex_token(token_hash, entry):
+    with _index_lock:
+        token_hashes = _tokens_by_user.get(entry[0])
+        if token_hashes is not None:
+            token_hashes.discard(token_hash)
+            if not token_hashes:
+                del _tokens_by_user[entry[0]]
+
+
+# user_id -> users.status of a JWT subject
+_user_status_cache = LRUCache(CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS)
+# sha256(token) -> (user_id, email, display_name) of a non-JWT bearer token
+_token_cache = LRUCache(CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS, on_evict=_unindex_token)
+# key_hash -> (key_id, workspace_id, scopes, created_by, expires_at)
+_api_key_cache = LRUCache(CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS)
+
 _SANDBOX_AUTH_ALLOWED = (
     os.environ.get("REPLIT_DEV_DOMAIN") is not None
     and os.environ.get("REPLIT_DEPLOYMENT") is None
@@ -60,22 +118,45 @@ class AuthResult:
         return self.auth_type == "api_key"
 
 
-def _resolve_bearer(token):
+def _cache_enabled():
+    return CACHE_TTL_SECONDS > 0
+
+
+def invalidate_user(user_id):
+    """Drop cached identities of user_id (status or profile changed)."""
+    _user_status_cache.pop(user_id)
+    with _index_lock:
+        token_hashes = _tokens_by_user.pop(user_id, ())
+    for token_hash in token_hashes:
+        _token_cache.pop(token_hash)
+
+
+def invalidate_api_key(key_hash):
+    """Drop a cached API key by its key_hash (revoked, rotated, expired or scopes changed)."""
+    _api_key_cache.pop(key_hash)
+
+
+async def _user_status(user_id):
+    status = _user_status_cache.get(user_id) if _cache_enabled() else None
+    if status is not None:
+        return status
+    async with db_async.cursor() as cur:
+        await cur.execute("SELECT status FROM users WHERE id = %s", (user_id,))
+        row = cur.fetchone()
+    status = (row[0] if row else None) or ""
+    if status != "inactive" and _cache_enabled():
+        _user_status_cache.put(user_id, status)
+    return status
+
+
+async def _resolve_bearer(token):
     from server.jwt_utils import verify_jwt
     jwt_payload = verify_jwt(token)
     if jwt_payload:
         user_id = jwt_payload.get("sub") or jwt_payload.get("user_id")
-        if user_id:
-            conn = get_conn()
-            try:
-                with conn.cursor() as cur:
-                    cur.execute("SELECT status FROM users WHERE id = %s", (user_id,))
-                    row = cur.fetchone()
-                    if row and row[0] == "inactive":
-                        logger.info("JWT user %s is inactive, denying access", user_id)
-                        return None
-            finally:
-                put_conn(conn)
+        if user_id and await _user_status(user_id) == "inactive":
+            logger.info("JWT user %s is inactive, denying access", user_id)
+            return None
         return AuthResult(
             user_id=user_id,
             email=jwt_payload.get("email"),
@@ -85,40 +166,69 @@ def _resolve_bearer(token):
             auth_type="bearer",
         )
 
-    conn = get_conn()
-    try:
-        with conn.cursor() as cur:
-            cur.execute(
-                "SELECT id, email, display_name, status FROM users WHERE id = %s",
+    token_hash = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    cached = _token_cache.get(token_hash) if _cache_enabled() else None
+    if cached is not None:
+        user_id, email, display_name = cached
+        return AuthResult(user_id=user_id, email=email, display_name=display_name, auth_type="bearer")
+
+    async with db_async.cursor() as cur:
+        await cur.execute(
+            "SELECT id, email, display_name, status FROM users WHERE id = %s",
+            (token,),
+        )
+        row = cur.fetchone()
+        if not row:
+            await cur.execute(
+                "SELECT id, email, display_name, status FROM users WHERE email = %s",
                 (token,),
             )
             row = cur.fetchone()
-            if not row:
-                cur.execute(
-                    "SELECT id, email, display_name, status FROM users WHERE email = %s",
-                    (token,),
-                )
-                row = cur.fetchone()
-            if row:
-                if len(row) > 3 and row[3] == "inactive":
-                    return None
-                return AuthResult(
-                    user_id=row[0],
-                    email=row[1],
-                    display_name=row[2],
-                    auth_type="bearer",
-                )
-        return None
-    finally:
-        put_conn(conn)
+        if row:
+            if len(row) > 3 and row[3] == "inactive":
+                return None
+            if _cache_enabled():
+                # Index first: if the entry is evicted right after put(), _unindex_token undoes this
+                with _index_lock:
+                    _tokens_by_user.setdefault(row[0], set()).add(token_hash)
+                _token_cache.put(token_hash, (row[0], row[1], row[2]))
+            return AuthResult(
+                user_id=row[0],
+                email=row[1],
+                display_name=row[2],
+                auth_type="bearer",
+            )
+    return None
+
 
+def _api_key_result(workspace_id, scopes, created_by):
+    return AuthResult(
+        user_id=created_by,
+        workspace_id=workspace_id,
+        auth_type="api_key",
+        api_key_scopes=list(scopes) if isinstance(scopes, list) else [],
+    )
 
-def _resolve_api_key(key_value):
+
+def _expired(expires_at):
+    if expires_at is None:
+        return False
+    from datetime import datetime, timezone
+    return expires_at.replace(tzinfo=timezone.utc) < datetime.now(timezone.utc)
+
+
+async def _resolve_api_key(key_value):
     key_hash = hashlib.sha256(key_value.encode("utf-8")).hexdigest()
-    conn = get_conn()
+    cached = _api_key_cache.get(key_hash) if _cache_enabled() else None
+    if cached is not None:
+        key_id, workspace_id, scopes, created_by, expires_at = cached
+        if _expired(expires_at):
+            invalidate_api_key(key_hash)
+            return None
+        return _api_key_result(workspace_id, scopes, created_by)
     try:
-        with conn.cursor() as cur:
-            cur.execute(
+        async with db_async.cursor() as cur:
+            await cur.execute(
                 """SELECT key_id, workspace_id, scopes, created_by, revoked_at, expires_at
                    FROM api_keys
                    WHERE key_hash = %s""",
@@ -128,30 +238,21 @@ def _resolve_api_key(key_value):
             if not row:
                 return None
             key_id, workspace_id, scopes, created_by, revoked_at, expires_at = row
-            if revoked_at is not None:
+            if revoked_at is not None or _expired(expires_at):
                 return None
-            if expires_at is not None:
-                from datetime import datetime, timezone
-                if expires_at.replace(tzinfo=timezone.utc) < datetime.now(timezone.utc):
-                    return None
 
-            cur.execute(
+            await cur.execute(
                 "UPDATE api_keys SET last_used_at = NOW() WHERE key_id = %s",
                 (key_id,),
             )
-        conn.commit()
-        return AuthResult(
-            user_id=created_by,
-            workspace_id=workspace_id,
-            auth_type="api_key",
-            api_key_scopes=scopes if isinstance(scopes, list) else [],
-        )
+        if _cache_enabled():
+            _api_key_cache.put(key_hash, (key_id, workspace_id, scopes, created_by, expires_at))
+        return _api_key_result(workspace_id, scopes, created_by)
+    except PoolExhausted:
+        raise
     except Exception as e:
         logger.error("API key resolution error: %s", e)
-        conn.rollback()
         return None
-    finally:
-        put_conn(conn)
 
 
 SANDBOX_SIMULATABLE_ROLES = {"admin", "architect"}
@@ -180,20 +281,20 @@ def _apply_role_simulation(request, auth_result):
     logger.info("Role simulation active: %s -> %s", actual_role, effective_role)
 
 
-def resolve_auth(request: Request):
+async def resolve_auth(request: Request):
     bearer = request.headers.get("Authorization", "")
     api_key = request.headers.get("X-API-Key", "")
 
     if bearer.startswith("Bearer "):
         token = bearer[7:].strip()
         if token:
-            result = _resolve_bearer(token)
+            result = await _resolve_bearer(token)
             if result:
                 _apply_role_simulation(request, result)
             return result, "bearer"
 
     if api_key:
-        result = _resolve_api_key(api_key)
+        result = await _resolve_api_key(api_key)
         if result:
             return result, "api_key"
 
@@ -222,13 +323,23 @@ def get_workspace_role(user_id, workspace_id):
                 (user_id, workspace_id),
             )
             row = cur.fetchone()
-            if row:
-                return row[0]
-        return None
+        conn.rollback()
+        return row[0] if row else None
     finally:
         put_conn(conn)
 
 
+async def get_workspace_role_async(user_id, workspace_id):
+    """get_workspace_role() for async handlers, on the same pool as resolve_auth()."""
+    async with db_async.cursor() as cur:
+        await cur.execute(
+            "SELECT role FROM user_workspace_roles WHERE user_id = %s AND workspace_id = %s",
+            (user_id, workspace_id),
+        )
+        row = cur.fetchone()
+    return row[0] if row else None
+
+
 def has_minimum_role(user_role, required_role):
     if user_role is None:
         return False
@@ -238,11 +349,11 @@ def has_minimum_role(user_role, required_role):
 
 
 def require_auth(auth_class: AuthClass):
-    def dependency(request: Request):
+    async def dependency(request: Request):
         if auth_class == AuthClass.NONE:
             return None
 
-        auth_result, auth_type = resolve_auth(request)
+        auth_result, auth_type = await resolve_auth(request)
 
         if auth_result is None:
             return JSONResponse(
@@ -269,10 +380,22 @@ def require_auth(auth_class: AuthClass):
 
 
 def require_role(workspace_id, auth_result, min_role):
+    """Role check for sync (threadpool) handlers. Returns an error response or None."""
     if auth_result.is_api_key:
         return None
-
     role = get_workspace_role(auth_result.user_id, workspace_id)
+    return _check_role(workspace_id, auth_result, min_role, role)
+
+
+async def require_role_async(workspace_id, auth_result, min_role):
+    """Role check for async handlers: no blocking checkout on the event loop."""
+    if auth_result.is_api_key:
+        return None
+    role = await get_workspace_role_async(auth_result.user_id, workspace_id)
+    return _check_role(workspace_id, auth_result, min_role, role)
+
+
+def _check_role(workspace_id, auth_result, min_role, role):
     if role is None:
         return JSONResponse(
             status_code=403,
@@ -1,22 +1,157 @@
+"""
+PostgreSQL connection pool (psycopg2 ThreadedConnectionPool).
+
+get_conn() checks a connection out without a server round-trip: it only
+looks at the local connection state (closed, transaction status). A
+connection that has sat idle in the pool for DB_VALIDATE_IDLE_SECONDS or
+more, or has never been used, is pinged with SELECT 1 first. A connection
+that fails its checks is discarded and the checkout retried once.
+put_conn() closes connections that were lost mid-request, so the next
+checkout never sees them.
+
+RequestConnectionMiddleware gives each HTTP request one connection:
+inside a request, get_conn() returns the request's connection and
+put_conn() hands it back to the request instead of the pool, so
+require_role() and a threadpool handler run on the same connection
+without re-checking it out. (Async handlers authenticate and check roles
+on server/db_async.py and never touch this pool for them.) put_conn() rolls back anything
+left uncommitted, so the connection never sits idle in a transaction
+between uses. The connection goes back to the pool when the response
+starts, so streaming bodies (SSE, NDJSON) use ordinary checkouts; a
+handler about to do long work that needs no database (fetching or
+extracting a PDF) calls release_request_conn() to give it back sooner.
+A get_conn() made while the request's connection is already in use
+(nested, or from another thread), or after it was released, gets an
+ordinary checkout.
+
+When all DB_POOL_MAX connections are checked out, get_conn() waits up to
+DB_POOL_WAIT_TIMEOUT seconds for one to come back. At most
+DB_POOL_MAX_WAITING threads wait; beyond that, or on timeout, it raises
+PoolExhausted, which the app returns as 503 with Retry-After. get_conn()
+is for worker threads: async code calls it through asyncio.to_thread()
+(or uses server/db_async.py). Called on the event loop thread it does
+not wait at all and raises PoolExhausted at once when the pool is full.
+
+pool_stats() reports in-use / idle / waiting counts, a checkout latency
+histogram, connection ages and validation counts (GET /api/v2.5/health,
+"db_pool").
+
+Environment Variables:
+    DATABASE_URL: PostgreSQL connection string
+    DB_POOL_MIN: Connections opened at startup and kept idle
+        Default: 2
+    DB_POOL_MAX: Connections open at once
+        Default: 10
+    DB_POOL_WAIT_TIMEOUT: Seconds a checkout waits for a free connection
+        Default: 5
+    DB_POOL_MAX_WAITING: Checkouts allowed to wait at once
+        Default: 32
+    DB_POOL_RETRY_AFTER: Retry-After seconds sent when the pool is exhausted
+        Default: 2
+    DB_VALIDATE_IDLE_SECONDS: Idle time after which a connection is pinged on checkout
+        Default: 30
+"""
+import asyncio
+import contextvars
 import os
 import logging
+import threading
+import time
 from contextlib import asynccontextmanager
 
 import psycopg2
-from psycopg2 import pool
+from psycopg2 import extensions, pool
 
 logger = logging.getLogger(__name__)
 
+MIN_CONNECTIONS = max(0, int(os.environ.get("DB_POOL_MIN", "2")))
+MAX_CONNECTIONS = max(1, int(os.environ.get("DB_POOL_MAX", "10")))
+WAIT_TIMEOUT_SECONDS = float(os.environ.get("DB_POOL_WAIT_TIMEOUT", "5"))
+MAX_WAITING = max(0, int(os.environ.get("DB_POOL_MAX_WAITING", "32")))
+RETRY_AFTER_SECONDS = int(os.environ.get("DB_POOL_RETRY_AFTER", "2"))
+VALIDATE_IDLE_SECONDS = float(os.environ.get("DB_VALIDATE_IDLE_SECONDS", "30"))
+
 _pool = None
+# One permit per connection; checkouts wait here instead of failing on an empty pool
+_slots = None
+
+# id(conn) -> time.monotonic() when it was last returned to the pool
+_last_used = {}
+# id(conn) -> time.monotonic() when it was first checked out
+_opened_at = {}
+_stats_lock = threading.Lock()
+_stats = {
+    "checkouts": 0, "waiting": 0, "rejected": 0, "timeouts": 0,
+    "validations": 0, "validation_failures": 0, "discarded": 0, "request_reuses": 0,
+}
+
+
+class PoolExhausted(Exception):
+    """No connection became free within the wait timeout, or too many requests are waiting.
+
+    The app maps it to 503 with Retry-After.
+    """
+
+    def __init__(self, message="Database connection pool exhausted", retry_after=RETRY_AFTER_SECONDS):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class LatencyHistogram:
+    """Checkout latency counts per bucket (upper bounds in ms). Not locked; callers hold a lock."""
+
+    BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS_MS) + 1)
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms):
+        for i, bound in enumerate(self.BUCKETS_MS):
+            if ms <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def snapshot(self):
+        n = sum(self.counts)
+        buckets = {"le_%d" % bound: c for bound, c in zip(self.BUCKETS_MS, self.counts)}
+        buckets["gt_%d" % self.BUCKETS_MS[-1]] = self.counts[-1]
+        return {
+            "count": n,
+            "avg_ms": round(self.total_ms / n, 3) if n else 0.0,
+            "max_ms": round(self.max_ms, 3),
+            "buckets": buckets,
+        }
+
+
+def connection_ages(opened_at):
+    now = time.monotonic()
+    ages = [now - t for t in list(opened_at.values())]
+    return {
+        "oldest_s": round(max(ages), 1) if ages else 0.0,
+        "avg_s": round(sum(ages) / len(ages), 1) if ages else 0.0,
+    }
+
 
+_checkout_latency = LatencyHistogram()
 
-def init_pool(database_url=None, min_conn=2, max_conn=10):
-    global _pool
+
+def init_pool(database_url=None, min_conn=None, max_conn=None):
+    global _pool, _slots
     if database_url is None:
         database_url = os.environ.get("DATABASE_URL")
     if not database_url:
         raise RuntimeError("DATABASE_URL not set")
+    max_conn = MAX_CONNECTIONS if max_conn is None else max_conn
+    min_conn = min(MIN_CONNECTIONS if min_conn is None else min_conn, max_conn)
     _pool = pool.ThreadedConnectionPool(min_conn, max_conn, database_url)
+    _slots = threading.BoundedSemaphore(max_conn)
     logger.info("Database connection pool initialized (min=%d, max=%d)", min_conn, max_conn)
 
 
@@ -26,44 +161,266 @@ def get_pool():
     return _pool
 
 
-def get_conn():
-    p = get_pool()
-    conn = p.getconn()
+def _count(key, n=1):
+    with _stats_lock:
+        _stats[key] += n
+
+
+def _on_event_loop():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def _acquire_slot():
+    """Wait up to WAIT_TIMEOUT_SECONDS for a free connection; raises PoolExhausted.
+
+    Never waits on an event loop thread: the connection it would wait for
+    may only come back through that loop (RequestConnectionMiddleware
+    returns connections via asyncio.to_thread).
+    """
+    slots = _slots
+    if slots.acquire(blocking=False):
+        return slots
+    if _on_event_loop():
+        _count("rejected")
+        logger.warning("Database pool exhausted on the event loop thread; not waiting")
+        raise PoolExhausted()
+    with _stats_lock:
+        if _stats["waiting"] >= MAX_WAITING:
+            _stats["rejected"] += 1
+            raise PoolExhausted("Too many requests waiting for a database connection")
+        _stats["waiting"] += 1
     try:
-        conn.isolation_level
-        with conn.cursor() as cur:
-            cur.execute("SELECT 1")
-            cur.fetchone()
-        if conn.status != 1:
-            raise psycopg2.OperationalError("connection not ready")
+        acquired = slots.acquire(timeout=WAIT_TIMEOUT_SECONDS)
+    finally:
+        _count("waiting", -1)
+    if not acquired:
+        _count("timeouts")
+        logger.warning("No database connection free after %.1fs", WAIT_TIMEOUT_SECONDS)
+        raise PoolExhausted()
+    return slots
+
+
+def pool_stats():
+    with _stats_lock:
+        s = dict(_stats)
+        s["checkout_ms"] = _checkout_latency.snapshot()
+    s["connection_age"] = connection_ages(_opened_at)
+    s["wait_timeout_s"] = WAIT_TIMEOUT_SECONDS
+    s["max_waiting"] = MAX_WAITING
+    if _pool is not None:
+        s["in_use"] = len(_pool._used)
+        s["idle"] = len(_pool._pool)
+        s["min"] = _pool.minconn
+        s["max"] = _pool.maxconn
+    return s
+
+
+def _usable(conn):
+    """Local state checks; SELECT 1 only after an idle spell. Raises on a dead connection."""
+    if conn.closed:
+        return False
+    status = conn.info.transaction_status
+    if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+        return False
+    if status != extensions.TRANSACTION_STATUS_IDLE:
+        conn.rollback()
+    last_used = _last_used.get(id(conn))
+    if last_used is not None and time.monotonic() - last_used < VALIDATE_IDLE_SECONDS:
+        return True
+    _count("validations")
+    with conn.cursor() as cur:
+        cur.execute("SELECT 1")
+        cur.fetchone()
+    conn.rollback()
+    return True
+
+
+def _forget(conn):
+    _last_used.pop(id(conn), None)
+    _opened_at.pop(id(conn), None)
+
+
+def _close(p, conn):
+    _forget(conn)
+    _count("discarded")
+    try:
+        p.putconn(conn, close=True)
     except Exception:
-        try:
-            p.putconn(conn, close=True)
-        except Exception:
-            pass
-        conn = p.getconn()
-        try:
-            conn.reset()
-        except Exception:
-            pass
-    return conn
+        pass
 
 
-def put_conn(conn, close=False):
+def _checkout():
+    p = get_pool()
+    started = time.monotonic()
+    slots = _acquire_slot()
+    try:
+        for attempt in (1, 2):
+            conn = p.getconn()
+            _opened_at.setdefault(id(conn), time.monotonic())
+            try:
+                if _usable(conn):
+                    with _stats_lock:
+                        _stats["checkouts"] += 1
+                        _checkout_latency.observe((time.monotonic() - started) * 1000)
+                    return conn
+            except psycopg2.Error as e:
+                logger.warning("Discarding database connection that failed validation: %s", e)
+            _count("validation_failures")
+            _close(p, conn)
+        raise psycopg2.OperationalError("No usable database connection after retry")
+    except BaseException:
+        slots.release()
+        raise
+
+
+def _lost(conn):
+    return conn.closed or conn.info.transaction_status == extensions.TRANSACTION_STATUS_UNKNOWN
+
+
+def _return(conn, close=False):
+    slots = _slots
     try:
+        p = get_pool()
+        if close or _lost(conn):
+            _close(p, conn)
+            return
+        p.putconn(conn)
         if conn.closed:
-            get_pool().putconn(conn, close=True)
+            # The pool closes connections beyond min_conn instead of keeping them
+            _forget(conn)
         else:
-            get_pool().putconn(conn, close=close)
+            _last_used[id(conn)] = time.monotonic()
     except Exception:
         pass
+    finally:
+        if slots is not None:
+            try:
+                slots.release()
+            except ValueError:
+                pass
+
+
+class _RequestConnection:
+    """The connection slot of one HTTP request (RequestConnectionMiddleware)."""
+
+    def __init__(self):
+        self.conn = None
+        self.in_use = False
+        self.released = False
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self.released or self.in_use:
+                return None
+            if self.conn is None:
+                self.conn = _checkout()
+            else:
+                _count("request_reuses")
+            self.in_use = True
+            return self.conn
+
+    def give_back(self, conn, close):
+        """Keep conn for the rest of the request; False when it is not ours to keep."""
+        with self._lock:
+            if conn is not self.conn:
+                return False
+            self.in_use = False
+            if close or _lost(conn):
+                self.conn = None
+                return False
+            if not conn.autocommit and conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    self.conn = None
+                    return False
+            return True
+
+    def release(self):
+        with self._lock:
+            conn, self.conn = self.conn, None
+            self.released = True
+            in_use = self.in_use
+        if conn is not None and not in_use:
+            _return(conn)
+
+
+_request_slot = contextvars.ContextVar("db_request_connection", default=None)
+
+
+class RequestConnectionMiddleware:
+    """ASGI middleware: one pooled connection per HTTP request, checked out on first use."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        slot = _RequestConnection()
+        token = _request_slot.set(slot)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and not slot.released:
+                await _release_slot(slot)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_slot.reset(token)
+            if not slot.released:
+                await _release_slot(slot)
+
+
+async def _release_slot(slot):
+    if slot.conn is None:
+        slot.release()
+    else:
+        # putconn may roll back: a round-trip, so keep it off the loop
+        await asyncio.to_thread(slot.release)
+
+
+async def release_request_conn():
+    """Return the current request's connection to the pool before long-running work.
+
+    Later get_conn() calls in the request get ordinary checkouts.
+    """
+    slot = _request_slot.get()
+    if slot is not None and not slot.released:
+        await _release_slot(slot)
+
+
+def get_conn():
+    slot = _request_slot.get()
+    if slot is not None:
+        conn = slot.acquire()
+        if conn is not None:
+            return conn
+    return _checkout()
+
+
+def put_conn(conn, close=False):
+    slot = _request_slot.get()
+    if slot is not None and slot.give_back(conn, close):
+        return
+    _return(conn, close)
 
 
 def close_pool():
-    global _pool
+    global _pool, _slots
     if _pool is not None:
         _pool.closeall()
         _pool = None
+        _slots = None
+        _last_used.clear()
+        _opened_at.clear()
         logger.info("Database connection pool closed")
 
 
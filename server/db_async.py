@@ -0,0 +1,239 @@
+"""
+Async PostgreSQL access for the FastAPI routes.
+
+Uses psycopg2's asynchronous connections (async_=True): queries are sent
+without blocking and the event loop waits on the connection's socket
+(add_reader/add_writer), so an async route can hold a connection without
+occupying a threadpool slot or stalling the loop. Row types are the same
+as server/db.py (JSONB -> dict, timestamptz -> datetime).
+
+Async connections are always in autocommit mode: each statement is its
+own transaction. Use them for reads and single-statement writes; work
+that needs a multi-statement transaction stays on server/db.py.
+
+    async with db_async.cursor() as cur:
+        await cur.execute("SELECT ... WHERE id = %s", (ws_id,))
+        row = cur.fetchone()
+
+The pool is created on first use from DATABASE_URL and closed on app
+shutdown (close_pool()). Idle connections are reused; one that turns out
+to be dead on its first statement is replaced and the statement retried
+once. A connection is discarded if its statement was interrupted
+(cancelled request). Checkouts wait for a free connection with the same
+DB_POOL_WAIT_TIMEOUT / DB_POOL_MAX_WAITING bounds as server/db.py and
+raise PoolExhausted (503 with Retry-After) beyond them.
+
+Environment Variables:
+    DATABASE_URL: PostgreSQL connection string
+    DB_ASYNC_POOL_MAX: Connections open at once per process
+        Default: 20
+"""
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+
+import psycopg2
+from psycopg2 import extensions
+
+from server.db import (
+    MAX_WAITING, WAIT_TIMEOUT_SECONDS, LatencyHistogram, PoolExhausted, connection_ages,
+)
+
+logger = logging.getLogger(__name__)
+
+MAX_CONNECTIONS = max(1, int(os.environ.get("DB_ASYNC_POOL_MAX", "20")))
+
+_pool = None
+
+
+async def _wait(conn):
+    """Drive conn.poll() until the pending connect or statement has completed."""
+    loop = asyncio.get_running_loop()
+    while True:
+        state = conn.poll()
+        if state == extensions.POLL_OK:
+            return
+        if state == extensions.POLL_READ:
+            add, remove = loop.add_reader, loop.remove_reader
+        elif state == extensions.POLL_WRITE:
+            add, remove = loop.add_writer, loop.remove_writer
+        else:
+            raise psycopg2.OperationalError("Unexpected poll state: %r" % state)
+        fd = conn.fileno()
+        ready = loop.create_future()
+        add(fd, lambda: ready.done() or ready.set_result(None))
+        try:
+            await ready
+        finally:
+            remove(fd)
+
+
+class AsyncPool:
+    """Bounded pool of async psycopg2 connections, opened on demand."""
+
+    def __init__(self, database_url, max_conn=MAX_CONNECTIONS):
+        self.database_url = database_url
+        self.max_conn = max_conn
+        self._idle = []
+        self._slots = asyncio.Semaphore(max_conn)
+        self._opened_at = {}
+        self._waiting = 0
+        self._stats = {"checkouts": 0, "rejected": 0, "timeouts": 0, "discarded": 0, "reconnects": 0}
+        self._latency = LatencyHistogram()
+
+    async def connect(self):
+        conn = psycopg2.connect(self.database_url, async_=True)
+        try:
+            await _wait(conn)
+        except BaseException:
+            conn.close()
+            raise
+        self._opened_at[id(conn)] = time.monotonic()
+        return conn
+
+    def _forget(self, conn):
+        self._opened_at.pop(id(conn), None)
+
+    async def _acquire_slot(self):
+        if not self._slots.locked():
+            await self._slots.acquire()
+            return
+        if self._waiting >= MAX_WAITING:
+            self._stats["rejected"] += 1
+            raise PoolExhausted("Too many requests waiting for a database connection")
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), WAIT_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            self._stats["timeouts"] += 1
+            logger.warning("No async database connection free after %.1fs", WAIT_TIMEOUT_SECONDS)
+            raise PoolExhausted()
+        finally:
+            self._waiting -= 1
+
+    async def acquire(self):
+        """(connection, reused): reused is False for a newly opened one. Waits while max_conn are in use."""
+        started = time.monotonic()
+        await self._acquire_slot()
+        try:
+            conn, reused = None, False
+            while self._idle:
+                candidate = self._idle.pop()
+                if not candidate.closed:
+                    conn, reused = candidate, True
+                    break
+                self._forget(candidate)
+            if conn is None:
+                conn = await self.connect()
+        except BaseException:
+            self._slots.release()
+            raise
+        self._stats["checkouts"] += 1
+        self._latency.observe((time.monotonic() - started) * 1000)
+        return conn, reused
+
+    def release(self, conn, discard=False):
+        try:
+            if discard or conn.closed or conn.isexecuting():
+                self._stats["discarded"] += 1
+                self._forget(conn)
+                conn.close()
+            else:
+                self._idle.append(conn)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        idle, self._idle = self._idle, []
+        for conn in idle:
+            self._forget(conn)
+            conn.close()
+
+    def stats(self):
+        s = dict(self._stats)
+        s.update({
+            "open": len(self._opened_at),
+            "in_use": len(self._opened_at) - len(self._idle),
+            "idle": len(self._idle),
+            "waiting": self._waiting,
+            "max": self.max_conn,
+            "checkout_ms": self._latency.snapshot(),
+            "connection_age": connection_ages(self._opened_at),
+        })
+        return s
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        database_url = os.environ.get("DATABASE_URL")
+        if not database_url:
+            raise RuntimeError("DATABASE_URL not set")
+        _pool = AsyncPool(database_url)
+        logger.info("Async database pool initialized (max=%d)", MAX_CONNECTIONS)
+    return _pool
+
+
+def close_pool():
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        _pool = None
+        logger.info("Async database pool closed")
+
+
+def pool_stats():
+    return _pool.stats() if _pool is not None else None
+
+
+class AsyncCursor:
+    """Cursor on a pooled async connection: await execute(); fetchone()/fetchall() read the buffered result."""
+
+    def __init__(self, pool, conn, reused):
+        self._pool = pool
+        self.conn = conn
+        self._may_reconnect = reused
+        self._cur = conn.cursor()
+
+    async def execute(self, sql, params=None):
+        try:
+            self._cur.execute(sql, params)
+            await _wait(self.conn)
+        except psycopg2.OperationalError:
+            if not self._may_reconnect or not self.conn.closed:
+                raise
+            # Idle connection died (server restart, idle timeout): reconnect once
+            logger.warning("Async database connection lost while idle; reconnecting")
+            self._pool._stats["reconnects"] += 1
+            self._pool._forget(self.conn)
+            self.conn = await self._pool.connect()
+            self._cur = self.conn.cursor()
+            self._cur.execute(sql, params)
+            await _wait(self.conn)
+        finally:
+            self._may_reconnect = False
+
+    def fetchone(self):
+        return self._cur.fetchone()
+
+    def fetchall(self):
+        return self._cur.fetchall()
+
+    @property
+    def rowcount(self):
+        return self._cur.rowcount
+
+
+@asynccontextmanager
+async def cursor():
+    """Check out a pooled async connection for the duration of the block."""
+    pool = get_pool()
+    conn, reused = await pool.acquire()
+    cur = AsyncCursor(pool, conn, reused)
+    try:
+        yield cur
+    finally:
+        # release() discards a connection left mid-statement (cancelled request)
+        pool.release(cur.conn)
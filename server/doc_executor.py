@@ -0,0 +1,141 @@
+"""
+Bounded executor for CPU-bound document work (PyMuPDF parsing, preflight).
+
+Async route handlers must not parse PDFs on the event loop: one large
+document would stall every other request on the worker. run_document_job()
+runs the callable on a dedicated thread pool and awaits it, so the loop
+keeps serving other requests. Heavy jobs may fan out further (the preflight
+pipeline shards large documents onto its process pool from these threads).
+
+Admission is bounded: at most DOC_WORK_MAX_CONCURRENCY jobs run and at most
+DOC_WORK_MAX_QUEUE wait. Beyond that run_document_job() raises
+ExecutorSaturated, which routes surface as 503 with Retry-After. A job
+counts against the bound until it finishes, even if the request awaiting
+it was cancelled (client disconnect).
+
+Environment Variables:
+    DOC_WORK_MAX_CONCURRENCY: Jobs running at once
+        Default: 4
+    DOC_WORK_MAX_QUEUE: Jobs allowed to wait for a slot
+        Default: 16
+    DOC_WORK_RETRY_AFTER: Retry-After seconds sent on saturation
+        Default: 5
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+MAX_CONCURRENCY = max(1, int(os.environ.get("DOC_WORK_MAX_CONCURRENCY", "4")))
+MAX_QUEUE = max(0, int(os.environ.get("DOC_WORK_MAX_QUEUE", "16")))
+RETRY_AFTER_SECONDS = int(os.environ.get("DOC_WORK_RETRY_AFTER", "5"))
+
+_executor = None
+_lock = threading.Lock()
+_stats = {
+    "submitted": 0,
+    "completed": 0,
+    "failed": 0,
+    "rejected": 0,
+    "running": 0,
+    "pending": 0,
+    "wait_ms_total": 0.0,
+    "wait_ms_max": 0.0,
+    "run_ms_total": 0.0,
+    "run_ms_max": 0.0,
+}
+
+
+class ExecutorSaturated(Exception):
+    """Raised when the document work queue is full."""
+
+    def __init__(self, retry_after=RETRY_AFTER_SECONDS):
+        super().__init__("Document work queue is full")
+        self.retry_after = retry_after
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENCY, thread_name_prefix="docwork")
+        return _executor
+
+
+async def run_document_job(fn, *args, label=None):
+    """Run fn(*args) off the event loop. Raises ExecutorSaturated when full."""
+    with _lock:
+        if _stats["pending"] >= MAX_CONCURRENCY + MAX_QUEUE:
+            _stats["rejected"] += 1
+            logger.warning("[DOC-WORK] rejected %s: queue full (pending=%d)", label or fn.__name__, _stats["pending"])
+            raise ExecutorSaturated()
+        _stats["pending"] += 1
+        _stats["submitted"] += 1
+    enqueued_at = time.monotonic()
+
+    def _job():
+        started_at = time.monotonic()
+        wait_ms = (started_at - enqueued_at) * 1000
+        with _lock:
+            _stats["running"] += 1
+            _stats["wait_ms_total"] += wait_ms
+            _stats["wait_ms_max"] = max(_stats["wait_ms_max"], wait_ms)
+        try:
+            return fn(*args)
+        finally:
+            run_ms = (time.monotonic() - started_at) * 1000
+            with _lock:
+                _stats["running"] -= 1
+                _stats["run_ms_total"] += run_ms
+                _stats["run_ms_max"] = max(_stats["run_ms_max"], run_ms)
+
+    def _done(future):
+        # Counted when the job itself finishes, not when the awaiting request
+        # does: a cancelled request leaves its job running in the pool.
+        ok = not future.cancelled() and future.exception() is None
+        with _lock:
+            _stats["pending"] -= 1
+            _stats["completed" if ok else "failed"] += 1
+
+    try:
+        future = _get_executor().submit(_job)
+    except BaseException:
+        with _lock:
+            _stats["pending"] -= 1
+            _stats["failed"] += 1
+        raise
+    future.add_done_callback(_done)
+    return await asyncio.wrap_future(future)
+
+
+def executor_stats():
+    """Snapshot of queue depth and timing counters."""
+    with _lock:
+        s = dict(_stats)
+    finished = s["completed"] + s["failed"]
+    return {
+        "max_concurrency": MAX_CONCURRENCY,
+        "max_queue": MAX_QUEUE,
+        "running": s["running"],
+        "queued": max(0, s["pending"] - s["running"]),
+        "submitted": s["submitted"],
+        "completed": s["completed"],
+        "failed": s["failed"],
+        "rejected": s["rejected"],
+        "avg_wait_ms": round(s["wait_ms_total"] / finished, 2) if finished else 0.0,
+        "max_wait_ms": round(s["wait_ms_max"], 2),
+        "avg_run_ms": round(s["run_ms_total"] / finished, 2) if finished else 0.0,
+        "max_run_ms": round(s["run_ms_max"], 2),
+    }
+
+
+def shutdown_executor():
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,370 @@
+"""
+Shared outbound HTTP client for PDF fetches.
+
+One httpx.AsyncClient lives for the lifetime of the app (start_client() on
+startup, close_client() on shutdown), so /proxy/pdf, /api/pdf/text*, and the
+preflight routes reuse pooled keep-alive connections to the document hosts
+instead of paying a TCP + TLS handshake per request. HTTP/2 is negotiated
+when the h2 package is installed (httpx[http2]); otherwise HTTP/1.1
+keep-alive is used.
+
+open_pdf_stream() is the single fetch path; fetch_pdf() buffers its body
+and iter_pdf_body() streams it (/proxy/pdf). Both go through the disk
+cache in server/pdf_cache.py. It applies the allowlist and SSRF
+checks from pdf_proxy to the URL and to every redirect hop (redirects are
+never followed automatically), rejects a Content-Length over the size cap
+before reading, and aborts the body read as soon as the cap is passed.
+Failures raise FetchError carrying the HTTP status, an error code and a
+message; routes map it to HTTPException or error_envelope.
+
+Host checks resolve DNS off the event loop with a TTL cache
+(pdf_proxy.resolve_public_host), and every A/AAAA record must be public.
+The client's connections go to those checked addresses only: its
+transport (_PinnedTransport) is an httpcore connection pool built with a
+network backend that looks the host up in the same cache instead of
+resolving again, so a DNS answer that changes between the check and the
+connect cannot reach a private address. Connections are still keyed and
+TLS-verified by hostname.
+
+Environment Variables:
+    PDF_FETCH_TIMEOUT: Per-request timeout in seconds
+        Default: 30
+    PDF_FETCH_MAX_CONNECTIONS: Connections open at once across all hosts
+        Default: 32
+    PDF_FETCH_MAX_KEEPALIVE: Idle connections kept for reuse
+        Default: 16
+    PDF_FETCH_KEEPALIVE_EXPIRY: Seconds an idle connection is kept
+        Default: 30
+    PDF_FETCH_HTTP2: Negotiate HTTP/2 when h2 is installed (1 | 0)
+        Default: 1
+    PDF_FETCH_MAX_REDIRECTS: Redirect hops followed (each one validated)
+        Default: 3
+"""
+import asyncio
+import contextlib
+import importlib.util
+import logging
+import os
+from urllib.parse import urlparse, unquote
+
+import httpcore
+import httpx
+
+from server import pdf_cache
+
+logger = logging.getLogger(__name__)
+
+TIMEOUT_SECONDS = float(os.environ.get("PDF_FETCH_TIMEOUT", "30"))
+MAX_CONNECTIONS = max(1, int(os.environ.get("PDF_FETCH_MAX_CONNECTIONS", "32")))
+MAX_KEEPALIVE = max(0, int(os.environ.get("PDF_FETCH_MAX_KEEPALIVE", "16")))
+KEEPALIVE_EXPIRY = float(os.environ.get("PDF_FETCH_KEEPALIVE_EXPIRY", "30"))
+HTTP2_REQUESTED = os.environ.get("PDF_FETCH_HTTP2", "1").strip().lower() not in ("0", "false", "no", "off")
+MAX_REDIRECTS = max(0, int(os.environ.get("PDF_FETCH_MAX_REDIRECTS", "3")))
+
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+_client = None
+
+
+class FetchError(Exception):
+    """An outbound fetch was refused or failed. status_code is the HTTP status to return."""
+
+    def __init__(self, status_code, code, message, headers=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.code = code
+        self.message = message
+        self.headers = headers
+
+
+def _http2_available():
+    return HTTP2_REQUESTED and importlib.util.find_spec("h2") is not None
+
+
+# httpcore errors raised to callers as their httpx equivalents (looked up along the MRO)
+_MAPPED_ERRORS = {
+    httpcore.ConnectTimeout: httpx.ConnectTimeout,
+    httpcore.ReadTimeout: httpx.ReadTimeout,
+    httpcore.WriteTimeout: httpx.WriteTimeout,
+    httpcore.PoolTimeout: httpx.PoolTimeout,
+    httpcore.TimeoutException: httpx.TimeoutException,
+    httpcore.ConnectError: httpx.ConnectError,
+    httpcore.ReadError: httpx.ReadError,
+    httpcore.WriteError: httpx.WriteError,
+    httpcore.NetworkError: httpx.NetworkError,
+    httpcore.ProxyError: httpx.ProxyError,
+    httpcore.UnsupportedProtocol: httpx.UnsupportedProtocol,
+    httpcore.RemoteProtocolError: httpx.RemoteProtocolError,
+    httpcore.LocalProtocolError: httpx.LocalProtocolError,
+    httpcore.ProtocolError: httpx.ProtocolError,
+}
+
+
+@contextlib.contextmanager
+def _httpx_errors():
+    try:
+        yield
+    except Exception as e:
+        for cls in type(e).__mro__:
+            if cls in _MAPPED_ERRORS:
+                raise _MAPPED_ERRORS[cls](str(e)) from e
+        raise
+
+
+class _PinnedBackend(httpcore.AsyncNetworkBackend):
+    """Connects to the addresses the SSRF check approved for a host, never to a fresh lookup."""
+
+    def __init__(self, backend):
+        self._backend = backend
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        from server.pdf_proxy import resolve_public_host
+
+        addresses = await resolve_public_host(host)
+        if not addresses:
+            raise httpcore.ConnectError("Private/reserved IPs are blocked: %s" % host)
+        error = None
+        for address in addresses:
+            try:
+                return await self._backend.connect_tcp(address, port, timeout, local_address, socket_options)
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                error = e
+        raise error
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return await self._backend.connect_unix_socket(path, timeout, socket_options)
+
+    async def sleep(self, seconds):
+        await self._backend.sleep(seconds)
+
+
+class _ResponseStream(httpx.AsyncByteStream):
+    def __init__(self, stream):
+        self._stream = stream
+
+    async def __aiter__(self):
+        with _httpx_errors():
+            async for chunk in self._stream:
+                yield chunk
+
+    async def aclose(self):
+        if hasattr(self._stream, "aclose"):
+            await self._stream.aclose()
+
+
+class _PinnedTransport(httpx.AsyncBaseTransport):
+    """httpx transport over an httpcore pool whose connections use _PinnedBackend."""
+
+    def __init__(self, http2):
+        self._pool = httpcore.AsyncConnectionPool(
+            ssl_context=httpx.create_ssl_context(),
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+            http1=True,
+            http2=http2,
+            network_backend=_PinnedBackend(httpcore.AnyIOBackend()),
+        )
+
+    async def handle_async_request(self, request):
+        core_request = httpcore.Request(
+            method=request.method,
+            url=httpcore.URL(
+                scheme=request.url.raw_scheme,
+                host=request.url.raw_host,
+                port=request.url.port,
+                target=request.url.raw_path,
+            ),
+            headers=request.headers.raw,
+            content=request.stream,
+            extensions=request.extensions,
+        )
+        with _httpx_errors():
+            resp = await self._pool.handle_async_request(core_request)
+        return httpx.Response(
+            status_code=resp.status,
+            headers=resp.headers,
+            stream=_ResponseStream(resp.stream),
+            extensions=resp.extensions,
+        )
+
+    async def aclose(self):
+        await self._pool.aclose()
+
+
+def _build_client():
+    http2 = _http2_available()
+    transport = _PinnedTransport(http2)
+    client = httpx.AsyncClient(
+        transport=transport,
+        timeout=TIMEOUT_SECONDS,
+        follow_redirects=False,
+    )
+    logger.info(
+        "[HTTP-CLIENT] shared client started (http2=%s, max_connections=%d, keepalive=%d)",
+        http2, MAX_CONNECTIONS, MAX_KEEPALIVE,
+    )
+    return client
+
+
+def start_client():
+    """Create the shared client. Called from app startup; safe to call twice."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+
+def get_client():
+    """The shared client; created on first use when startup did not run (scripts, tests)."""
+    if _client is None or _client.is_closed:
+        return start_client()
+    return _client
+
+
+async def close_client():
+    global _client
+    client, _client = _client, None
+    if client is not None and not client.is_closed:
+        await client.aclose()
+        logger.info("[HTTP-CLIENT] shared client closed")
+
+
+async def validate_url(url, label="URL"):
+    """Decode and check a fetch URL. Returns (decoded_url, parsed); raises FetchError."""
+    from server.pdf_proxy import is_host_allowed, resolve_public_host
+
+    try:
+        decoded_url = unquote(url)
+        parsed = urlparse(decoded_url)
+    except Exception:
+        raise FetchError(400, "VALIDATION_ERROR", "Invalid %s format" % label)
+
+    if parsed.scheme not in ("http", "https"):
+        raise FetchError(400, "VALIDATION_ERROR", "Only HTTP/HTTPS URLs allowed")
+
+    hostname = parsed.hostname
+    if not hostname:
+        raise FetchError(400, "VALIDATION_ERROR", "Missing hostname in %s" % label)
+
+    if not is_host_allowed(hostname):
+        raise FetchError(403, "FORBIDDEN", "Host not in allowlist: %s" % hostname)
+
+    if not await resolve_public_host(hostname):
+        raise FetchError(403, "FORBIDDEN", "Private/reserved IPs are blocked")
+
+    return decoded_url, parsed
+
+
+async def _redirect_target(resp):
+    from server.pdf_proxy import is_host_allowed, resolve_public_host
+
+    location = resp.headers.get("location")
+    if not location:
+        return None
+    target = resp.url.join(location)
+    if (target.scheme not in ("http", "https") or not target.host
+            or not is_host_allowed(target.host) or not await resolve_public_host(target.host)):
+        raise FetchError(403, "FORBIDDEN", "Redirect to non-allowlisted host blocked")
+    return str(target)
+
+
+async def open_pdf_stream(url, label="URL", headers=None):
+    """Validate url, follow validated redirects and return the open streaming response.
+
+    headers are sent on every hop (e.g. Range, cache validators). The
+    status is 2xx, or 304 when validators were sent, and any Content-Length
+    is within the size cap. The caller must aclose() the
+    response. Raises FetchError; a 416 carries the upstream Content-Range.
+    """
+    from server.pdf_proxy import MAX_SIZE_BYTES
+
+    target, _ = await validate_url(url, label)
+    client = get_client()
+    try:
+        for _ in range(MAX_REDIRECTS + 1):
+            resp = await client.send(client.build_request("GET", target, headers=headers), stream=True)
+            if resp.status_code not in REDIRECT_STATUSES:
+                break
+            try:
+                target = await _redirect_target(resp)
+            finally:
+                await resp.aclose()
+            if target is None:
+                raise FetchError(502, "UPSTREAM_ERROR", "Upstream redirect without location")
+        else:
+            raise FetchError(502, "UPSTREAM_ERROR", "Too many redirects")
+    except httpx.TimeoutException:
+        raise FetchError(504, "UPSTREAM_TIMEOUT", "Upstream timeout")
+    except httpx.RequestError as e:
+        raise FetchError(502, "UPSTREAM_ERROR", "Upstream request failed: %s" % e)
+
+    if resp.status_code == 304:
+        # Only sent in answer to pdf_cache.conditional_headers()
+        return resp
+    if not resp.is_success:
+        await resp.aclose()
+        if resp.status_code == 416:
+            content_range = resp.headers.get("content-range")
+            raise FetchError(
+                416, "RANGE_NOT_SATISFIABLE", "Requested range not satisfiable",
+                headers={"Content-Range": content_range} if content_range else None,
+            )
+        raise FetchError(resp.status_code, "UPSTREAM_ERROR", "Upstream error: %d" % resp.status_code)
+
+    content_length = resp.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_SIZE_BYTES:
+        await resp.aclose()
+        raise FetchError(
+            413, "FILE_TOO_LARGE",
+            "File too large: %s bytes (max %d)" % (content_length, MAX_SIZE_BYTES),
+        )
+    return resp
+
+
+async def iter_pdf_body(resp):
+    """Yield the body of an open_pdf_stream() response, raising FetchError past MAX_SIZE_BYTES.
+
+    Closes the response when done, on error, or when the consumer stops early.
+    """
+    from server.pdf_proxy import MAX_SIZE_BYTES
+
+    size = 0
+    try:
+        async for chunk in resp.aiter_bytes():
+            size += len(chunk)
+            if size > MAX_SIZE_BYTES:
+                raise FetchError(
+                    413, "FILE_TOO_LARGE",
+                    "Response too large: over %d bytes" % MAX_SIZE_BYTES,
+                )
+            yield chunk
+    except httpx.TimeoutException:
+        raise FetchError(504, "UPSTREAM_TIMEOUT", "Upstream timeout")
+    except httpx.RequestError as e:
+        raise FetchError(502, "UPSTREAM_ERROR", "Upstream request failed: %s" % e)
+    finally:
+        await resp.aclose()
+
+
+async def fetch_pdf(url, label="URL"):
+    """Fetch a PDF through the shared client and the disk cache. Returns the bytes; raises FetchError.
+
+    A cached copy is revalidated with a conditional GET and read from disk
+    on 304. Cache disk I/O runs in worker threads. The body is read in chunks and abandoned once it passes
+    MAX_SIZE_BYTES, so an oversize file without Content-Length is never
+    fully buffered.
+    """
+    entry = await asyncio.to_thread(pdf_cache.lookup, url)
+    resp = await open_pdf_stream(url, label, headers=pdf_cache.conditional_headers(entry))
+    if resp.status_code == 304:
+        await resp.aclose()
+        content = await asyncio.to_thread(pdf_cache.read, entry)
+        if content is not None:
+            return content
+        # Evicted between lookup and read
+        resp = await open_pdf_stream(url, label)
+    content = b"".join([chunk async for chunk in iter_pdf_body(resp)])
+    if pdf_cache.cacheable(resp.headers):
+        await asyncio.to_thread(pdf_cache.store, url, content, resp.headers)
+    return content
@@ -0,0 +1,62 @@
+"""
+In-process LRU cache with per-entry TTL, shared by the preflight result,
+PDF text, auth identity and DNS caches.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Thread-safe LRU with per-entry TTL.
+
+    on_evict(key, value), if given, is called (outside the lock) for every
+    entry that leaves the cache: evicted for capacity, found expired, or
+    popped. Callers keeping side indexes over the entries prune them there.
+    """
+
+    def __init__(self, max_entries, ttl_seconds, on_evict=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.on_evict = on_evict
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evicted(self, items):
+        if self.on_evict is not None:
+            for key, value in items:
+                self.on_evict(key, value)
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at >= time.monotonic():
+                self._data.move_to_end(key)
+                return value
+            del self._data[key]
+        self._evicted([(key, value)])
+        return None
+
+    def put(self, key, value):
+        evicted = []
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                old_key, (_, old_value) = self._data.popitem(last=False)
+                evicted.append((old_key, old_value))
+        self._evicted(evicted)
+
+    def pop(self, key):
+        with self._lock:
+            item = self._data.pop(key, None)
+        if item is None:
+            return None
+        self._evicted([(key, item[1])])
+        return item[1]
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,15 @@
+-- Preflight: durable result store shared by all API workers
+-- Backs the in-process LRU in server/preflight_cache.py. No FK on workspace_id
+-- or doc_id: doc_ids may be derived (doc_derived_*) and never exist in documents.
+-- Rollback: DROP TABLE preflight_results;
+
+CREATE TABLE IF NOT EXISTS preflight_results (
+    workspace_id TEXT NOT NULL,
+    doc_id TEXT NOT NULL,
+    gate_color TEXT,
+    result JSONB NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (workspace_id, doc_id)
+);
+CREATE INDEX IF NOT EXISTS idx_preflight_results_updated ON preflight_results(workspace_id, updated_at DESC);
@@ -0,0 +1,15 @@
+-- Preflight: engine results keyed by PDF content hash
+-- Identical bytes analysed by the same engine version give the same result,
+-- whatever URL, filename, doc_id or workspace they arrive under. Rows hold
+-- engine output only (no workspace, doc_id or file_url).
+-- Rollback: DROP TABLE preflight_content_results;
+
+CREATE TABLE IF NOT EXISTS preflight_content_results (
+    content_hash TEXT NOT NULL,
+    engine_version TEXT NOT NULL,
+    gate_color TEXT,
+    page_count INTEGER,
+    result JSONB NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (content_hash, engine_version)
+);
@@ -0,0 +1,15 @@
+-- Preflight: per-page metrics keyed by PDF content hash
+-- Raw page numbers (char counts, image coverage, corruption counts) stored
+-- column-wise as JSONB, so documents can be re-gated after threshold
+-- changes without re-downloading or re-parsing. metrics_version tracks the
+-- metric definitions (not the gate thresholds).
+-- Rollback: DROP TABLE preflight_page_metrics;
+
+CREATE TABLE IF NOT EXISTS preflight_page_metrics (
+    content_hash TEXT NOT NULL,
+    metrics_version TEXT NOT NULL,
+    page_count INTEGER NOT NULL,
+    metrics JSONB NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (content_hash, metrics_version)
+);
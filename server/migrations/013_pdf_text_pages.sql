@@ -0,0 +1,16 @@
+-- PDF text extraction cache: one row per page, keyed by PDF content hash
+-- Output of server/pdf_text.py for /api/pdf/text (mode 'text') and
+-- /api/pdf/text_layout (mode 'layout'). extractor_version changes whenever
+-- the page output changes; page_count lets readers detect partial sets.
+-- Rollback: DROP TABLE pdf_text_pages;
+
+CREATE TABLE IF NOT EXISTS pdf_text_pages (
+    content_hash TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    extractor_version TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    page_count INTEGER NOT NULL,
+    data JSONB NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (content_hash, mode, extractor_version, page)
+);
@@ -0,0 +1,312 @@
+"""
+Content-addressed disk cache of upstream PDF bytes.
+
+Shared by every outbound PDF fetch (/proxy/pdf, /api/pdf/text,
+/api/pdf/text_layout, preflight /run and /batch). Bodies are stored once
+per sha256 under blobs/; meta/ maps each source URL to its blob and the
+upstream validators (ETag, Last-Modified). A cached URL is always
+revalidated with a conditional GET; a 304 is served from disk, so repeat
+opens cost one small round-trip and no body transfer. Responses without a
+validator are not cached.
+
+S3 presigned query parameters (X-Amz-*) are dropped from the URL key, so
+a fresh signature for the same object still hits. Access is still checked
+upstream by the conditional GET.
+
+Eviction is LRU by blob mtime (touched on every hit) and deletes blobs
+until they fit in 90% of PDF_CACHE_MAX_MB, leaving headroom so a full
+cache is not rescanned on every store. An eviction also deletes the meta
+files whose blob is gone, as does a lookup that finds one. Each process
+keeps a running total of the blob bytes: counted by a directory scan once,
+then advanced by its own stores. Only a store that takes the total over the bound, or one made
+after PDF_CACHE_RECOUNT_SECONDS, rescans the directory (picking up other
+processes' stores) and evicts. Writes go to a temp file and are renamed
+into place, so several API processes can share a directory. All of this
+is blocking file I/O: async callers run it in a worker thread.
+
+Environment Variables:
+    PDF_CACHE_DIR: Cache directory
+        Default: <system temp>/orchestrate_pdf_cache
+    PDF_CACHE_MAX_MB: Size bound for cached blobs (0 disables the cache)
+        Default: 1024
+    PDF_CACHE_RECOUNT_SECONDS: Age after which the running size total is recounted from disk
+        Default: 300
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode, unquote
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.environ.get("PDF_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "orchestrate_pdf_cache")
+MAX_BYTES = max(0, int(os.environ.get("PDF_CACHE_MAX_MB", "1024"))) * 1024 * 1024
+ENABLED = MAX_BYTES > 0
+RECOUNT_SECONDS = float(os.environ.get("PDF_CACHE_RECOUNT_SECONDS", "300"))
+# Eviction target once MAX_BYTES is exceeded
+EVICT_TO_BYTES = int(MAX_BYTES * 0.9)
+
+_BLOB_DIR = os.path.join(CACHE_DIR, "blobs")
+_META_DIR = os.path.join(CACHE_DIR, "meta")
+
+_stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "scans": 0}
+_stats_lock = threading.Lock()
+
+# Blob bytes at the last directory scan plus this process's stores since;
+# None until the first scan
+_total_bytes = None
+_counted_at = 0.0
+_size_lock = threading.Lock()
+# One scan at a time; stores arriving meanwhile just add to the total
+_evict_lock = threading.Lock()
+
+
+def stats():
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _count(name, n=1):
+    with _stats_lock:
+        _stats[name] += n
+
+
+def cache_key(url):
+    """URL identity for the cache: decoded, without S3 signing parameters."""
+    parts = urlsplit(unquote(url))
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if not k.startswith("X-Amz-")]
+    normalized = urlunsplit((parts.scheme, parts.netloc.lower(), parts.path, urlencode(query), ""))
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def _blob_path(content_hash):
+    return os.path.join(_BLOB_DIR, content_hash + ".pdf")
+
+
+def _meta_path(key):
+    return os.path.join(_META_DIR, key + ".json")
+
+
+def _write_atomic(path, data):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp_")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except Exception:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def lookup(url):
+    """Cache entry for url, or None. Entry: {key, content_hash, path, etag, last_modified, content_type, size}."""
+    if not ENABLED:
+        return None
+    key = cache_key(url)
+    try:
+        with open(_meta_path(key)) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        _count("misses")
+        return None
+    path = _blob_path(meta["content_hash"])
+    if not os.path.exists(path):
+        # Blob evicted (possibly by another process): drop the dangling meta
+        _unlink_quietly(_meta_path(key))
+        _count("misses")
+        return None
+    meta["key"] = key
+    meta["path"] = path
+    return meta
+
+
+def conditional_headers(entry):
+    """If-None-Match / If-Modified-Since for revalidating entry."""
+    if not entry:
+        return {}
+    headers = {}
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+
+def hit(entry):
+    """Mark entry used (LRU) and return its blob path, or None if it was evicted meanwhile."""
+    try:
+        os.utime(entry["path"])
+    except OSError:
+        _count("misses")
+        return None
+    _count("hits")
+    return entry["path"]
+
+
+def read(entry):
+    """Bytes of a revalidated entry, or None if the blob is gone."""
+    path = hit(entry)
+    if path is None:
+        return None
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def cacheable(headers):
+    return ENABLED and bool(headers.get("etag") or headers.get("last-modified"))
+
+
+class BlobWriter:
+    """Incremental store for a body being streamed elsewhere; commit() when complete."""
+
+    def __init__(self):
+        os.makedirs(_BLOB_DIR, exist_ok=True)
+        fd, self._tmp = tempfile.mkstemp(dir=_BLOB_DIR, prefix=".tmp_")
+        self._file = os.fdopen(fd, "wb")
+        self._digest = hashlib.sha256()
+        self._size = 0
+
+    def write(self, chunk):
+        self._file.write(chunk)
+        self._digest.update(chunk)
+        self._size += len(chunk)
+
+    def commit(self, url, headers):
+        self._file.close()
+        content_hash = self._digest.hexdigest()
+        path = _blob_path(content_hash)
+        try:
+            added = 0 if os.path.exists(path) else self._size
+            os.replace(self._tmp, path)
+            _store_meta(url, content_hash, self._size, headers)
+        except OSError as e:
+            logger.warning("[PDF-CACHE] store failed for %s: %s", content_hash[:12], e)
+            self.abort()
+            return None
+        _account(added)
+        return content_hash
+
+    def abort(self):
+        if not self._file.closed:
+            self._file.close()
+        try:
+            os.unlink(self._tmp)
+        except OSError:
+            pass
+
+
+def store(url, content, headers):
+    """Store a fully read body. Returns its content hash, or None when not cacheable."""
+    if not cacheable(headers):
+        return None
+    writer = BlobWriter()
+    writer.write(content)
+    return writer.commit(url, headers)
+
+
+def _store_meta(url, content_hash, size, headers):
+    os.makedirs(_META_DIR, exist_ok=True)
+    meta = {
+        "content_hash": content_hash,
+        "size": size,
+        "etag": headers.get("etag"),
+        "last_modified": headers.get("last-modified"),
+        "content_type": headers.get("content-type", "application/pdf"),
+        "stored_at": time.time(),
+    }
+    _write_atomic(_meta_path(cache_key(url)), json.dumps(meta).encode("utf-8"))
+    _count("stores")
+
+
+def _account(added):
+    """Add a new blob to the running total; scan and evict only when it is over MAX_BYTES or stale."""
+    global _total_bytes
+    with _size_lock:
+        if _total_bytes is not None and time.monotonic() - _counted_at < RECOUNT_SECONDS:
+            _total_bytes += added
+            if _total_bytes <= MAX_BYTES:
+                return
+    if _evict_lock.acquire(blocking=False):
+        try:
+            _evict()
+        finally:
+            _evict_lock.release()
+
+
+def _evict():
+    """Rescan the blobs, evict least recently used ones down to EVICT_TO_BYTES if over MAX_BYTES, reset the total."""
+    global _total_bytes, _counted_at
+    _count("scans")
+    try:
+        entries = []
+        total = 0
+        with os.scandir(_BLOB_DIR) as it:
+            for e in it:
+                if e.name.startswith("."):
+                    continue
+                st = e.stat()
+                entries.append((st.st_mtime, st.st_size, e.path))
+                total += st.st_size
+    except OSError:
+        return
+    if total > MAX_BYTES:
+        total = _evict_entries(entries, total)
+    with _size_lock:
+        _total_bytes = total
+        _counted_at = time.monotonic()
+
+
+def _evict_entries(entries, total):
+    entries.sort()
+    evicted = 0
+    for _, size, path in entries:
+        if total <= EVICT_TO_BYTES:
+            break
+        try:
+            os.unlink(path)
+        except OSError:
+            continue
+        total -= size
+        evicted += 1
+    _count("evictions", evicted)
+    pruned = _prune_meta()
+    logger.info("[PDF-CACHE] evicted %d blobs down to %d bytes, pruned %d meta files", evicted, total, pruned)
+    return total
+
+
+def _prune_meta():
+    """Delete meta files whose blob no longer exists. Returns how many were deleted."""
+    pruned = 0
+    try:
+        with os.scandir(_META_DIR) as it:
+            names = [e.name for e in it if not e.name.startswith(".")]
+    except OSError:
+        return 0
+    for name in names:
+        path = os.path.join(_META_DIR, name)
+        try:
+            with open(path) as f:
+                content_hash = json.load(f)["content_hash"]
+        except (OSError, ValueError, KeyError, TypeError):
+            continue
+        if not os.path.exists(_blob_path(content_hash)) and _unlink_quietly(path):
+            pruned += 1
+    return pruned
+
+
+def _unlink_quietly(path):
+    try:
+        os.unlink(path)
+    except OSError:
+        return False
+    return True
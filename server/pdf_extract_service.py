@@ -0,0 +1,317 @@
+"""
+PDF extraction service: every PyMuPDF parse in the API runs here.
+
+Jobs run on a bounded, spawn-based process pool, never in the API process,
+so a pathological PDF cannot stall or crash an API worker:
+  - each request has a deadline (PDF_EXTRACT_TIMEOUT); on expiry the pool's
+    worker processes are killed and the pool is rebuilt
+  - each worker runs under an address-space limit (PDF_EXTRACT_WORKER_MEMORY_MB)
+  - workers are recycled after PDF_EXTRACT_MAX_TASKS_PER_CHILD jobs
+Requests come from doc_executor threads, so DOC_WORK_MAX_CONCURRENCY and
+DOC_WORK_MAX_QUEUE bound the job queue; callers block until their pages
+are back.
+
+extract() is one combined pass: each page is parsed once, and its
+page.get_text("text") feeds every requested output:
+  text:      pdf_text.extract_text_page dict   (/api/pdf/text)
+  layout:    pdf_text.extract_layout_page dict (/api/pdf/text_layout)
+  preflight: preflight_engine.compute_page_partial of the page data
+             (text, image coverage, size)       (preflight)
+The first job opens the PDF, resolves the page selection and extracts up
+to PDF_EXTRACT_SHARD_PAGES pages; the remaining pages are sharded across
+the pool and returned in page order.
+
+triage() runs the early-exit gate-only preflight in one worker job.
+
+With PDF_EXTRACT_WORKERS=0 jobs run in the calling thread, without
+timeouts or memory limits (local debugging).
+
+Environment Variables:
+    PDF_EXTRACT_WORKERS: Worker processes (0 runs jobs in-process)
+        Default: PREFLIGHT_POOL_WORKERS, else min(4, cpu_count)
+    PDF_EXTRACT_SHARD_PAGES: Pages per worker job
+        Default: PREFLIGHT_SHARD_PAGES, else 8
+    PDF_EXTRACT_TIMEOUT: Seconds allowed per extraction request
+        Default: 120
+    PDF_EXTRACT_WORKER_MEMORY_MB: Address-space limit per worker (0 = none)
+        Default: 2048
+    PDF_EXTRACT_MAX_TASKS_PER_CHILD: Jobs before a worker is replaced
+        Default: 100
+"""
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger(__name__)
+
+POOL_WORKERS = int(os.environ.get(
+    "PDF_EXTRACT_WORKERS",
+    os.environ.get("PREFLIGHT_POOL_WORKERS", str(min(4, os.cpu_count() or 1))),
+))
+SHARD_PAGES = max(1, int(os.environ.get("PDF_EXTRACT_SHARD_PAGES", os.environ.get("PREFLIGHT_SHARD_PAGES", "8"))))
+TIMEOUT_SECONDS = float(os.environ.get("PDF_EXTRACT_TIMEOUT", "120"))
+WORKER_MEMORY_MB = max(0, int(os.environ.get("PDF_EXTRACT_WORKER_MEMORY_MB", "2048")))
+MAX_TASKS_PER_CHILD = max(1, int(os.environ.get("PDF_EXTRACT_MAX_TASKS_PER_CHILD", "100")))
+
+OUTPUTS = ("text", "layout", "preflight")
+
+_pool = None
+_pool_lock = threading.Lock()
+_stats = {"requests": 0, "jobs": 0, "pages": 0, "timeouts": 0, "crashes": 0, "retries": 0}
+
+
+class ExtractionTimeout(Exception):
+    """An extraction request ran past PDF_EXTRACT_TIMEOUT; its workers were killed."""
+
+
+# --- worker side -------------------------------------------------------------
+
+def _init_worker(memory_mb):
+    if not memory_mb:
+        return
+    try:
+        import resource
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ImportError, ValueError, OSError) as e:
+        logger.warning("[PDF-EXTRACT] worker memory limit not applied: %s", e)
+
+
+def _page_record(page, page_number, want):
+    from server.pdf_text import extract_layout_page, extract_text_page
+    from server.preflight_engine import compute_page_partial
+    from server.preflight_pipeline import extract_page_data
+
+    text = page.get_text("text")
+    record = {"page": page_number}
+    if "text" in want:
+        record["text"] = extract_text_page(page, page_number, text=text)
+    if "layout" in want:
+        record["layout"] = extract_layout_page(page, page_number, text=text)
+    if "preflight" in want:
+        record["preflight"] = compute_page_partial(extract_page_data(page, page_number, text=text))
+    return record
+
+
+def _open(source):
+    import fitz
+    if isinstance(source, str):
+        # Open from memory so errors do not name the spool/temp path
+        with open(source, "rb") as f:
+            source = f.read()
+    return fitz.open(stream=source, filetype="pdf")
+
+
+def _first_job(source, page_spec, skip, want, limit):
+    """Open the PDF, resolve the selection and extract up to limit pages not in skip."""
+    from server.pdf_text import resolve_pages
+
+    doc = _open(source)
+    try:
+        page_count = len(doc)
+        selected = resolve_pages(page_spec, page_count)
+        todo = [n for n in selected if n not in skip]
+        head = todo if limit is None else todo[:limit]
+        records = [_page_record(doc[n - 1], n, want) for n in head]
+        return page_count, selected, todo[len(head):], records
+    finally:
+        doc.close()
+
+
+def _pages_job(source, page_numbers, want):
+    doc = _open(source)
+    try:
+        return [_page_record(doc[n - 1], n, want) for n in page_numbers]
+    finally:
+        doc.close()
+
+
+def _triage_job(source, max_chars_per_page):
+    from server.preflight_engine import IncrementalPreflight
+    from server.preflight_pipeline import extract_page_data
+
+    doc = _open(source)
+    try:
+        inc = IncrementalPreflight(len(doc), max_chars_per_page=max_chars_per_page)
+        for i in range(len(doc)):
+            if inc.add_page(extract_page_data(doc[i], i + 1)):
+                break
+        return inc.gate_summary()
+    finally:
+        doc.close()
+
+
+# --- pool --------------------------------------------------------------------
+
+def _get_pool():
+    global _pool
+    if POOL_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: the API process holds DB pool and event-loop threads
+            _pool = ProcessPoolExecutor(
+                max_workers=POOL_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(WORKER_MEMORY_MB,),
+                max_tasks_per_child=MAX_TASKS_PER_CHILD,
+            )
+            logger.info(
+                "[PDF-EXTRACT] process pool started (workers=%d, memory_mb=%d)",
+                POOL_WORKERS, WORKER_MEMORY_MB,
+            )
+        return _pool
+
+
+def _discard_pool(pool, kill=False):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    if kill:
+        # A wedged parse never returns: terminate the workers so the pool
+        # can shut down. _processes is the executor's own worker map.
+        for proc in list((getattr(pool, "_processes", None) or {}).values()):
+            proc.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+        logger.info("[PDF-EXTRACT] process pool stopped")
+
+
+def extraction_stats():
+    with _pool_lock:
+        s = dict(_stats)
+    s.update({
+        "workers": POOL_WORKERS,
+        "timeout_seconds": TIMEOUT_SECONDS,
+        "worker_memory_mb": WORKER_MEMORY_MB,
+    })
+    return s
+
+
+def _count(key, n=1):
+    with _pool_lock:
+        _stats[key] += n
+
+
+def _result(pool, fut, deadline):
+    try:
+        return fut.result(timeout=max(0.0, deadline - time.monotonic()))
+    except FutureTimeout:
+        _count("timeouts")
+        logger.error("[PDF-EXTRACT] job past %.0fs deadline; killing pool workers", TIMEOUT_SECONDS)
+        _discard_pool(pool, kill=True)
+        raise ExtractionTimeout("PDF extraction timed out after %ds" % TIMEOUT_SECONDS)
+
+
+def _run(job, source):
+    """Run job(pool, path, deadline) with the PDF on disk; retry once if the pool broke under it."""
+    if isinstance(source, str):
+        return _run_with_retry(job, source)
+    fd, path = tempfile.mkstemp(prefix="pdf_extract_", suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(source)
+        return _run_with_retry(job, path)
+    finally:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def _run_with_retry(job, path):
+    deadline = time.monotonic() + TIMEOUT_SECONDS
+    for attempt in (1, 2):
+        pool = _get_pool()
+        try:
+            return job(pool, path, deadline)
+        except BrokenProcessPool:
+            # A worker died (crash, memory limit, or another request's
+            # timeout kill); the job may not be at fault, so retry once.
+            _count("crashes")
+            _discard_pool(pool)
+            if attempt == 2 or time.monotonic() >= deadline:
+                raise
+            _count("retries")
+            logger.warning("[PDF-EXTRACT] process pool broke; retrying on a fresh pool")
+
+
+# --- public API --------------------------------------------------------------
+
+def extract(source, want, page_spec=None, skip=(), on_start=None, on_pages=None):
+    """Extract the selected pages of a PDF (bytes or file path) in one combined pass.
+
+    want is a subset of OUTPUTS. Pages in skip (already cached) are not
+    extracted. on_start(page_count, selected) is called once the PDF is
+    open, on_pages(records) as each job's pages arrive, in page order.
+    Returns (page_count, selected, records); each record is
+    {"page": n, <output>: ...} for every wanted output. Blocking: run via
+    doc_executor. Raises pdf_text.PageRangeError for a bad selection,
+    ExtractionTimeout, or the worker's error for an unreadable PDF.
+    """
+    want = tuple(w for w in OUTPUTS if w in want)
+    skip = frozenset(skip)
+    _count("requests")
+
+    def job(pool, path, deadline):
+        if pool is None:
+            page_count, selected, rest, records = _first_job(path, page_spec, skip, want, None)
+            shards = []
+        else:
+            first = pool.submit(_first_job, path, page_spec, skip, want, SHARD_PAGES)
+            page_count, selected, rest, records = _result(pool, first, deadline)
+            shards = [
+                pool.submit(_pages_job, path, rest[i:i + SHARD_PAGES], want)
+                for i in range(0, len(rest), SHARD_PAGES)
+            ]
+        _count("jobs", 1 + len(shards))
+        if on_start is not None:
+            on_start(page_count, selected)
+        if records and on_pages is not None:
+            on_pages(records)
+        records = list(records)
+        try:
+            for fut in shards:
+                shard_records = _result(pool, fut, deadline)
+                records.extend(shard_records)
+                if on_pages is not None:
+                    on_pages(shard_records)
+        except BrokenProcessPool as e:
+            # Pages were already handed out; a retry would repeat them
+            _count("crashes")
+            _discard_pool(pool)
+            raise RuntimeError("PDF extraction worker crashed") from e
+        finally:
+            for fut in shards:
+                fut.cancel()
+        _count("pages", len(records))
+        return page_count, selected, records
+
+    return _run(job, source)
+
+
+def triage(source, max_chars_per_page):
+    """Gate-only preflight (IncrementalPreflight.gate_summary) in one worker job."""
+    _count("requests")
+
+    def job(pool, path, deadline):
+        _count("jobs")
+        if pool is None:
+            return _triage_job(path, max_chars_per_page)
+        return _result(pool, pool.submit(_triage_job, path, max_chars_per_page), deadline)
+
+    return _run(job, source)
@@ -14,21 +14,29 @@ Environment Variables:
         Default: * (all origins)
     PDF_PROXY_MAX_SIZE_MB: Maximum file size in MB
         Default: 25
+    PDF_PROXY_DNS_TTL_SECONDS: How long a host's checked addresses are reused
+        Default: 60
+
+Outbound fetches share one pooled client; see server/http_client.py for
+its PDF_FETCH_* settings.
 """
 
+import asyncio
+import functools
+import hashlib
+import json
 import os
 import ipaddress
+import re
 import socket
 from urllib.parse import urlparse, unquote
 from typing import Optional
 
 from pathlib import Path
-from fastapi import FastAPI, Query, HTTPException, Response
+from fastapi import FastAPI, Query, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-import httpx
-import fitz  # type: ignore[import-untyped]  # PyMuPDF
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 
 app = FastAPI(
     title="Orchestrate OS PDF Proxy",
@@ -36,9 +44,10 @@ app = FastAPI(
     version="1.1.0"
 )
 
-from server.db import init_pool, close_pool, check_health
+from server.db import init_pool, close_pool, check_health, RequestConnectionMiddleware, PoolExhausted
+from server.db_async import close_pool as close_async_db_pool
 from server.migrate import run_migrations
-from server.api_v25 import router as api_v25_router
+from server.api_v25 import router as api_v25_router, error_envelope
 from server.routes.workspaces import router as workspaces_router
 from server.routes.batches import router as batches_router
 from server.routes.patches import router as patches_router
@@ -65,6 +74,17 @@ from server.routes.ocr_escalations import router as ocr_escalations_router
 from server.routes.suggestions import router as suggestions_router
 from server.routes.glossary import router as glossary_router
 from server.routes.preflight import router as preflight_router
+from server.pdf_extract_service import shutdown_pool as shutdown_extract_pool, extract as extract_pdf
+from server.doc_executor import shutdown_executor as shutdown_doc_executor, run_document_job, ExecutorSaturated
+from server.pdf_text import PageRangeError, parse_page_spec, resolve_pages
+from server.pdf_text_cache import (
+    get_page_count as get_text_page_count, get_pages as get_text_pages, put_pages as put_text_pages,
+)
+from server import pdf_cache
+from server.lru import LRUCache
+from server.http_client import (
+    FetchError, fetch_pdf, open_pdf_stream, iter_pdf_body, start_client, close_client,
+)
 from server.feature_flags import is_enabled, EVIDENCE_INSPECTOR, is_preflight_enabled
 import logging as _logging
 
@@ -72,6 +92,7 @@ import logging as _logging
 def _startup_v25():
     _log = _logging.getLogger("server.startup")
     _logging.basicConfig(level=_logging.INFO, format="%(levelname)s: %(message)s")
+    start_client()
     try:
         run_migrations()
     except Exception as e:
@@ -87,8 +108,20 @@ def _startup_v25():
         _log.error("DB connection verification FAILED (SELECT 1)")
 
 @app.on_event("shutdown")
-def _shutdown_v25():
+async def _shutdown_v25():
+    await close_client()
     close_pool()
+    close_async_db_pool()
+    shutdown_doc_executor()
+    shutdown_extract_pool()
+
+@app.exception_handler(PoolExhausted)
+async def _db_pool_exhausted(request: Request, exc: PoolExhausted):
+    return JSONResponse(
+        status_code=503,
+        headers={"Retry-After": str(exc.retry_after)},
+        content=error_envelope("BUSY", "Database is busy, retry later"),
+    )
 
 @app.get("/api/v2.5/feature-flags")
 def get_feature_flags():
@@ -148,24 +181,62 @@ ALLOWED_ORIGINS = [o.strip() for o in ALLOWED_ORIGINS if o.strip()]
 MAX_SIZE_MB = int(os.environ.get("PDF_PROXY_MAX_SIZE_MB", "25"))
 MAX_SIZE_BYTES = MAX_SIZE_MB * 1024 * 1024
 
+DNS_TTL_SECONDS = float(os.environ.get("PDF_PROXY_DNS_TTL_SECONDS", "60"))
+# hostname -> tuple of checked public addresses; () when the host is blocked
+_dns_cache = LRUCache(256, DNS_TTL_SECONDS)
+
+app.add_middleware(RequestConnectionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=ALLOWED_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["Content-Disposition", "Content-Type", "X-Proxy-Source"],
+    expose_headers=[
+        "Content-Disposition", "Content-Type", "X-Proxy-Source",
+        "Accept-Ranges", "Content-Range", "Content-Length", "X-Proxy-Cache",
+    ],
 )
 
 
-def is_private_ip(hostname: str) -> bool:
-    """Check if hostname resolves to a private IP (SSRF guard)."""
-    try:
-        ip = socket.gethostbyname(hostname)
+def _public_addresses(addrinfo):
+    """Addresses from getaddrinfo() results, or () if any of them is private/reserved."""
+    addresses = []
+    for *_, sockaddr in addrinfo:
+        ip = sockaddr[0].split("%", 1)[0]
         ip_obj = ipaddress.ip_address(ip)
-        return ip_obj.is_private or ip_obj.is_loopback or ip_obj.is_reserved
-    except (socket.gaierror, ValueError):
-        return True
+        if ip_obj.is_private or ip_obj.is_loopback or ip_obj.is_reserved:
+            return ()
+        if ip not in addresses:
+            addresses.append(ip)
+    return tuple(addresses)
+
+
+def _record_addresses(hostname, addrinfo):
+    try:
+        addresses = _public_addresses(addrinfo)
+    except ValueError:
+        addresses = ()
+    _dns_cache.put(hostname.lower(), addresses)
+    return addresses
+
+
+async def resolve_public_host(hostname: str) -> tuple:
+    """Resolve hostname without blocking the event loop (SSRF guard).
+
+    Every A/AAAA record must be public; otherwise, or when the name does
+    not resolve, returns (). Results are cached for DNS_TTL_SECONDS and the
+    shared client connects only to these addresses (server/http_client.py),
+    so the checked IP is the one used.
+    """
+    addresses = _dns_cache.get(hostname.lower())
+    if addresses is not None:
+        return addresses
+    try:
+        addrinfo = await asyncio.get_running_loop().getaddrinfo(hostname, None, type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError):
+        return ()
+    return _record_addresses(hostname, addrinfo)
 
 
 def is_host_allowed(hostname: str) -> bool:
@@ -183,115 +254,126 @@ async def health_check():
     return {"status": "ok", "allowed_hosts": ALLOWED_HOSTS}
 
 
+async def _proxy_body(resp, hostname, url, writer=None):
+    """Relay upstream chunks, teeing them into the disk cache when writer is set.
+
+    On overflow or upstream failure the response is aborted and the partial
+    cache write discarded.
+    """
+    done = False
+    try:
+        async for chunk in iter_pdf_body(resp):
+            if writer is not None:
+                await asyncio.to_thread(writer.write, chunk)
+            yield chunk
+        if writer is not None:
+            await asyncio.to_thread(writer.commit, url, resp.headers)
+        done = True
+    except FetchError as e:
+        # Headers are already sent: dropping the connection is the only
+        # way to tell the client the body is incomplete.
+        _logging.getLogger(__name__).warning("[PDF-PROXY] stream from %s aborted: %s", hostname, e.message)
+        raise
+    finally:
+        if writer is not None and not done:
+            await asyncio.to_thread(writer.abort)
+
+
+_RANGE_RE = re.compile(r"^bytes=(\d+-\d*|-\d+)$")
+
+
+def _forward_range_headers(request: Request) -> dict:
+    """Single byte-range Range (and its If-Range) to send upstream; other forms are ignored."""
+    range_header = (request.headers.get("range") or "").replace(" ", "")
+    if not _RANGE_RE.match(range_header):
+        return {}
+    headers = {"Range": range_header}
+    if_range = request.headers.get("if-range")
+    if if_range:
+        headers["If-Range"] = if_range
+    return headers
+
+
 @app.get("/proxy/pdf")
-async def proxy_pdf(url: str = Query(..., description="URL of the PDF to fetch")):
+async def proxy_pdf(request: Request, url: str = Query(..., description="URL of the PDF to fetch")):
     """
-    Fetch a PDF from an allowlisted host and return it with inline disposition.
+    Fetch a PDF from an allowlisted host and stream it back with inline disposition.
     
     Security:
     - Only allowlisted hosts are permitted
     - Private IPs are blocked (SSRF guard)
-    - Size limit enforced via Content-Length
+    - Size limit enforced via Content-Length, and while streaming the body
+    - Redirects validated hop by hop (server.http_client.open_pdf_stream)
+
+    Upstream chunks are relayed as they arrive, so memory stays flat and
+    the viewer gets its first bytes before the download finishes.
+
+    A single byte-range Range header is forwarded upstream; a 206 answer is
+    passed through with Content-Range, so the browser viewer can load the
+    pages it shows without the whole file. Hosts that ignore Range get a
+    plain 200.
+
+    Full 200 bodies with a validator are written to the disk cache
+    (server/pdf_cache.py) while they stream; cache file I/O runs in worker
+    threads. Later requests revalidate with
+    a conditional GET and a 304 is served from disk, ranges included.
     """
+    range_headers = _forward_range_headers(request)
+    entry = await asyncio.to_thread(pdf_cache.lookup, url)
     try:
-        decoded_url = unquote(url)
-        parsed = urlparse(decoded_url)
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid URL format")
-    
-    if parsed.scheme not in ("http", "https"):
-        raise HTTPException(status_code=400, detail="Only HTTP/HTTPS URLs allowed")
-    
+        # A cached copy is revalidated in full; ranges are then served locally
+        resp = await open_pdf_stream(url, headers=pdf_cache.conditional_headers(entry) or range_headers)
+    except FetchError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message, headers=e.headers)
+
+    parsed = urlparse(unquote(url))
     hostname = parsed.hostname
-    if not hostname:
-        raise HTTPException(status_code=400, detail="Missing hostname in URL")
-    
-    if not is_host_allowed(hostname):
-        raise HTTPException(
-            status_code=403,
-            detail=f"Host not in allowlist: {hostname}"
-        )
-    
-    if is_private_ip(hostname):
-        raise HTTPException(
-            status_code=403,
-            detail="Private/reserved IPs are blocked"
-        )
-    
-    # v1.4.16: Disable redirects and validate final URL for SSRF protection
-    async with httpx.AsyncClient(timeout=30.0, follow_redirects=False) as client:
-        try:
-            # First check size via HEAD (if available)
-            try:
-                head_resp = await client.head(decoded_url)
-                content_length = head_resp.headers.get("content-length")
-                
-                if content_length:
-                    size = int(content_length)
-                    if size > MAX_SIZE_BYTES:
-                        raise HTTPException(
-                            status_code=413,
-                            detail=f"File too large: {size} bytes (max {MAX_SIZE_BYTES})"
-                        )
-                
-                # Handle redirects manually with SSRF validation
-                if head_resp.status_code in (301, 302, 303, 307, 308):
-                    redirect_url = head_resp.headers.get("location")
-                    if redirect_url:
-                        redirect_parsed = urlparse(redirect_url)
-                        redirect_host = redirect_parsed.hostname
-                        if not redirect_host or not is_host_allowed(redirect_host) or is_private_ip(redirect_host):
-                            raise HTTPException(status_code=403, detail="Redirect to non-allowlisted host blocked")
-                        decoded_url = redirect_url
-            except httpx.HTTPStatusError:
-                pass  # Some servers don't support HEAD
-            
-            # Stream response with size enforcement
-            resp = await client.get(decoded_url)
-            
-            # Handle redirects on GET as well
-            if resp.status_code in (301, 302, 303, 307, 308):
-                redirect_url = resp.headers.get("location")
-                if redirect_url:
-                    redirect_parsed = urlparse(redirect_url)
-                    redirect_host = redirect_parsed.hostname
-                    if not redirect_host or not is_host_allowed(redirect_host) or is_private_ip(redirect_host):
-                        raise HTTPException(status_code=403, detail="Redirect to non-allowlisted host blocked")
-                    resp = await client.get(redirect_url)
-            
-            resp.raise_for_status()
-            
-            # Enforce size limit on actual content
-            if len(resp.content) > MAX_SIZE_BYTES:
-                raise HTTPException(
-                    status_code=413,
-                    detail=f"Response too large: {len(resp.content)} bytes (max {MAX_SIZE_BYTES})"
-                )
-            
-        except httpx.TimeoutException:
-            raise HTTPException(status_code=504, detail="Upstream timeout")
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(
-                status_code=e.response.status_code,
-                detail=f"Upstream error: {e.response.status_code}"
-            )
-        except httpx.RequestError as e:
-            raise HTTPException(status_code=502, detail=f"Upstream request failed: {str(e)}")
-    
-    content_type = resp.headers.get("content-type", "application/pdf")
     
     filename = parsed.path.split("/")[-1] or "document.pdf"
     if not filename.lower().endswith(".pdf"):
         filename += ".pdf"
-    
-    return Response(
-        content=resp.content,
-        media_type=content_type,
-        headers={
-            "Content-Disposition": f'inline; filename="{filename}"',
-            "Cache-Control": "public, max-age=3600",
-            "X-Proxy-Source": hostname,
-        }
+
+    headers = {
+        "Content-Disposition": f'inline; filename="{filename}"',
+        "Cache-Control": "public, max-age=3600",
+        "X-Proxy-Source": hostname,
+    }
+
+    if resp.status_code == 304:
+        await resp.aclose()
+        path = await asyncio.to_thread(pdf_cache.hit, entry)
+        if path is not None:
+            for name, key in (("ETag", "etag"), ("Last-Modified", "last_modified")):
+                if entry.get(key):
+                    headers[name] = entry[key]
+            headers["X-Proxy-Cache"] = "HIT"
+            # FileResponse answers Range / If-Range itself
+            return FileResponse(path, media_type=entry["content_type"], headers=headers)
+        try:
+            resp = await open_pdf_stream(url, headers=range_headers)
+        except FetchError as e:
+            raise HTTPException(status_code=e.status_code, detail=e.message, headers=e.headers)
+
+    # aiter_bytes() decodes Content-Encoding, so the upstream length only
+    # holds for identity-encoded bodies.
+    content_length = resp.headers.get("content-length")
+    if content_length and not resp.headers.get("content-encoding"):
+        headers["Content-Length"] = content_length
+    for name in ("Accept-Ranges", "Content-Range", "ETag", "Last-Modified"):
+        value = resp.headers.get(name)
+        if value:
+            headers[name] = value
+
+    writer = None
+    if resp.status_code == 200 and pdf_cache.cacheable(resp.headers):
+        writer = await asyncio.to_thread(pdf_cache.BlobWriter)
+        headers["X-Proxy-Cache"] = "MISS"
+
+    return StreamingResponse(
+        _proxy_body(resp, hostname, url, writer),
+        status_code=206 if resp.status_code == 206 else 200,
+        media_type=resp.headers.get("content-type", "application/pdf"),
+        headers=headers,
     )
 
 
@@ -323,148 +405,187 @@ async def auth_config():
     }
 
 
-@app.get("/api/pdf/text")
-async def pdf_text_extract(url: str = Query(..., description="URL of the PDF to extract text from")):
+def _lookup_text(content, mode, page_spec):
+    """Hash the bytes and collect cached pages. Runs off-loop.
+
+    Returns (content_hash, page_count, selected, cached); page_count and
+    selected are None when nothing is cached for these bytes yet.
     """
-    Fetch a PDF and extract per-page text using PyMuPDF.
-    Returns { pages: [{ page: 1, text: "..." }, ...] }
-    Reuses the same security checks as /proxy/pdf.
+    content_hash = hashlib.sha256(content).hexdigest()
+    page_count = get_text_page_count(content_hash, mode)
+    if page_count is None:
+        return content_hash, None, None, {}
+    selected = resolve_pages(page_spec, page_count)
+    _, cached = get_text_pages(content_hash, mode, selected)
+    return content_hash, page_count, selected, cached
+
+
+def _extract_and_store(content, content_hash, mode, page_spec, skip, on_start=None, on_pages=None):
+    """Extract the uncached pages for mode in the extraction pool and cache them.
+
+    Layout extraction reads the page text anyway, so its pages are also
+    stored as mode "text".
     """
-    try:
-        decoded_url = unquote(url)
-        parsed = urlparse(decoded_url)
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid URL format")
+    want = ("text", "layout") if mode == "layout" else ("text",)
+    page_count, selected, records = extract_pdf(
+        content, want, page_spec, skip=skip, on_start=on_start,
+        on_pages=None if on_pages is None else (lambda batch: on_pages([r[mode] for r in batch])),
+    )
+    pages = [r[mode] for r in records]
+    if pages:
+        put_text_pages(content_hash, mode, page_count, pages)
+        if mode != "text":
+            put_text_pages(content_hash, "text", page_count, [r["text"] for r in records])
+    return page_count, selected, pages
+
+
+def _text_job_error(e, failure_label):
+    if isinstance(e, PageRangeError):
+        return HTTPException(status_code=400, detail=str(e))
+    if isinstance(e, ExecutorSaturated):
+        return HTTPException(
+            status_code=503,
+            detail="PDF workers are saturated, retry later",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    return HTTPException(status_code=422, detail=f"{failure_label} failed: {str(e)}")
 
-    if parsed.scheme not in ("http", "https"):
-        raise HTTPException(status_code=400, detail="Only HTTP/HTTPS URLs allowed")
 
-    hostname = parsed.hostname
-    if not hostname:
-        raise HTTPException(status_code=400, detail="Missing hostname in URL")
+def _ndjson(line):
+    return json.dumps(line) + "\n"
 
-    if not is_host_allowed(hostname):
-        raise HTTPException(status_code=403, detail=f"Host not in allowlist: {hostname}")
 
-    if is_private_ip(hostname):
-        raise HTTPException(status_code=403, detail="Private/reserved IPs are blocked")
+async def _stream_text(content, content_hash, mode, page_spec, page_count, selected, cached, failure_label):
+    """NDJSON response: a meta line, one page line per selected page in order, then an end line.
 
-    async with httpx.AsyncClient(timeout=30.0, follow_redirects=False) as client:
-        try:
-            resp = await client.get(decoded_url)
-            if resp.status_code in (301, 302, 303, 307, 308):
-                redirect_url = resp.headers.get("location")
-                if redirect_url:
-                    redirect_parsed = urlparse(redirect_url)
-                    redirect_host = redirect_parsed.hostname
-                    if not redirect_host or not is_host_allowed(redirect_host) or is_private_ip(redirect_host):
-                        raise HTTPException(status_code=403, detail="Redirect to non-allowlisted host blocked")
-                    resp = await client.get(redirect_url)
-            resp.raise_for_status()
-            if len(resp.content) > MAX_SIZE_BYTES:
-                raise HTTPException(status_code=413, detail="File too large")
-        except httpx.TimeoutException:
-            raise HTTPException(status_code=504, detail="Upstream timeout")
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(status_code=e.response.status_code, detail=f"Upstream error: {e.response.status_code}")
-        except httpx.RequestError as e:
-            raise HTTPException(status_code=502, detail=f"Upstream request failed: {str(e)}")
+    Cached pages are emitted immediately; missing ones as the worker
+    extracts them. Errors before the first line are raised as HTTPException;
+    later ones end the stream with an error line.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    if page_count is None or len(cached) < len(selected):
+        def put(item):
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+
+        job = asyncio.ensure_future(run_document_job(
+            functools.partial(
+                _extract_and_store,
+                on_start=lambda n, sel: put(("start", n, sel)),
+                on_pages=lambda pages: [put(("page", page)) for page in pages],
+            ),
+            content, content_hash, mode, page_spec, set(cached),
+            label="pdf_text_" + mode,
+        ))
+        job.add_done_callback(lambda f: queue.put_nowait(("done", f)))
+        first = await queue.get()
+        if first[0] == "done":
+            raise _text_job_error(first[1].exception(), failure_label)
+        _, page_count, selected = first
+
+    async def lines():
+        yield _ndjson({"type": "meta", "mode": mode, "total_pages": page_count, "pages": selected})
+        for n in selected:
+            page = cached.get(n)
+            if page is None:
+                item = await queue.get()
+                if item[0] == "done":
+                    err = _text_job_error(item[1].exception(), failure_label)
+                    yield _ndjson({"type": "error", "page": n, "status": err.status_code, "error": err.detail})
+                    return
+                page = item[1]
+            yield _ndjson({"type": "page", "data": page})
+        yield _ndjson({"type": "end", "returned": len(selected), "from_cache": len(cached)})
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+async def _extract_text(url, mode, failure_label, pages=None, start_page=None, end_page=None, stream=False):
+    """Fetch url and return the selected page dicts for mode, extracting only uncached pages."""
+    try:
+        page_spec = parse_page_spec(pages, start_page, end_page)
+    except PageRangeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     try:
-        doc = fitz.open(stream=resp.content, filetype="pdf")
-        pages = []
-        for i in range(len(doc)):
-            page = doc[i]
-            text = page.get_text("text")
-            pages.append({"page": i + 1, "text": text})
-        doc.close()
-    except Exception as e:
-        raise HTTPException(status_code=422, detail=f"PDF text extraction failed: {str(e)}")
+        content = await fetch_pdf(url)
+    except FetchError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
 
-    return {"pages": pages, "total_pages": len(pages)}
+    try:
+        content_hash, page_count, selected, cached = await asyncio.to_thread(
+            _lookup_text, content, mode, page_spec,
+        )
+    except PageRangeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
+    if stream:
+        return await _stream_text(content, content_hash, mode, page_spec, page_count, selected, cached, failure_label)
 
-@app.get("/api/pdf/text_layout")
-async def pdf_text_layout(url: str = Query(..., description="URL of the PDF to extract text layout from")):
-    """
-    Fetch a PDF and extract per-page text with layout data (char positions, bboxes).
-    Returns per-page text blocks with coordinates in PDF points.
-    Reuses the same security checks as /proxy/pdf and /api/pdf/text.
-    """
-    try:
-        decoded_url = unquote(url)
-        parsed = urlparse(decoded_url)
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid URL format")
+    if page_count is None or len(cached) < len(selected):
+        try:
+            page_count, selected, extracted = await run_document_job(
+                _extract_and_store, content, content_hash, mode, page_spec, set(cached),
+                label="pdf_text_" + mode,
+            )
+        except Exception as e:
+            raise _text_job_error(e, failure_label)
+        cached = dict(cached)
+        cached.update((p["page"], p) for p in extracted)
+    return {"pages": [cached[n] for n in selected], "total_pages": page_count}
 
-    if parsed.scheme not in ("http", "https"):
-        raise HTTPException(status_code=400, detail="Only HTTP/HTTPS URLs allowed")
 
-    hostname = parsed.hostname
-    if not hostname:
-        raise HTTPException(status_code=400, detail="Missing hostname in URL")
+_PAGES_QUERY = Query(None, description="Pages to return, e.g. 1,3,5-7 or 10- (default: all)")
+_START_PAGE_QUERY = Query(None, description="First page to return (1-based)")
+_END_PAGE_QUERY = Query(None, description="Last page to return (default: last page)")
+_FORMAT_QUERY = Query("json", description="json, or ndjson to stream one page per line")
 
-    if not is_host_allowed(hostname):
-        raise HTTPException(status_code=403, detail=f"Host not in allowlist: {hostname}")
 
-    if is_private_ip(hostname):
-        raise HTTPException(status_code=403, detail="Private/reserved IPs are blocked")
+def _wants_ndjson(format):
+    if format not in ("json", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be 'json' or 'ndjson'")
+    return format == "ndjson"
 
-    async with httpx.AsyncClient(timeout=30.0, follow_redirects=False) as client:
-        try:
-            resp = await client.get(decoded_url)
-            if resp.status_code in (301, 302, 303, 307, 308):
-                redirect_url = resp.headers.get("location")
-                if redirect_url:
-                    redirect_parsed = urlparse(redirect_url)
-                    redirect_host = redirect_parsed.hostname
-                    if not redirect_host or not is_host_allowed(redirect_host) or is_private_ip(redirect_host):
-                        raise HTTPException(status_code=403, detail="Redirect to non-allowlisted host blocked")
-                    resp = await client.get(redirect_url)
-            resp.raise_for_status()
-            if len(resp.content) > MAX_SIZE_BYTES:
-                raise HTTPException(status_code=413, detail="File too large")
-        except httpx.TimeoutException:
-            raise HTTPException(status_code=504, detail="Upstream timeout")
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(status_code=e.response.status_code, detail=f"Upstream error: {e.response.status_code}")
-        except httpx.RequestError as e:
-            raise HTTPException(status_code=502, detail=f"Upstream request failed: {str(e)}")
 
-    try:
-        doc = fitz.open(stream=resp.content, filetype="pdf")
-        pages = []
-        for i in range(len(doc)):
-            page = doc[i]
-            page_rect = page.rect
-            blocks = page.get_text("dict", flags=fitz.TEXT_PRESERVE_WHITESPACE)
-            text_blocks = []
-            for block in blocks.get("blocks", []):
-                if block.get("type") != 0:
-                    continue
-                for line in block.get("lines", []):
-                    for span in line.get("spans", []):
-                        text_blocks.append({
-                            "text": span.get("text", ""),
-                            "bbox": list(span.get("bbox", [0, 0, 0, 0])),
-                            "font": span.get("font", ""),
-                            "size": round(span.get("size", 0), 2),
-                        })
-            full_text = page.get_text("text")
-            pages.append({
-                "page": i + 1,
-                "text": full_text,
-                "char_count": len(full_text),
-                "page_width": round(page_rect.width, 2) if page_rect else 0,
-                "page_height": round(page_rect.height, 2) if page_rect else 0,
-                "coord_space": "pdf_points",
-                "text_blocks": text_blocks,
-            })
-        doc.close()
-    except Exception as e:
-        raise HTTPException(status_code=422, detail=f"PDF text layout extraction failed: {str(e)}")
+@app.get("/api/pdf/text")
+async def pdf_text_extract(
+    url: str = Query(..., description="URL of the PDF to extract text from"),
+    pages: Optional[str] = _PAGES_QUERY,
+    start_page: Optional[str] = _START_PAGE_QUERY,
+    end_page: Optional[str] = _END_PAGE_QUERY,
+    format: str = _FORMAT_QUERY,
+):
+    """
+    Fetch a PDF and extract per-page text using PyMuPDF.
+    Returns { pages: [{ page: 1, text: "..." }, ...], total_pages: N }
+    Reuses the same security checks as /proxy/pdf.
+    pages= or start_page/end_page select pages (total_pages stays the
+    document's count); format=ndjson streams one page per line.
+    Results are cached per page by PDF content hash (server/pdf_text_cache.py).
+    """
+    stream = _wants_ndjson(format)
+    return await _extract_text(url, "text", "PDF text extraction", pages, start_page, end_page, stream)
 
-    return {"pages": pages, "total_pages": len(pages)}
+
+@app.get("/api/pdf/text_layout")
+async def pdf_text_layout(
+    url: str = Query(..., description="URL of the PDF to extract text layout from"),
+    pages: Optional[str] = _PAGES_QUERY,
+    start_page: Optional[str] = _START_PAGE_QUERY,
+    end_page: Optional[str] = _END_PAGE_QUERY,
+    format: str = _FORMAT_QUERY,
+):
+    """
+    Fetch a PDF and extract per-page text with layout data (char positions, bboxes).
+    Returns per-page text blocks with coordinates in PDF points.
+    Reuses the same security checks as /proxy/pdf and /api/pdf/text.
+    pages= or start_page/end_page select pages (total_pages stays the
+    document's count); format=ndjson streams one page per line as it is
+    extracted, so the viewer can render the visible page first.
+    Results are cached per page by PDF content hash (server/pdf_text_cache.py).
+    """
+    stream = _wants_ndjson(format)
+    return await _extract_text(url, "layout", "PDF text layout extraction", pages, start_page, end_page, stream)
 
 
 @app.get("/")
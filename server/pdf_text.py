@@ -0,0 +1,114 @@
+"""
+PyMuPDF text extraction for /api/pdf/text and /api/pdf/text_layout.
+
+Two modes, one page dict per page:
+  text:   {"page", "text"}
+  layout: {"page", "text", "char_count", "page_width", "page_height",
+           "coord_space": "pdf_points", "text_blocks": [{text, bbox, font, size}]}
+
+Page selection: parse_page_spec() turns the pages= / start_page / end_page
+query parameters into ranges; resolve_pages() applies them to the page
+count. Extraction runs in the process pool of server/pdf_extract_service.py,
+which calls these per-page functions.
+
+EXTRACTOR_VERSION identifies the output of both modes. Bump it whenever a
+page dict changes, so results cached under the old version
+(server/pdf_text_cache.py) are not served.
+"""
+import fitz  # type: ignore[import-untyped]  # PyMuPDF
+
+EXTRACTOR_VERSION = "x1"
+
+MODES = ("text", "layout")
+
+
+def extract_text_page(page, page_number, text=None):
+    return {"page": page_number, "text": page.get_text("text") if text is None else text}
+
+
+def extract_layout_page(page, page_number, text=None):
+    """Layout page dict; text is page.get_text("text") when the caller already has it."""
+    page_rect = page.rect
+    blocks = page.get_text("dict", flags=fitz.TEXT_PRESERVE_WHITESPACE)
+    text_blocks = []
+    for block in blocks.get("blocks", []):
+        if block.get("type") != 0:
+            continue
+        for line in block.get("lines", []):
+            for span in line.get("spans", []):
+                text_blocks.append({
+                    "text": span.get("text", ""),
+                    "bbox": list(span.get("bbox", [0, 0, 0, 0])),
+                    "font": span.get("font", ""),
+                    "size": round(span.get("size", 0), 2),
+                })
+    full_text = page.get_text("text") if text is None else text
+    return {
+        "page": page_number,
+        "text": full_text,
+        "char_count": len(full_text),
+        "page_width": round(page_rect.width, 2) if page_rect else 0,
+        "page_height": round(page_rect.height, 2) if page_rect else 0,
+        "coord_space": "pdf_points",
+        "text_blocks": text_blocks,
+    }
+
+
+class PageRangeError(ValueError):
+    """Malformed or out-of-range page selection; routes return 400."""
+
+
+def _page_number(value, name):
+    try:
+        n = int(value)
+    except (TypeError, ValueError):
+        raise PageRangeError("%s must be a positive integer" % name)
+    if n < 1:
+        raise PageRangeError("%s must be a positive integer" % name)
+    return n
+
+
+def parse_page_spec(pages=None, start_page=None, end_page=None):
+    """Parse page selection parameters into [(first, last_or_None), ...], or None for all pages.
+
+    pages is a comma list of numbers and ranges ("1,3,5-7", "10-" for
+    10 to the end); start_page/end_page is a single range. Raises
+    PageRangeError.
+    """
+    if pages is not None and (start_page is not None or end_page is not None):
+        raise PageRangeError("Use either pages or start_page/end_page, not both")
+    if start_page is not None or end_page is not None:
+        first = _page_number(start_page, "start_page") if start_page is not None else 1
+        last = _page_number(end_page, "end_page") if end_page is not None else None
+        if last is not None and last < first:
+            raise PageRangeError("end_page is before start_page")
+        return [(first, last)]
+    if pages is None or not pages.strip():
+        return None
+    spec = []
+    for part in pages.split(","):
+        part = part.strip()
+        if "-" in part:
+            lo, hi = part.split("-", 1)
+            first = _page_number(lo.strip(), "pages")
+            last = _page_number(hi.strip(), "pages") if hi.strip() else None
+            if last is not None and last < first:
+                raise PageRangeError("Invalid page range: %s" % part)
+            spec.append((first, last))
+        else:
+            n = _page_number(part, "pages")
+            spec.append((n, n))
+    return spec
+
+
+def resolve_pages(spec, page_count):
+    """Sorted, de-duplicated page numbers selected by spec. Raises PageRangeError."""
+    if spec is None:
+        return list(range(1, page_count + 1))
+    selected = set()
+    for first, last in spec:
+        last = page_count if last is None else last
+        if first > page_count or last > page_count:
+            raise PageRangeError("Page out of range: document has %d pages" % page_count)
+        selected.update(range(first, last + 1))
+    return sorted(selected)
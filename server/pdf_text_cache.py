@@ -0,0 +1,163 @@
+"""
+Two-tier cache of PDF text extraction output (server/pdf_text.py).
+
+Pages are keyed by (sha256 of the PDF bytes, mode, EXTRACTOR_VERSION,
+page number), so the same bytes under any URL are extracted once per
+extractor version. Rows never change once written.
+
+Tier 1: in-process LRU of page dicts, bounded by page count.
+Tier 2: pdf_text_pages table, one row per page, shared by every worker.
+Each row also records the document's page_count, so page ranges can be
+resolved and a read can tell a complete extraction from a partial one.
+Pages are cached individually: a range request extracts and stores only
+the pages it is missing.
+
+If the DB is unavailable the cache degrades to the LRU alone and logs.
+
+Environment Variables:
+    PDF_TEXT_CACHE_MAX_PAGES: LRU capacity in pages
+        Default: 2048
+    PDF_TEXT_CACHE_TTL_SECONDS: LRU entry lifetime
+        Default: 3600
+"""
+import json
+import logging
+import os
+
+from server.db import get_conn, put_conn
+from server.pdf_text import EXTRACTOR_VERSION
+from server.lru import LRUCache
+
+logger = logging.getLogger(__name__)
+
+MAX_PAGES = int(os.environ.get("PDF_TEXT_CACHE_MAX_PAGES", "2048"))
+TTL_SECONDS = float(os.environ.get("PDF_TEXT_CACHE_TTL_SECONDS", "3600"))
+
+_page_lru = LRUCache(MAX_PAGES, TTL_SECONDS)
+# (content_hash, mode, version) -> page_count
+_count_lru = LRUCache(MAX_PAGES, TTL_SECONDS)
+
+
+def _db_load_pages(content_hash, mode, version, page_numbers):
+    conn = get_conn()
+    try:
+        with conn.cursor() as cur:
+            if page_numbers is None:
+                cur.execute(
+                    """SELECT page, page_count, data FROM pdf_text_pages
+                       WHERE content_hash = %s AND mode = %s AND extractor_version = %s""",
+                    (content_hash, mode, version),
+                )
+            else:
+                cur.execute(
+                    """SELECT page, page_count, data FROM pdf_text_pages
+                       WHERE content_hash = %s AND mode = %s AND extractor_version = %s
+                         AND page = ANY(%s)""",
+                    (content_hash, mode, version, list(page_numbers)),
+                )
+            rows = cur.fetchall()
+        conn.rollback()
+        return rows
+    finally:
+        put_conn(conn)
+
+
+def _db_store_pages(content_hash, mode, version, page_count, pages):
+    conn = get_conn()
+    try:
+        with conn.cursor() as cur:
+            cur.executemany(
+                """INSERT INTO pdf_text_pages
+                   (content_hash, mode, extractor_version, page, page_count, data)
+                   VALUES (%s, %s, %s, %s, %s, %s::jsonb)
+                   ON CONFLICT (content_hash, mode, extractor_version, page) DO NOTHING""",
+                [(content_hash, mode, version, p["page"], page_count, json.dumps(p)) for p in pages],
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        put_conn(conn)
+
+
+def _db_load_page_count(content_hash, mode, version):
+    conn = get_conn()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                """SELECT page_count FROM pdf_text_pages
+                   WHERE content_hash = %s AND mode = %s AND extractor_version = %s
+                   LIMIT 1""",
+                (content_hash, mode, version),
+            )
+            row = cur.fetchone()
+        conn.rollback()
+        return row[0] if row else None
+    finally:
+        put_conn(conn)
+
+
+def get_page_count(content_hash, mode, version=EXTRACTOR_VERSION):
+    """Page count recorded for these bytes, or None when nothing is cached."""
+    doc_key = (content_hash, mode, version)
+    page_count = _count_lru.get(doc_key)
+    if page_count is not None:
+        return page_count
+    try:
+        page_count = _db_load_page_count(content_hash, mode, version)
+    except Exception as e:
+        logger.warning("[PDF-TEXT-CACHE] durable read failed for %s/%s: %s", content_hash[:12], mode, e)
+        return None
+    if page_count is not None:
+        _count_lru.put(doc_key, page_count)
+    return page_count
+
+
+def get_pages(content_hash, mode, page_numbers=None, version=EXTRACTOR_VERSION):
+    """Return (page_count, {page_number: page dict}) for the cached pages.
+
+    page_numbers limits the lookup; None means every page. page_count is
+    None when nothing is cached for these bytes. Callers must not mutate
+    the page dicts.
+    """
+    doc_key = (content_hash, mode, version)
+    page_count = _count_lru.get(doc_key)
+    found = {}
+    missing = page_numbers
+    if page_count is not None:
+        wanted = page_numbers if page_numbers is not None else range(1, page_count + 1)
+        missing = []
+        for n in wanted:
+            cached = _page_lru.get(doc_key + (n,))
+            if cached is None:
+                missing.append(n)
+            else:
+                found[n] = cached
+        if not missing:
+            return page_count, found
+
+    try:
+        rows = _db_load_pages(content_hash, mode, version, missing)
+    except Exception as e:
+        logger.warning("[PDF-TEXT-CACHE] durable read failed for %s/%s: %s", content_hash[:12], mode, e)
+        return page_count, found
+    for page, count, data in rows:
+        found[page] = data
+        page_count = count
+        _page_lru.put(doc_key + (page,), data)
+    if page_count is not None:
+        _count_lru.put(doc_key, page_count)
+    return page_count, found
+
+
+def put_pages(content_hash, mode, page_count, pages, version=EXTRACTOR_VERSION):
+    """Record extracted page dicts in both tiers."""
+    doc_key = (content_hash, mode, version)
+    _count_lru.put(doc_key, page_count)
+    for p in pages:
+        _page_lru.put(doc_key + (p["page"],), p)
+    try:
+        _db_store_pages(content_hash, mode, version, page_count, pages)
+    except Exception as e:
+        logger.warning("[PDF-TEXT-CACHE] durable write failed for %s/%s: %s", content_hash[:12], mode, e)
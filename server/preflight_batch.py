@@ -0,0 +1,230 @@
+"""
+Corpus-level preflight classifier for calibration sweeps.
+
+Replays stored page metrics through the P1E page/doc/gate rules for many
+documents at once. Inputs are columns rather than per-page dicts:
+
+  page_chars        chars on each page, all documents concatenated
+  page_image_ratios image coverage ratio of each page, same order
+  doc_page_counts   number of pages per document (splits the page columns)
+  replacement_ratios, control_ratios  one value per document
+
+classify_corpus() returns page modes, doc modes and gate colors that match
+preflight_engine.reduce_page_partials() for the same inputs, without the
+decision trace or per-page result dicts. Thresholds default to the locked
+engine constants; sweep_thresholds() re-runs the corpus over a grid of
+overrides.
+
+numpy is used when installed; otherwise the same rules run column-wise in
+plain Python. Both paths give identical results.
+"""
+import itertools
+import logging
+from collections import Counter, namedtuple
+
+from server.preflight_engine import (
+    PAGE_CHARS_MIN_SEARCHABLE, PAGE_IMAGE_MAX_SEARCHABLE,
+    PAGE_CHARS_MAX_SCANNED, PAGE_IMAGE_MIN_SCANNED,
+    DOC_MODE_SUPERMAJORITY,
+    GATE_RED_REPLACEMENT_RATIO, GATE_RED_CONTROL_RATIO,
+    GATE_YELLOW_AVG_CHARS, GATE_YELLOW_SPARSE_RATIO, GATE_YELLOW_SPARSE_CHARS,
+)
+
+logger = logging.getLogger(__name__)
+
+MODES = ("SEARCHABLE", "SCANNED", "MIXED")
+GATES = ("GREEN", "YELLOW", "RED")
+
+Thresholds = namedtuple("Thresholds", [
+    "page_chars_min_searchable",
+    "page_image_max_searchable",
+    "page_chars_max_scanned",
+    "page_image_min_scanned",
+    "doc_mode_supermajority",
+    "gate_red_replacement_ratio",
+    "gate_red_control_ratio",
+    "gate_yellow_avg_chars",
+    "gate_yellow_sparse_ratio",
+    "gate_yellow_sparse_chars",
+])
+
+DEFAULT_THRESHOLDS = Thresholds(
+    page_chars_min_searchable=PAGE_CHARS_MIN_SEARCHABLE,
+    page_image_max_searchable=PAGE_IMAGE_MAX_SEARCHABLE,
+    page_chars_max_scanned=PAGE_CHARS_MAX_SCANNED,
+    page_image_min_scanned=PAGE_IMAGE_MIN_SCANNED,
+    doc_mode_supermajority=DOC_MODE_SUPERMAJORITY,
+    gate_red_replacement_ratio=GATE_RED_REPLACEMENT_RATIO,
+    gate_red_control_ratio=GATE_RED_CONTROL_RATIO,
+    gate_yellow_avg_chars=GATE_YELLOW_AVG_CHARS,
+    gate_yellow_sparse_ratio=GATE_YELLOW_SPARSE_RATIO,
+    gate_yellow_sparse_chars=GATE_YELLOW_SPARSE_CHARS,
+)
+
+Corpus = namedtuple("Corpus", [
+    "page_chars", "page_image_ratios", "doc_page_counts",
+    "replacement_ratios", "control_ratios",
+])
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def corpus_from_results(results):
+    """Build a Corpus from stored preflight result dicts (run_preflight output)."""
+    page_chars, page_image_ratios, doc_page_counts = [], [], []
+    replacement_ratios, control_ratios = [], []
+    for result in results:
+        pages = result.get("page_classifications") or []
+        metrics = result.get("metrics") or {}
+        for p in pages:
+            page_chars.append(p["char_count"])
+            page_image_ratios.append(p["image_coverage_ratio"])
+        doc_page_counts.append(len(pages))
+        replacement_ratios.append(metrics.get("replacement_char_ratio", 0.0))
+        control_ratios.append(metrics.get("control_char_ratio", 0.0))
+    return Corpus(page_chars, page_image_ratios, doc_page_counts, replacement_ratios, control_ratios)
+
+
+def _classify_python(corpus, t):
+    page_modes = []
+    for chars, ratio in zip(corpus.page_chars, corpus.page_image_ratios):
+        if chars >= t.page_chars_min_searchable and ratio <= t.page_image_max_searchable:
+            page_modes.append(0)
+        elif chars < t.page_chars_max_scanned and ratio >= t.page_image_min_scanned:
+            page_modes.append(1)
+        else:
+            page_modes.append(2)
+
+    doc_modes, gates = [], []
+    start = 0
+    for n, replacement, control in zip(corpus.doc_page_counts, corpus.replacement_ratios, corpus.control_ratios):
+        if n == 0:
+            doc_modes.append(2)
+            gates.append(2)
+            continue
+        end = start + n
+        modes = page_modes[start:end]
+        chars = corpus.page_chars[start:end]
+        start = end
+
+        if modes.count(0) / n >= t.doc_mode_supermajority:
+            doc_mode = 0
+        elif modes.count(1) / n >= t.doc_mode_supermajority:
+            doc_mode = 1
+        else:
+            doc_mode = 2
+        doc_modes.append(doc_mode)
+
+        if replacement > t.gate_red_replacement_ratio or control > t.gate_red_control_ratio:
+            gates.append(2)
+            continue
+        sparse = sum(1 for c in chars if c < t.gate_yellow_sparse_chars)
+        if (doc_mode == 2 or sum(chars) / n < t.gate_yellow_avg_chars
+                or sparse / n > t.gate_yellow_sparse_ratio):
+            gates.append(1)
+        else:
+            gates.append(0)
+    return page_modes, doc_modes, gates
+
+
+def _classify_numpy(np, corpus, t):
+    chars = np.asarray(corpus.page_chars, dtype=np.float64)
+    ratios = np.asarray(corpus.page_image_ratios, dtype=np.float64)
+    counts = np.asarray(corpus.doc_page_counts, dtype=np.int64)
+    replacement = np.asarray(corpus.replacement_ratios, dtype=np.float64)
+    control = np.asarray(corpus.control_ratios, dtype=np.float64)
+
+    searchable = (chars >= t.page_chars_min_searchable) & (ratios <= t.page_image_max_searchable)
+    scanned = ~searchable & (chars < t.page_chars_max_scanned) & (ratios >= t.page_image_min_scanned)
+    page_modes = np.full(chars.shape, 2, dtype=np.int8)
+    page_modes[scanned] = 1
+    page_modes[searchable] = 0
+
+    # Per-document sums via cumulative sums at document boundaries
+    bounds = np.concatenate(([0], np.cumsum(counts)))
+
+    def per_doc(values):
+        cum = np.concatenate(([0.0], np.cumsum(values, dtype=np.float64)))
+        return cum[bounds[1:]] - cum[bounds[:-1]]
+
+    empty = counts == 0
+    n = np.where(empty, 1, counts).astype(np.float64)
+    searchable_share = per_doc(searchable) / n
+    scanned_share = per_doc(scanned) / n
+    doc_modes = np.full(counts.shape, 2, dtype=np.int8)
+    doc_modes[scanned_share >= t.doc_mode_supermajority] = 1
+    doc_modes[searchable_share >= t.doc_mode_supermajority] = 0
+    doc_modes[empty] = 2
+
+    red = (replacement > t.gate_red_replacement_ratio) | (control > t.gate_red_control_ratio) | empty
+    yellow = (
+        (doc_modes == 2)
+        | (per_doc(chars) / n < t.gate_yellow_avg_chars)
+        | (per_doc(chars < t.gate_yellow_sparse_chars) / n > t.gate_yellow_sparse_ratio)
+    )
+    gates = np.where(red, 2, np.where(yellow, 1, 0)).astype(np.int8)
+    return page_modes.tolist(), doc_modes.tolist(), gates.tolist()
+
+
+def classify_corpus(corpus, thresholds=DEFAULT_THRESHOLDS, use_numpy=True):
+    """Classify every page and document in the corpus.
+
+    Returns {"page_modes", "doc_modes", "gate_colors", "gate_counts"}; mode and
+    gate lists hold the engine's string labels. Documents with no pages are
+    MIXED/RED, as in reduce_page_partials().
+    """
+    if len(corpus.page_chars) != len(corpus.page_image_ratios):
+        raise ValueError("page_chars and page_image_ratios differ in length")
+    if sum(corpus.doc_page_counts) != len(corpus.page_chars):
+        raise ValueError("doc_page_counts do not add up to the number of pages")
+    if not (len(corpus.doc_page_counts) == len(corpus.replacement_ratios) == len(corpus.control_ratios)):
+        raise ValueError("per-document columns differ in length")
+
+    np = _numpy() if use_numpy else None
+    if np is not None:
+        page_modes, doc_modes, gates = _classify_numpy(np, corpus, thresholds)
+    else:
+        page_modes, doc_modes, gates = _classify_python(corpus, thresholds)
+
+    gate_colors = [GATES[g] for g in gates]
+    counts = Counter(gate_colors)
+    return {
+        "page_modes": [MODES[m] for m in page_modes],
+        "doc_modes": [MODES[m] for m in doc_modes],
+        "gate_colors": gate_colors,
+        "gate_counts": {g: counts.get(g, 0) for g in GATES},
+    }
+
+
+def sweep_thresholds(corpus, grid, expected_gates=None, use_numpy=True):
+    """Classify the corpus for every combination of threshold overrides.
+
+    grid maps Thresholds field names to candidate values, e.g.
+    {"gate_yellow_avg_chars": [20, 30, 40]}; unlisted fields keep their
+    defaults. With expected_gates (one color per document) each row also
+    reports how many documents matched. Returns one row per combination:
+    {"thresholds": {...overrides}, "gate_counts": {...}, "matched": n|None}.
+    """
+    unknown = set(grid) - set(Thresholds._fields)
+    if unknown:
+        raise ValueError("Unknown threshold(s): %s" % ", ".join(sorted(unknown)))
+    if expected_gates is not None and len(expected_gates) != len(corpus.doc_page_counts):
+        raise ValueError("expected_gates must have one entry per document")
+
+    names = sorted(grid)
+    rows = []
+    for values in itertools.product(*(grid[name] for name in names)):
+        overrides = dict(zip(names, values))
+        out = classify_corpus(corpus, DEFAULT_THRESHOLDS._replace(**overrides), use_numpy=use_numpy)
+        matched = None
+        if expected_gates is not None:
+            matched = sum(1 for got, want in zip(out["gate_colors"], expected_gates) if got == want)
+        rows.append({"thresholds": overrides, "gate_counts": out["gate_counts"], "matched": matched})
+    logger.info("[PREFLIGHT-SWEEP] %d combinations over %d documents", len(rows), len(corpus.doc_page_counts))
+    return rows
@@ -0,0 +1,213 @@
+"""
+Two-tier preflight result cache for Orchestrate OS.
+
+Tier 1: in-process LRU, bounded by entry count and TTL. Serves repeat reads
+        on the same worker without a DB round-trip.
+Tier 2: preflight_results table keyed by (workspace_id, doc_id), shared by
+        every uvicorn worker and durable across restarts.
+
+Engine output is also cached by PDF content: (sha256 of the bytes,
+preflight_pipeline.RESULT_VERSION) in preflight_content_results, with its own LRU. Those
+entries never change once written, so repeats of identical bytes skip
+extraction entirely.
+
+Per-page metrics (preflight_engine.pack_page_metrics) are stored by
+(sha256, PAGE_METRICS_VERSION) in preflight_page_metrics, DB only; they are
+read in bulk by the re-gate job (server/preflight_regate.py).
+
+Writes go through to both tiers. Reads fall back to the table on an LRU miss
+and repopulate the LRU. The TTL bounds how long one worker can serve a
+result another worker has since rewritten (e.g. after /action).
+
+If the DB is unavailable the cache degrades to the LRU alone and logs.
+
+Environment Variables:
+    PREFLIGHT_CACHE_MAX_ENTRIES: LRU capacity
+        Default: 512
+    PREFLIGHT_CACHE_TTL_SECONDS: LRU entry lifetime
+        Default: 300
+"""
+import json
+import logging
+import os
+
+from server.db import get_conn, put_conn
+from server.lru import LRUCache
+from server.preflight_pipeline import PAGE_METRICS_VERSION, RESULT_VERSION
+
+logger = logging.getLogger(__name__)
+
+MAX_ENTRIES = int(os.environ.get("PREFLIGHT_CACHE_MAX_ENTRIES", "512"))
+TTL_SECONDS = float(os.environ.get("PREFLIGHT_CACHE_TTL_SECONDS", "300"))
+
+
+_lru = LRUCache(MAX_ENTRIES, TTL_SECONDS)
+_content_lru = LRUCache(MAX_ENTRIES, TTL_SECONDS)
+
+
+def _db_load(workspace_id, doc_id):
+    conn = get_conn()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT result FROM preflight_results WHERE workspace_id = %s AND doc_id = %s",
+                (workspace_id, doc_id),
+            )
+            row = cur.fetchone()
+        conn.rollback()
+        return row[0] if row else None
+    finally:
+        put_conn(conn)
+
+
+def _db_store(workspace_id, doc_id, result):
+    conn = get_conn()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                """INSERT INTO preflight_results (workspace_id, doc_id, gate_color, result)
+                   VALUES (%s, %s, %s, %s::jsonb)
+                   ON CONFLICT (workspace_id, doc_id)
+                   DO UPDATE SET
+                     gate_color = EXCLUDED.gate_color,
+                     result = EXCLUDED.result,
+                     updated_at = NOW()""",
+                (workspace_id, doc_id, result.get("gate_color"), json.dumps(result)),
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        put_conn(conn)
+
+
+def get_result(workspace_id, doc_id):
+    """Return the cached preflight result dict or None. Callers must not mutate it."""
+    key = (workspace_id, doc_id)
+    cached = _lru.get(key)
+    if cached is not None:
+        return cached
+    try:
+        stored = _db_load(workspace_id, doc_id)
+    except Exception as e:
+        logger.warning("[PREFLIGHT-CACHE] durable read failed for %s/%s: %s", workspace_id, doc_id, e)
+        return None
+    if stored is not None:
+        _lru.put(key, stored)
+    return stored
+
+
+def put_result(workspace_id, doc_id, result):
+    """Write a preflight result through to both tiers."""
+    _lru.put((workspace_id, doc_id), result)
+    try:
+        _db_store(workspace_id, doc_id, result)
+    except Exception as e:
+        logger.warning("[PREFLIGHT-CACHE] durable write failed for %s/%s: %s", workspace_id, doc_id, e)
+
+
+def _db_load_content(content_hash, engine_version):
+    conn = get_conn()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT result FROM preflight_content_results WHERE content_hash = %s AND engine_version = %s",
+                (content_hash, engine_version),
+            )
+            row = cur.fetchone()
+        conn.rollback()
+        return row[0] if row else None
+    finally:
+        put_conn(conn)
+
+
+def _db_store_content(content_hash, engine_version, result):
+    conn = get_conn()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                """INSERT INTO preflight_content_results
+                   (content_hash, engine_version, gate_color, page_count, result)
+                   VALUES (%s, %s, %s, %s, %s::jsonb)
+                   ON CONFLICT (content_hash, engine_version) DO NOTHING""",
+                (content_hash, engine_version, result.get("gate_color"),
+                 result.get("metrics", {}).get("total_pages"), json.dumps(result)),
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        put_conn(conn)
+
+
+def get_content_result(content_hash, engine_version=RESULT_VERSION):
+    """Return the engine result for these PDF bytes, or None. Callers must not mutate it."""
+    key = (content_hash, engine_version)
+    cached = _content_lru.get(key)
+    if cached is not None:
+        return cached
+    try:
+        stored = _db_load_content(content_hash, engine_version)
+    except Exception as e:
+        logger.warning("[PREFLIGHT-CACHE] durable content read failed for %s: %s", content_hash[:12], e)
+        return None
+    if stored is not None:
+        _content_lru.put(key, stored)
+    return stored
+
+
+def put_content_result(content_hash, result, engine_version=RESULT_VERSION):
+    """Record the engine result for these PDF bytes in both tiers."""
+    _content_lru.put((content_hash, engine_version), result)
+    try:
+        _db_store_content(content_hash, engine_version, result)
+    except Exception as e:
+        logger.warning("[PREFLIGHT-CACHE] durable content write failed for %s: %s", content_hash[:12], e)
+
+
+def _db_store_page_metrics(content_hash, metrics_version, packed):
+    conn = get_conn()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                """INSERT INTO preflight_page_metrics
+                   (content_hash, metrics_version, page_count, metrics)
+                   VALUES (%s, %s, %s, %s::jsonb)
+                   ON CONFLICT (content_hash, metrics_version) DO NOTHING""",
+                (content_hash, metrics_version, packed["pages"], json.dumps(packed)),
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        put_conn(conn)
+
+
+def put_page_metrics(content_hash, packed, metrics_version=PAGE_METRICS_VERSION):
+    """Persist packed per-page metrics for these PDF bytes."""
+    try:
+        _db_store_page_metrics(content_hash, metrics_version, packed)
+    except Exception as e:
+        logger.warning("[PREFLIGHT-CACHE] page metrics write failed for %s: %s", content_hash[:12], e)
+
+
+def get_page_metrics_bulk(content_hashes, metrics_version=PAGE_METRICS_VERSION):
+    """Return {content_hash: packed metrics} for the hashes that have stored metrics."""
+    if not content_hashes:
+        return {}
+    conn = get_conn()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                """SELECT content_hash, metrics FROM preflight_page_metrics
+                   WHERE metrics_version = %s AND content_hash = ANY(%s)""",
+                (metrics_version, list(content_hashes)),
+            )
+            rows = cur.fetchall()
+        conn.rollback()
+        return {row[0]: row[1] for row in rows}
+    finally:
+        put_conn(conn)
@@ -19,6 +19,13 @@ Locked thresholds (P1E):
 
   mojibake_ratio is a display-only metric; it feeds INTO replacement_char_ratio
   but does NOT independently trigger RED or YELLOW.
+
+  Early gate decisions (IncrementalPreflight): with N total pages known up
+  front, the gate is decided as soon as no completion of the remaining pages
+  can change it. This relies on the assumption that no page carries more
+  than STREAM_MAX_CHARS_PER_PAGE chars: an early decision is only the same
+  as run_preflight() on all pages when the unseen pages respect that bound.
+  A seen page over the bound disables early decisions for the document.
 """
 import hashlib
 import logging
@@ -26,6 +33,21 @@ import re
 
 logger = logging.getLogger(__name__)
 
+# Bump when thresholds or metric definitions change: results cached by
+# content hash are only reused for the same engine version.
+ENGINE_VERSION = "p1e.1"
+
+# Bump when the per-page metrics themselves change (count_text_corruption,
+# char counting). Threshold changes bump ENGINE_VERSION only: stored page
+# metrics stay valid and documents can be re-gated without re-extraction.
+METRICS_VERSION = "m1"
+
+# Per-page numbers persisted for re-gating (pack_page_metrics)
+PAGE_METRIC_FIELDS = (
+    "char_count", "image_coverage_ratio",
+    "text_chars", "replacement_chars", "control_chars", "mojibake_chars",
+)
+
 PAGE_CHARS_MIN_SEARCHABLE = 50
 PAGE_IMAGE_MAX_SEARCHABLE = 0.70
 PAGE_CHARS_MAX_SCANNED = 50
@@ -42,6 +64,15 @@ GATE_YELLOW_SPARSE_CHARS = 10
 MAX_CORRUPTION_SAMPLES = 20
 SAMPLE_SNIPPET_RADIUS = 40
 
+# Upper bound on chars per unseen page assumed by IncrementalPreflight when
+# proving a gate early. A dense contract page is ~3-5k chars.
+STREAM_MAX_CHARS_PER_PAGE = 8000
+# Most a single char can add to replacement + mojibake counts: U+FFFD is
+# counted as a replacement char and again by _MOJIBAKE_RE. Every other
+# detector match spans at least one char and the detectors' char sets
+# are disjoint, so no char counts more than twice.
+MAX_CORRUPTION_COUNT_PER_CHAR = 2
+
 
 def classify_page(chars_on_page, image_coverage_ratio):
     if chars_on_page >= PAGE_CHARS_MIN_SEARCHABLE and image_coverage_ratio <= PAGE_IMAGE_MAX_SEARCHABLE:
@@ -51,6 +82,34 @@ def classify_page(chars_on_page, image_coverage_ratio):
     return "MIXED"
 
 
+def union_area(rects):
+    """Area of the union of axis-aligned rects given as (x0, y0, x1, y1).
+
+    Overlapping regions count once. Sweeps the distinct x edges and merges
+    the y spans active in each slab.
+    """
+    rects = [r for r in rects if r[2] > r[0] and r[3] > r[1]]
+    if not rects:
+        return 0.0
+    xs = sorted({x for r in rects for x in (r[0], r[2])})
+    area = 0.0
+    for x_lo, x_hi in zip(xs, xs[1:]):
+        spans = sorted((r[1], r[3]) for r in rects if r[0] <= x_lo and r[2] >= x_hi)
+        covered = 0.0
+        cur_lo = cur_hi = None
+        for lo, hi in spans:
+            if cur_hi is None or lo > cur_hi:
+                if cur_hi is not None:
+                    covered += cur_hi - cur_lo
+                cur_lo, cur_hi = lo, hi
+            elif hi > cur_hi:
+                cur_hi = hi
+        if cur_hi is not None:
+            covered += cur_hi - cur_lo
+        area += covered * (x_hi - x_lo)
+    return area
+
+
 def classify_document(page_modes):
     if not page_modes:
         return "MIXED"
@@ -98,38 +157,53 @@ _REPLACEMENT_CHAR_RE = re.compile(r'\ufffd')
 _CONTROL_CHAR_RE = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
 
 
+def count_text_corruption(text):
+    """Per-page corruption counts: (chars, replacement, control, mojibake).
+
+    Replacement excludes mojibake; compute_text_metrics folds them together.
+    """
+    replacement_chars = text.count('\ufffd')
+    mojibake_chars = len(_MOJIBAKE_RE.findall(text))
+    mojibake_chars += len(_TOFU_RANGES.findall(text))
+    for seq in _MOJIBAKE_SEQUENCES:
+        mojibake_chars += text.count(seq)
+    for cluster in _LATIN_EXT_CLUSTER_RE.finditer(text):
+        mojibake_chars += len(cluster.group())
+    control_chars = 0
+    for ch in text:
+        code = ord(ch)
+        if code < 32 and code not in (9, 10, 13):
+            control_chars += 1
+    return len(text), replacement_chars, control_chars, mojibake_chars
+
+
+def _ratios_from_counts(total_chars, replacement_chars, control_chars, mojibake_chars):
+    if total_chars == 0:
+        return 0.0, 0.0, 0.0
+    replacement_chars += mojibake_chars
+    return replacement_chars / total_chars, control_chars / total_chars, mojibake_chars / total_chars
+
+
 def compute_text_metrics(pages_text):
     total_chars = 0
     replacement_chars = 0
     control_chars = 0
     mojibake_chars = 0
     for text in pages_text:
-        total_chars += len(text)
-        replacement_chars += text.count('\ufffd')
-        mojibake_hits = _MOJIBAKE_RE.findall(text)
-        mojibake_chars += len(mojibake_hits)
-        tofu_hits = _TOFU_RANGES.findall(text)
-        mojibake_chars += len(tofu_hits)
-        for seq in _MOJIBAKE_SEQUENCES:
-            mojibake_chars += text.count(seq)
-        for cluster in _LATIN_EXT_CLUSTER_RE.finditer(text):
-            mojibake_chars += len(cluster.group())
-        for ch in text:
-            code = ord(ch)
-            if code < 32 and code not in (9, 10, 13):
-                control_chars += 1
-    if total_chars == 0:
-        return 0.0, 0.0, 0.0
-    replacement_chars += mojibake_chars
-    return replacement_chars / total_chars, control_chars / total_chars, mojibake_chars / total_chars
+        chars, replacement, control, mojibake = count_text_corruption(text)
+        total_chars += chars
+        replacement_chars += replacement
+        control_chars += control
+        mojibake_chars += mojibake
+    return _ratios_from_counts(total_chars, replacement_chars, control_chars, mojibake_chars)
 
 
-def extract_corruption_samples(pages_text, max_samples=MAX_CORRUPTION_SAMPLES):
+def extract_corruption_samples(pages_text, max_samples=MAX_CORRUPTION_SAMPLES, first_page=1):
     samples = []
     for page_idx, text in enumerate(pages_text):
         if len(samples) >= max_samples:
             break
-        page_num = page_idx + 1
+        page_num = page_idx + first_page
         for m in _REPLACEMENT_CHAR_RE.finditer(text):
             if len(samples) >= max_samples:
                 break
@@ -260,8 +334,68 @@ def derive_cache_identity(workspace_id, file_url):
     return "doc_derived_%s" % h
 
 
-def run_preflight(pages_data):
-    if not pages_data:
+def compute_page_partial(page):
+    """Map step: reduce one page dict to the numbers the gate needs.
+
+    The partial carries no page text, so it is cheap to ship back from a
+    worker process. reduce_page_partials() over the partials of every page,
+    in page order, gives exactly the run_preflight() result.
+    """
+    text = page.get("text", "")
+    char_count = page.get("char_count", len(text))
+    image_ratio = page.get("image_coverage_ratio", 0.0)
+    page_num = page.get("page", 0)
+    text_chars, replacement, control, mojibake = count_text_corruption(text)
+    partial = {
+        "page": page_num,
+        "mode": classify_page(char_count, image_ratio),
+        "char_count": char_count,
+        "image_coverage_ratio": image_ratio,
+        "text_chars": text_chars,
+        "replacement_chars": replacement,
+        "control_chars": control,
+        "mojibake_chars": mojibake,
+        "corruption_samples": extract_corruption_samples([text], first_page=page_num) if text else [],
+    }
+    if "page_width" in page:
+        partial["page_width"] = page["page_width"]
+        partial["page_height"] = page.get("page_height", 0)
+    return partial
+
+
+def pack_page_metrics(partials):
+    """Columnar per-page metrics ({field: [value per page]}) for storage. No text or samples."""
+    packed = {"pages": len(partials)}
+    for field in PAGE_METRIC_FIELDS:
+        packed[field] = [p[field] for p in partials]
+    if partials and all("page_width" in p for p in partials):
+        packed["page_width"] = [p["page_width"] for p in partials]
+        packed["page_height"] = [p["page_height"] for p in partials]
+    return packed
+
+
+def unpack_page_metrics(packed):
+    """Rebuild page partials from pack_page_metrics() output.
+
+    Page modes are re-derived with the current thresholds; corruption
+    samples are not stored, so partials carry none.
+    """
+    partials = []
+    for i in range(packed["pages"]):
+        partial = {"page": i + 1, "corruption_samples": []}
+        for field in PAGE_METRIC_FIELDS:
+            partial[field] = packed[field][i]
+        partial["mode"] = classify_page(partial["char_count"], partial["image_coverage_ratio"])
+        if "page_width" in packed:
+            partial["page_width"] = packed["page_width"][i]
+            partial["page_height"] = packed["page_height"][i]
+        partials.append(partial)
+    return partials
+
+
+def reduce_page_partials(partials):
+    """Reduce step: fold per-page partials into the preflight result."""
+    if not partials:
         return {
             "doc_mode": "MIXED",
             "gate_color": "RED",
@@ -274,26 +408,34 @@ def run_preflight(pages_data):
 
     page_modes = []
     page_char_counts = []
-    pages_text = []
     page_results = []
-
-    for p in pages_data:
-        text = p.get("text", "")
-        char_count = p.get("char_count", len(text))
-        image_ratio = p.get("image_coverage_ratio", 0.0)
-        mode = classify_page(char_count, image_ratio)
-        page_modes.append(mode)
-        page_char_counts.append(char_count)
-        pages_text.append(text)
-        page_results.append({
-            "page": p.get("page", 0),
-            "mode": mode,
-            "char_count": char_count,
-            "image_coverage_ratio": image_ratio,
-        })
+    corruption_samples = []
+    text_chars = replacement_chars = control_chars = mojibake_chars = 0
+
+    for p in partials:
+        page_modes.append(p["mode"])
+        page_char_counts.append(p["char_count"])
+        text_chars += p["text_chars"]
+        replacement_chars += p["replacement_chars"]
+        control_chars += p["control_chars"]
+        mojibake_chars += p["mojibake_chars"]
+        if len(corruption_samples) < MAX_CORRUPTION_SAMPLES:
+            corruption_samples.extend(p["corruption_samples"][:MAX_CORRUPTION_SAMPLES - len(corruption_samples)])
+        page_result = {
+            "page": p["page"],
+            "mode": p["mode"],
+            "char_count": p["char_count"],
+            "image_coverage_ratio": p["image_coverage_ratio"],
+        }
+        if "page_width" in p:
+            page_result["page_width"] = p["page_width"]
+            page_result["page_height"] = p["page_height"]
+        page_results.append(page_result)
 
     doc_mode = classify_document(page_modes)
-    replacement_ratio, control_ratio, mojibake_ratio = compute_text_metrics(pages_text)
+    replacement_ratio, control_ratio, mojibake_ratio = _ratios_from_counts(
+        text_chars, replacement_chars, control_chars, mojibake_chars
+    )
     total_chars = sum(page_char_counts)
     avg_chars = total_chars / len(page_char_counts) if page_char_counts else 0.0
 
@@ -302,8 +444,6 @@ def run_preflight(pages_data):
         avg_chars, page_char_counts
     )
 
-    corruption_samples = extract_corruption_samples(pages_text)
-
     return {
         "doc_mode": doc_mode,
         "gate_color": gate_color,
@@ -312,7 +452,7 @@ def run_preflight(pages_data):
         "corruption_samples": corruption_samples,
         "page_classifications": page_results,
         "metrics": {
-            "total_pages": len(pages_data),
+            "total_pages": len(partials),
             "total_chars": total_chars,
             "avg_chars_per_page": round(avg_chars, 2),
             "replacement_char_ratio": round(replacement_ratio, 6),
@@ -323,3 +463,116 @@ def run_preflight(pages_data):
             "mixed_pages": sum(1 for m in page_modes if m == "MIXED"),
         },
     }
+
+
+def run_preflight(pages_data):
+    return reduce_page_partials([compute_page_partial(p) for p in pages_data])
+
+
+class IncrementalPreflight:
+    """Preflight over pages fed one at a time, in page order.
+
+    Keeps running totals so decided_gate() can report the gate color before
+    every page has been extracted, once it is provably fixed. The proof
+    assumes unseen pages carry at most max_chars_per_page chars; if a seen
+    page breaks that bound, no early decision is made for the document.
+    """
+
+    def __init__(self, total_pages, max_chars_per_page=STREAM_MAX_CHARS_PER_PAGE):
+        self.total_pages = total_pages
+        self.max_chars_per_page = max_chars_per_page
+        self.partials = []
+        self._text_chars = 0
+        self._replacement_chars = 0
+        self._control_chars = 0
+        self._mojibake_chars = 0
+        self._char_sum = 0
+        self._searchable = 0
+        self._scanned = 0
+        self._sparse = 0
+        self._bound_violated = False
+
+    @property
+    def pages_seen(self):
+        return len(self.partials)
+
+    @property
+    def complete(self):
+        return self.pages_seen >= self.total_pages
+
+    def add_page(self, page):
+        """Consume the next page dict. Returns the decided gate color or None."""
+        partial = compute_page_partial(page)
+        self.partials.append(partial)
+        self._text_chars += partial["text_chars"]
+        self._replacement_chars += partial["replacement_chars"]
+        self._control_chars += partial["control_chars"]
+        self._mojibake_chars += partial["mojibake_chars"]
+        self._char_sum += partial["char_count"]
+        if partial["mode"] == "SEARCHABLE":
+            self._searchable += 1
+        elif partial["mode"] == "SCANNED":
+            self._scanned += 1
+        if partial["char_count"] < GATE_YELLOW_SPARSE_CHARS:
+            self._sparse += 1
+        if max(partial["text_chars"], partial["char_count"]) > self.max_chars_per_page:
+            self._bound_violated = True
+        return self.decided_gate()
+
+    def decided_gate(self):
+        """Gate color if no completion of the unseen pages can change it, else None."""
+        if self.total_pages <= 0:
+            return "RED"
+        if self.complete:
+            return self.result()["gate_color"]
+        if self._bound_violated:
+            return None
+
+        n = self.total_pages
+        remaining = n - self.pages_seen
+        max_extra = self.max_chars_per_page * remaining
+        replacement = self._replacement_chars + self._mojibake_chars
+
+        # RED is fixed if the ratio stays above threshold even when every
+        # unseen page is full-size and clean.
+        lo_den = self._text_chars + max_extra
+        if lo_den > 0 and (replacement / lo_den > GATE_RED_REPLACEMENT_RATIO
+                           or self._control_chars / lo_den > GATE_RED_CONTROL_RATIO):
+            return "RED"
+        # RED is still reachable if full-size fully corrupt pages could push
+        # either ratio over its threshold.
+        if (replacement + MAX_CORRUPTION_COUNT_PER_CHAR * max_extra) / lo_den > GATE_RED_REPLACEMENT_RATIO:
+            return None
+        if (self._control_chars + max_extra) / lo_den > GATE_RED_CONTROL_RATIO:
+            return None
+
+        mixed_certain = ((self._searchable + remaining) / n < DOC_MODE_SUPERMAJORITY
+                         and (self._scanned + remaining) / n < DOC_MODE_SUPERMAJORITY)
+        mixed_possible = not (self._searchable / n >= DOC_MODE_SUPERMAJORITY
+                              or self._scanned / n >= DOC_MODE_SUPERMAJORITY)
+        avg_low_certain = (self._char_sum + max_extra) / n < GATE_YELLOW_AVG_CHARS
+        avg_low_possible = self._char_sum / n < GATE_YELLOW_AVG_CHARS
+        sparse_certain = self._sparse / n > GATE_YELLOW_SPARSE_RATIO
+        sparse_possible = (self._sparse + remaining) / n > GATE_YELLOW_SPARSE_RATIO
+
+        if mixed_certain or avg_low_certain or sparse_certain:
+            return "YELLOW"
+        if not (mixed_possible or avg_low_possible or sparse_possible):
+            return "GREEN"
+        return None
+
+    def result(self):
+        """Full-detail result (decision trace, samples). Requires every page."""
+        if not self.complete:
+            raise ValueError("IncrementalPreflight.result() needs all %d pages, have %d"
+                             % (self.total_pages, self.pages_seen))
+        return reduce_page_partials(self.partials)
+
+    def gate_summary(self):
+        gate_color = self.decided_gate()
+        return {
+            "gate_color": gate_color,
+            "decided_early": gate_color is not None and not self.complete,
+            "pages_examined": self.pages_seen,
+            "total_pages": self.total_pages,
+        }
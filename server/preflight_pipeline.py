@@ -0,0 +1,122 @@
+"""
+Preflight pipeline for Orchestrate OS.
+
+Page extraction runs on the process pool of server/pdf_extract_service.py
+(sharded, with per-request timeouts and worker memory limits). Each worker
+extracts text and image coverage for its pages (extract_page_data) and
+returns per-page partials (preflight_engine.compute_page_partial). The
+reduce step is preflight_engine.reduce_page_partials, so doc_mode, gate and
+decision trace are identical to the serial run_preflight() path.
+
+triage_pdf() is the gate-only variant: it feeds pages to an
+IncrementalPreflight as they are extracted and stops as soon as the gate
+color is provably fixed.
+
+Image coverage has two estimators, selected by PREFLIGHT_IMAGE_COVERAGE:
+  v1: sum of page.get_image_rects(xref) areas per image XObject, clamped to
+      1.0. Overlaps are double-counted; one lookup per image is slow on
+      scans built from many tiles. Default, matches calibrated fixtures.
+  v2: one page.get_image_info() pass over the page's display list, clipped
+      to the page, union area via preflight_engine.union_area.
+The estimator is part of RESULT_VERSION, so content-hash cached results
+from one estimator are never served for the other.
+
+Environment Variables:
+    PREFLIGHT_IMAGE_COVERAGE: Image coverage estimator (v1 | v2)
+        Default: v1
+Pool size and shard size: PDF_EXTRACT_WORKERS / PDF_EXTRACT_SHARD_PAGES
+(PREFLIGHT_POOL_WORKERS / PREFLIGHT_SHARD_PAGES are still read as
+fallbacks), see server/pdf_extract_service.py.
+"""
+import logging
+import os
+
+from server import pdf_extract_service
+from server.preflight_engine import (
+    ENGINE_VERSION, METRICS_VERSION, STREAM_MAX_CHARS_PER_PAGE,
+    reduce_page_partials, union_area,
+)
+
+logger = logging.getLogger(__name__)
+
+IMAGE_COVERAGE_VERSIONS = ("v1", "v2")
+IMAGE_COVERAGE_VERSION = os.environ.get("PREFLIGHT_IMAGE_COVERAGE", "v1").strip().lower()
+if IMAGE_COVERAGE_VERSION not in IMAGE_COVERAGE_VERSIONS:
+    logger.warning("Unknown PREFLIGHT_IMAGE_COVERAGE=%s, using v1", IMAGE_COVERAGE_VERSION)
+    IMAGE_COVERAGE_VERSION = "v1"
+
+# Version stamped on results and used for content-hash caching
+RESULT_VERSION = "%s+img.%s" % (ENGINE_VERSION, IMAGE_COVERAGE_VERSION)
+# Version of stored per-page metrics; independent of gate thresholds
+PAGE_METRICS_VERSION = "%s+img.%s" % (METRICS_VERSION, IMAGE_COVERAGE_VERSION)
+
+def _image_area_v1(page):
+    image_area = 0
+    for img in page.get_images(full=True):
+        try:
+            xref = img[0]
+            img_rects = page.get_image_rects(xref)
+            for r in img_rects:
+                image_area += r.width * r.height
+        except Exception:
+            pass
+    return image_area
+
+
+def _image_area_v2(page, page_rect):
+    rects = []
+    for info in page.get_image_info():
+        x0, y0, x1, y1 = info["bbox"]
+        rects.append((
+            max(x0, page_rect.x0), max(y0, page_rect.y0),
+            min(x1, page_rect.x1), min(y1, page_rect.y1),
+        ))
+    return union_area(rects)
+
+
+def extract_page_data(page, page_number, coverage_version=None, text=None):
+    """Extract the preflight page dict (text, image coverage, size) from a fitz page.
+
+    text is page.get_text("text") when the caller already has it.
+    """
+    coverage_version = coverage_version or IMAGE_COVERAGE_VERSION
+    if text is None:
+        text = page.get_text("text")
+    page_rect = page.rect
+    page_area = page_rect.width * page_rect.height if page_rect else 1
+    if coverage_version == "v2":
+        image_area = _image_area_v2(page, page_rect)
+    else:
+        image_area = _image_area_v1(page)
+    image_ratio = min(image_area / page_area, 1.0) if page_area > 0 else 0.0
+    return {
+        "page": page_number,
+        "text": text,
+        "char_count": len(text),
+        "image_coverage_ratio": round(image_ratio, 4),
+        "page_width": round(page_rect.width, 2) if page_rect else 0,
+        "page_height": round(page_rect.height, 2) if page_rect else 0,
+    }
+
+
+def analyze_pdf(source):
+    """Run preflight on PDF bytes or a PDF file path. Returns the run_preflight() result dict.
+
+    Raises on unreadable PDFs; callers map that to EXTRACTION_ERROR.
+    """
+    return reduce_page_partials(analyze_pdf_partials(source))
+
+
+def analyze_pdf_partials(source):
+    """Per-page partials (compute_page_partial) for every page, in order."""
+    _, _, records = pdf_extract_service.extract(source, ("preflight",))
+    return [r["preflight"] for r in records]
+
+
+def triage_pdf(source, max_chars_per_page=STREAM_MAX_CHARS_PER_PAGE):
+    """Gate-only preflight: extract pages in order until the gate is decided.
+
+    Returns IncrementalPreflight.gate_summary(). No decision trace; use
+    analyze_pdf() when the full result is needed.
+    """
+    return pdf_extract_service.triage(source, max_chars_per_page)
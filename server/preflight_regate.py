@@ -0,0 +1,119 @@
+"""
+Re-gate stored preflight results from persisted per-page metrics.
+
+After gate thresholds change (ENGINE_VERSION bump), every cached result in
+a workspace can be recomputed from the page metrics stored at analysis time
+(preflight_page_metrics), without downloading or parsing any PDF:
+unpack_page_metrics() re-derives page modes with the current thresholds and
+reduce_page_partials() recomputes doc mode, gate and decision trace.
+
+Corruption samples and action fields (action_taken, evidence_pack_id, ...)
+are carried over from the stored result; samples do not depend on
+thresholds. The recomputed engine output is also recorded under the current
+RESULT_VERSION in the content-hash cache.
+
+Results without a content_hash (stored before content dedup) or without
+stored metrics (analysed before metrics were persisted, or under another
+PAGE_METRICS_VERSION) are skipped and counted; re-run /run for those.
+"""
+import logging
+from datetime import datetime, timezone
+
+from server.db import get_conn, put_conn
+from server.preflight_engine import reduce_page_partials, unpack_page_metrics
+from server.preflight_pipeline import RESULT_VERSION
+from server.preflight_cache import get_page_metrics_bulk, put_content_result, put_result
+
+logger = logging.getLogger(__name__)
+
+# Engine fields recomputed on re-gate; everything else on a result is kept
+REGATED_FIELDS = (
+    "doc_mode", "gate_color", "gate_reasons", "decision_trace",
+    "page_classifications", "metrics",
+)
+
+
+def _load_workspace_results(workspace_id):
+    conn = get_conn()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT doc_id, result FROM preflight_results WHERE workspace_id = %s ORDER BY doc_id",
+                (workspace_id,),
+            )
+            rows = cur.fetchall()
+        conn.rollback()
+        return rows
+    finally:
+        put_conn(conn)
+
+
+def regate_result(stored, packed):
+    """Recompute the engine fields of one stored result from its packed page metrics."""
+    engine_result = reduce_page_partials(unpack_page_metrics(packed))
+    engine_result["corruption_samples"] = stored.get("corruption_samples", [])
+    engine_result["content_hash"] = stored["content_hash"]
+    engine_result["engine_version"] = RESULT_VERSION
+
+    updated = dict(stored)
+    for field in REGATED_FIELDS:
+        updated[field] = engine_result[field]
+    updated["engine_version"] = RESULT_VERSION
+    updated["regated_at"] = datetime.now(timezone.utc).isoformat()
+    updated["previous_gate_color"] = stored.get("gate_color")
+    return engine_result, updated
+
+
+def regate_workspace(workspace_id, dry_run=False):
+    """Re-gate every stored preflight result in a workspace. Blocking; run off-loop.
+
+    Returns a summary: counts of documents, re-gated, changed and skipped
+    results, the new gate distribution and the list of changed doc_ids.
+    """
+    rows = _load_workspace_results(workspace_id)
+    hashes = {r[1].get("content_hash") for r in rows if r[1].get("content_hash")}
+    metrics_by_hash = get_page_metrics_bulk(hashes)
+
+    summary = {
+        "workspace_id": workspace_id,
+        "engine_version": RESULT_VERSION,
+        "dry_run": dry_run,
+        "documents": len(rows),
+        "regated": 0,
+        "changed": [],
+        "skipped": {"no_content_hash": 0, "no_metrics": 0},
+        "gate_counts": {"GREEN": 0, "YELLOW": 0, "RED": 0},
+    }
+    regated_hashes = set()
+    for doc_id, stored in rows:
+        content_hash = stored.get("content_hash")
+        if not content_hash:
+            summary["skipped"]["no_content_hash"] += 1
+            continue
+        packed = metrics_by_hash.get(content_hash)
+        if packed is None:
+            summary["skipped"]["no_metrics"] += 1
+            continue
+
+        engine_result, updated = regate_result(stored, packed)
+        summary["regated"] += 1
+        summary["gate_counts"][updated["gate_color"]] += 1
+        if stored.get("gate_color") != updated["gate_color"]:
+            summary["changed"].append({
+                "doc_id": doc_id,
+                "from": stored.get("gate_color"),
+                "to": updated["gate_color"],
+            })
+        if dry_run:
+            continue
+        put_result(workspace_id, doc_id, updated)
+        if content_hash not in regated_hashes:
+            put_content_result(content_hash, engine_result)
+            regated_hashes.add(content_hash)
+
+    logger.info(
+        "[PREFLIGHT-REGATE] ws=%s docs=%d regated=%d changed=%d skipped=%s dry_run=%s",
+        workspace_id, summary["documents"], summary["regated"], len(summary["changed"]),
+        summary["skipped"], dry_run,
+    )
+    return summary
@@ -5,7 +5,8 @@ from datetime import datetime, timezone
 from fastapi import APIRouter, Depends, Query, Request
 from fastapi.responses import JSONResponse
 
-from server.db import get_conn, put_conn
+from server import db_async
+from server.db import PoolExhausted, get_conn, put_conn
 from server.ulid import generate_id
 from server.api_v25 import envelope, collection_envelope, error_envelope
 from server.auth import AuthClass, require_auth
@@ -34,7 +35,7 @@ def _row_to_dict(row, columns):
 
 
 @router.get("/batches/{bat_id}/accounts")
-def list_accounts(
+async def list_accounts(
     bat_id: str,
     cursor: str = Query(None),
     limit: int = Query(50, ge=1, le=200),
@@ -44,10 +45,9 @@ def list_accounts(
     if isinstance(auth, JSONResponse):
         return auth
 
-    conn = get_conn()
     try:
-        with conn.cursor() as cur:
-            cur.execute(
+        async with db_async.cursor() as cur:
+            await cur.execute(
                 "SELECT id, workspace_id FROM batches WHERE id = %s AND deleted_at IS NULL",
                 (bat_id,),
             )
@@ -71,7 +71,7 @@ def list_accounts(
             sql = "SELECT %s FROM accounts %s ORDER BY id ASC LIMIT %%s" % (ACCOUNT_SELECT, where)
             params.append(limit + 1)
 
-            cur.execute(sql, params)
+            await cur.execute(sql, params)
             rows = cur.fetchall()
 
         has_more = len(rows) > limit
@@ -82,12 +82,11 @@ def list_accounts(
         next_cursor = items[-1]["id"] if items and has_more else None
 
         return collection_envelope(items, cursor=next_cursor, has_more=has_more, limit=limit)
+    except PoolExhausted:
+        raise
     except Exception as e:
         logger.error("list_accounts error: %s", e)
-        conn.rollback()
         return JSONResponse(status_code=500, content=error_envelope("INTERNAL", str(e)))
-    finally:
-        put_conn(conn)
 
 
 @router.post("/batches/{bat_id}/accounts", status_code=201)
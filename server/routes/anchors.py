@@ -6,7 +6,8 @@ from datetime import datetime
 from fastapi import APIRouter, Depends, Query
 from fastapi.responses import JSONResponse
 
-from server.db import get_conn, put_conn
+from server import db_async
+from server.db import PoolExhausted, get_conn, put_conn
 from server.ulid import generate_id
 from server.api_v25 import envelope, collection_envelope, error_envelope
 from server.auth import AuthClass, require_auth
@@ -167,7 +168,7 @@ def create_anchor(
 
 
 @router.get("/documents/{doc_id}/anchors")
-def list_anchors(
+async def list_anchors(
     doc_id: str,
     cursor: str = Query(None),
     limit: int = Query(50, ge=1, le=200),
@@ -182,10 +183,9 @@ def list_anchors(
     if gate:
         return gate
 
-    conn = get_conn()
     try:
-        with conn.cursor() as cur:
-            cur.execute(
+        async with db_async.cursor() as cur:
+            await cur.execute(
                 "SELECT id FROM documents WHERE id = %s AND deleted_at IS NULL",
                 (doc_id,),
             )
@@ -213,7 +213,7 @@ def list_anchors(
             sql = "SELECT %s FROM anchors %s ORDER BY id ASC LIMIT %%s" % (ANCHOR_SELECT, where)
             params.append(str(limit + 1))
 
-            cur.execute(sql, params)
+            await cur.execute(sql, params)
             rows = cur.fetchall()
 
         has_more = len(rows) > limit
@@ -224,12 +224,11 @@ def list_anchors(
         next_cursor = items[-1]["id"] if items and has_more else None
 
         return collection_envelope(items, cursor=next_cursor, has_more=has_more, limit=limit)
+    except PoolExhausted:
+        raise
     except Exception as e:
         logger.error("list_anchors error: %s", e)
-        conn.rollback()
         return JSONResponse(status_code=500, content=error_envelope("INTERNAL", str(e)))
-    finally:
-        put_conn(conn)
 
 
 @router.delete("/anchors/{anchor_id}")
@@ -5,7 +5,8 @@ from datetime import datetime, timezone
 from fastapi import APIRouter, Depends, Query, Request
 from fastapi.responses import JSONResponse
 
-from server.db import get_conn, put_conn
+from server import db_async
+from server.db import PoolExhausted, get_conn, put_conn
 from server.ulid import generate_id
 from server.api_v25 import envelope, collection_envelope, error_envelope
 from server.auth import AuthClass, require_auth
@@ -34,7 +35,7 @@ def _row_to_dict(row, columns):
 
 
 @router.get("/workspaces/{ws_id}/annotations")
-def list_annotations(
+async def list_annotations(
     ws_id: str,
     cursor: str = Query(None),
     limit: int = Query(50, ge=1, le=200),
@@ -44,10 +45,9 @@ def list_annotations(
     if isinstance(auth, JSONResponse):
         return auth
 
-    conn = get_conn()
     try:
-        with conn.cursor() as cur:
-            cur.execute("SELECT id FROM workspaces WHERE id = %s AND deleted_at IS NULL", (ws_id,))
+        async with db_async.cursor() as cur:
+            await cur.execute("SELECT id FROM workspaces WHERE id = %s AND deleted_at IS NULL", (ws_id,))
             if not cur.fetchone():
                 return JSONResponse(
                     status_code=404,
@@ -67,7 +67,7 @@ def list_annotations(
             sql = "SELECT %s FROM annotations %s ORDER BY id ASC LIMIT %%s" % (ANNOTATION_SELECT, where)
             params.append(limit + 1)
 
-            cur.execute(sql, params)
+            await cur.execute(sql, params)
             rows = cur.fetchall()
 
         has_more = len(rows) > limit
@@ -78,12 +78,11 @@ def list_annotations(
         next_cursor = items[-1]["id"] if items and has_more else None
 
         return collection_envelope(items, cursor=next_cursor, has_more=has_more, limit=limit)
+    except PoolExhausted:
+        raise
     except Exception as e:
         logger.error("list_annotations error: %s", e)
-        conn.rollback()
         return JSONResponse(status_code=500, content=error_envelope("INTERNAL", str(e)))
-    finally:
-        put_conn(conn)
 
 
 @router.post("/workspaces/{ws_id}/annotations", status_code=201)
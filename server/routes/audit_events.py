@@ -4,7 +4,8 @@ from datetime import datetime
 from fastapi import APIRouter, Depends, Query
 from fastapi.responses import JSONResponse
 
-from server.db import get_conn, put_conn
+from server import db_async
+from server.db import PoolExhausted, get_conn, put_conn
 from server.api_v25 import envelope, collection_envelope, error_envelope
 from server.auth import AuthClass, require_auth
 
@@ -31,7 +32,7 @@ def _row_to_dict(row, columns):
 
 
 @router.get("/workspaces/{ws_id}/audit-events")
-def list_audit_events(
+async def list_audit_events(
     ws_id: str,
     cursor: str = Query(None),
     limit: int = Query(50, ge=1, le=200),
@@ -47,10 +48,9 @@ def list_audit_events(
     if isinstance(auth, JSONResponse):
         return auth
 
-    conn = get_conn()
     try:
-        with conn.cursor() as cur:
-            cur.execute("SELECT id FROM workspaces WHERE id = %s AND deleted_at IS NULL", (ws_id,))
+        async with db_async.cursor() as cur:
+            await cur.execute("SELECT id FROM workspaces WHERE id = %s AND deleted_at IS NULL", (ws_id,))
             if not cur.fetchone():
                 return JSONResponse(
                     status_code=404,
@@ -89,7 +89,7 @@ def list_audit_events(
             sql = "SELECT %s FROM audit_events %s ORDER BY id ASC LIMIT %%s" % (AUDIT_SELECT, where)
             params.append(limit + 1)
 
-            cur.execute(sql, params)
+            await cur.execute(sql, params)
             rows = cur.fetchall()
 
         has_more = len(rows) > limit
@@ -100,12 +100,11 @@ def list_audit_events(
         next_cursor = items[-1]["id"] if items and has_more else None
 
         return collection_envelope(items, cursor=next_cursor, has_more=has_more, limit=limit)
+    except PoolExhausted:
+        raise
     except Exception as e:
         logger.error("list_audit_events error: %s", e)
-        conn.rollback()
         return JSONResponse(status_code=500, content=error_envelope("INTERNAL", str(e)))
-    finally:
-        put_conn(conn)
 
 
 @router.get("/audit-events/{aud_id}")
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import os
 
@@ -73,6 +74,11 @@ async def verify_google_token(request: Request):
             content=error_envelope("UNAUTHORIZED", "Google token missing email claim"),
         )
 
+    return await asyncio.to_thread(_sign_in_google_user, workspace_id, google_email, google_sub, google_name, google_picture)
+
+
+def _sign_in_google_user(workspace_id, google_email, google_sub, google_name, google_picture):
+    """Match the Google identity to an active user with a workspace role and issue a JWT."""
     conn = get_conn()
     try:
         with conn.cursor() as cur:
@@ -175,7 +181,7 @@ async def get_auth_config():
 @router.get("/me")
 async def get_current_user(request: Request):
     from server.auth import resolve_auth
-    auth_result, auth_type = resolve_auth(request)
+    auth_result, auth_type = await resolve_auth(request)
 
     if auth_result is None:
         return JSONResponse(
@@ -6,7 +6,8 @@ from datetime import datetime, timezone
 from fastapi import APIRouter, Depends, Query
 from fastapi.responses import JSONResponse
 
-from server.db import get_conn, put_conn
+from server import db_async
+from server.db import PoolExhausted, get_conn, put_conn
 from server.ulid import generate_id
 from server.api_v25 import envelope, collection_envelope, error_envelope
 from server.auth import AuthClass, require_auth, get_workspace_role
@@ -372,7 +373,7 @@ def update_correction(
 
 
 @router.get("/batches/{bat_id}/corrections")
-def list_batch_corrections(
+async def list_batch_corrections(
     bat_id: str,
     status: str = Query(None),
     cursor: str = Query(None),
@@ -385,10 +386,9 @@ def list_batch_corrections(
     if gate:
         return gate
 
-    conn = get_conn()
     try:
-        with conn.cursor() as cur:
-            cur.execute("SELECT id FROM batches WHERE id = %s AND deleted_at IS NULL", (bat_id,))
+        async with db_async.cursor() as cur:
+            await cur.execute("SELECT id FROM batches WHERE id = %s AND deleted_at IS NULL", (bat_id,))
             if not cur.fetchone():
                 return JSONResponse(
                     status_code=404,
@@ -413,7 +413,7 @@ def list_batch_corrections(
             sql = "SELECT %s FROM corrections c %s ORDER BY c.id ASC LIMIT %%s" % (col_list, where)
             params.append(limit + 1)
 
-            cur.execute(sql, params)
+            await cur.execute(sql, params)
             rows = cur.fetchall()
 
         has_more = len(rows) > limit
@@ -424,9 +424,8 @@ def list_batch_corrections(
         next_cursor = items[-1]["id"] if items and has_more else None
 
         return collection_envelope(items, cursor=next_cursor, has_more=has_more, limit=limit)
+    except PoolExhausted:
+        raise
     except Exception as e:
         logger.error("list_batch_corrections error: %s", e)
-        conn.rollback()
         return JSONResponse(status_code=500, content=error_envelope("INTERNAL", str(e)))
-    finally:
-        put_conn(conn)
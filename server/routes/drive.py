@@ -1,3 +1,4 @@
+import asyncio
 import base64
 import io
 import json
@@ -11,7 +12,7 @@ from fastapi.responses import JSONResponse
 from server.db import get_conn, put_conn
 from server.ulid import generate_id
 from server.api_v25 import envelope, collection_envelope, error_envelope
-from server.auth import AuthClass, require_auth, require_role, Role
+from server.auth import AuthClass, require_auth, require_role, require_role_async, Role
 from server.audit import emit_audit_event
 
 logger = logging.getLogger(__name__)
@@ -124,7 +125,7 @@ async def drive_connect(ws_id: str, request: Request, auth=Depends(require_auth(
     if isinstance(auth, JSONResponse):
         return auth
 
-    role_err = require_role(ws_id, auth, Role.ANALYST)
+    role_err = await require_role_async(ws_id, auth, Role.ANALYST)
     if role_err:
         return role_err
 
@@ -178,7 +179,7 @@ async def drive_callback(ws_id: str, request: Request, auth=Depends(require_auth
     if isinstance(auth, JSONResponse):
         return auth
 
-    role_err = require_role(ws_id, auth, Role.ANALYST)
+    role_err = await require_role_async(ws_id, auth, Role.ANALYST)
     if role_err:
         return role_err
 
@@ -231,6 +232,11 @@ async def drive_callback(ws_id: str, request: Request, auth=Depends(require_auth
         logger.warning("Could not fetch Drive email: %s", e)
 
     conn_id = generate_id("drc_")
+    return await asyncio.to_thread(_store_drive_connection, ws_id, auth, credentials, drive_email, conn_id)
+
+
+def _store_drive_connection(ws_id, auth, credentials, drive_email, conn_id):
+    """Upsert the workspace's Drive connection with the exchanged credentials."""
     conn = get_conn()
     try:
         with conn.cursor() as cur:
@@ -474,7 +480,7 @@ async def drive_import(ws_id: str, request: Request, auth=Depends(require_auth(A
     if isinstance(auth, JSONResponse):
         return auth
 
-    role_err = require_role(ws_id, auth, Role.ANALYST)
+    role_err = await require_role_async(ws_id, auth, Role.ANALYST)
     if role_err:
         return role_err
 
@@ -493,6 +499,11 @@ async def drive_import(ws_id: str, request: Request, auth=Depends(require_auth(A
             content=error_envelope("VALIDATION_ERROR", "file_id is required"),
         )
 
+    return await asyncio.to_thread(_import_drive_file, ws_id, auth, file_id)
+
+
+def _import_drive_file(ws_id, auth, file_id):
+    """Download a Drive file and record its import provenance."""
     conn = get_conn()
     try:
         conn_row = _get_workspace_connection(ws_id, conn)
@@ -699,7 +710,7 @@ async def drive_export(ws_id: str, request: Request, auth=Depends(require_auth(A
     if isinstance(auth, JSONResponse):
         return auth
 
-    role_err = require_role(ws_id, auth, Role.ANALYST)
+    role_err = await require_role_async(ws_id, auth, Role.ANALYST)
     if role_err:
         return role_err
 
@@ -727,6 +738,11 @@ async def drive_export(ws_id: str, request: Request, auth=Depends(require_auth(A
             content=error_envelope("VALIDATION_ERROR", "file_content_base64 is required"),
         )
 
+    return await asyncio.to_thread(_export_drive_file, ws_id, auth, file_name, folder_id, export_status, file_content_b64)
+
+
+def _export_drive_file(ws_id, auth, file_name, folder_id, export_status, file_content_b64):
+    """Upload a workbook to Drive and record the export."""
     conn = get_conn()
     try:
         conn_row = _get_workspace_connection(ws_id, conn)
@@ -1,11 +1,13 @@
+import asyncio
 import logging
 
 from fastapi import APIRouter, Request, Depends
 from fastapi.responses import JSONResponse
 
+from server import db_async
 from server.db import get_conn, put_conn
 from server.api_v25 import envelope, error_envelope
-from server.auth import AuthClass, require_auth, require_role, Role
+from server.auth import AuthClass, invalidate_user, require_auth, require_role_async, Role
 from server.ulid import generate_id
 
 logger = logging.getLogger(__name__)
@@ -18,36 +20,32 @@ async def list_members(ws_id: str, request: Request, auth=Depends(require_auth(A
     if isinstance(auth, JSONResponse):
         return auth
 
-    conn = get_conn()
-    try:
-        with conn.cursor() as cur:
-            cur.execute(
-                """SELECT u.id, u.email, u.display_name, u.avatar_url, u.status,
-                          uwr.role, u.created_at, u.updated_at
-                   FROM users u
-                   JOIN user_workspace_roles uwr ON u.id = uwr.user_id
-                   WHERE uwr.workspace_id = %s
-                   ORDER BY u.display_name ASC""",
-                (ws_id,),
-            )
-            rows = cur.fetchall()
-
-        members = []
-        for row in rows:
-            members.append({
-                "id": row[0],
-                "email": row[1],
-                "display_name": row[2],
-                "avatar_url": row[3],
-                "status": row[4] or "active",
-                "role": row[5],
-                "created_at": row[6].isoformat() if row[6] else None,
-                "updated_at": row[7].isoformat() if row[7] else None,
-            })
-
-        return JSONResponse(status_code=200, content=envelope(members))
-    finally:
-        put_conn(conn)
+    async with db_async.cursor() as cur:
+        await cur.execute(
+            """SELECT u.id, u.email, u.display_name, u.avatar_url, u.status,
+                      uwr.role, u.created_at, u.updated_at
+               FROM users u
+               JOIN user_workspace_roles uwr ON u.id = uwr.user_id
+               WHERE uwr.workspace_id = %s
+               ORDER BY u.display_name ASC""",
+            (ws_id,),
+        )
+        rows = cur.fetchall()
+
+    members = []
+    for row in rows:
+        members.append({
+            "id": row[0],
+            "email": row[1],
+            "display_name": row[2],
+            "avatar_url": row[3],
+            "status": row[4] or "active",
+            "role": row[5],
+            "created_at": row[6].isoformat() if row[6] else None,
+            "updated_at": row[7].isoformat() if row[7] else None,
+        })
+
+    return JSONResponse(status_code=200, content=envelope(members))
 
 
 @router.post("/workspaces/{ws_id}/members")
@@ -55,7 +53,7 @@ async def create_member(ws_id: str, request: Request, auth=Depends(require_auth(
     if isinstance(auth, JSONResponse):
         return auth
 
-    role_check = require_role(ws_id, auth, Role.ADMIN)
+    role_check = await require_role_async(ws_id, auth, Role.ADMIN)
     if role_check:
         return role_check
 
@@ -78,6 +76,11 @@ async def create_member(ws_id: str, request: Request, auth=Depends(require_auth(
     if status not in ("active", "inactive"):
         return JSONResponse(status_code=400, content=error_envelope("VALIDATION_ERROR", "Invalid status"))
 
+    return await asyncio.to_thread(_upsert_member, ws_id, email, display_name, role, status)
+
+
+def _upsert_member(ws_id, email, display_name, role, status):
+    """Create the user, or update an existing one by email, and set their workspace role."""
     conn = get_conn()
     try:
         with conn.cursor() as cur:
@@ -105,6 +108,7 @@ async def create_member(ws_id: str, request: Request, auth=Depends(require_auth(
             )
 
         conn.commit()
+        invalidate_user(user_id)
 
         return JSONResponse(
             status_code=201,
@@ -139,10 +143,15 @@ async def update_member(user_id: str, request: Request, auth=Depends(require_aut
     if not workspace_id:
         return JSONResponse(status_code=400, content=error_envelope("VALIDATION_ERROR", "workspace_id required"))
 
-    role_check = require_role(workspace_id, auth, Role.ADMIN)
+    role_check = await require_role_async(workspace_id, auth, Role.ADMIN)
     if role_check:
         return role_check
 
+    return await asyncio.to_thread(_update_member, user_id, body, workspace_id)
+
+
+def _update_member(user_id, body, workspace_id):
+    """Apply the body's fields to the user and their workspace role."""
     conn = get_conn()
     try:
         with conn.cursor() as cur:
@@ -176,6 +185,7 @@ async def update_member(user_id: str, request: Request, auth=Depends(require_aut
                 )
 
         conn.commit()
+        invalidate_user(user_id)
 
         return JSONResponse(
             status_code=200,
@@ -205,10 +215,15 @@ async def delete_member(user_id: str, request: Request, auth=Depends(require_aut
     if not workspace_id:
         return JSONResponse(status_code=400, content=error_envelope("VALIDATION_ERROR", "workspace_id required"))
 
-    role_check = require_role(workspace_id, auth, Role.ADMIN)
+    role_check = await require_role_async(workspace_id, auth, Role.ADMIN)
     if role_check:
         return role_check
 
+    return await asyncio.to_thread(_remove_member, user_id, workspace_id)
+
+
+def _remove_member(user_id, workspace_id):
+    """Deactivate the user and drop their role in the workspace."""
     conn = get_conn()
     try:
         with conn.cursor() as cur:
@@ -221,6 +236,7 @@ async def delete_member(user_id: str, request: Request, auth=Depends(require_aut
                 (user_id, workspace_id),
             )
         conn.commit()
+        invalidate_user(user_id)
         return JSONResponse(status_code=200, content=envelope({"id": user_id, "deleted": True}))
     except Exception as e:
         conn.rollback()
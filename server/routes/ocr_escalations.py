@@ -5,7 +5,8 @@ from datetime import datetime
 from fastapi import APIRouter, Depends, Query
 from fastapi.responses import JSONResponse
 
-from server.db import get_conn, put_conn
+from server import db_async
+from server.db import PoolExhausted, get_conn, put_conn
 from server.ulid import generate_id
 from server.api_v25 import envelope, collection_envelope, error_envelope
 from server.auth import AuthClass, require_auth
@@ -138,7 +139,7 @@ def create_ocr_escalation(
 
 
 @router.get("/documents/{doc_id}/ocr-escalations")
-def list_ocr_escalations(
+async def list_ocr_escalations(
     doc_id: str,
     status: str = Query(None),
     cursor: str = Query(None),
@@ -151,10 +152,9 @@ def list_ocr_escalations(
     if gate:
         return gate
 
-    conn = get_conn()
     try:
-        with conn.cursor() as cur:
-            cur.execute(
+        async with db_async.cursor() as cur:
+            await cur.execute(
                 "SELECT id FROM documents WHERE id = %s AND deleted_at IS NULL",
                 (doc_id,),
             )
@@ -177,7 +177,7 @@ def list_ocr_escalations(
             sql = "SELECT %s FROM ocr_escalations %s ORDER BY id ASC LIMIT %%s" % (ESCALATION_SELECT, where)
             params.append(limit + 1)
 
-            cur.execute(sql, params)
+            await cur.execute(sql, params)
             rows = cur.fetchall()
 
         has_more = len(rows) > limit
@@ -188,9 +188,8 @@ def list_ocr_escalations(
         next_cursor = items[-1]["id"] if items and has_more else None
 
         return collection_envelope(items, cursor=next_cursor, has_more=has_more, limit=limit)
+    except PoolExhausted:
+        raise
     except Exception as e:
         logger.error("list_ocr_escalations error: %s", e)
-        conn.rollback()
         return JSONResponse(status_code=500, content=error_envelope("INTERNAL", str(e)))
-    finally:
-        put_conn(conn)
@@ -5,7 +5,8 @@ from datetime import datetime, timezone
 from fastapi import APIRouter, Depends, Query, Request
 from fastapi.responses import JSONResponse
 
-from server.db import get_conn, put_conn
+from server import db_async
+from server.db import PoolExhausted, get_conn, put_conn
 from server.ulid import generate_id
 from server.api_v25 import envelope, collection_envelope, error_envelope
 from server.auth import AuthClass, require_auth
@@ -87,7 +88,7 @@ def _check_role(user_id, workspace_id, min_role, conn):
 
 
 @router.get("/workspaces/{ws_id}/patches")
-def list_patches(
+async def list_patches(
     ws_id: str,
     cursor: str = Query(None),
     limit: int = Query(50, ge=1, le=200),
@@ -100,10 +101,9 @@ def list_patches(
     if isinstance(auth, JSONResponse):
         return auth
 
-    conn = get_conn()
     try:
-        with conn.cursor() as cur:
-            cur.execute("SELECT id FROM workspaces WHERE id = %s AND deleted_at IS NULL", (ws_id,))
+        async with db_async.cursor() as cur:
+            await cur.execute("SELECT id FROM workspaces WHERE id = %s AND deleted_at IS NULL", (ws_id,))
             if not cur.fetchone():
                 return JSONResponse(
                     status_code=404,
@@ -136,7 +136,7 @@ def list_patches(
             sql = "SELECT %s FROM patches %s ORDER BY id ASC LIMIT %%s" % (PATCH_SELECT, where)
             params.append(limit + 1)
 
-            cur.execute(sql, params)
+            await cur.execute(sql, params)
             rows = cur.fetchall()
 
         has_more = len(rows) > limit
@@ -147,12 +147,11 @@ def list_patches(
         next_cursor = items[-1]["id"] if items and has_more else None
 
         return collection_envelope(items, cursor=next_cursor, has_more=has_more, limit=limit)
+    except PoolExhausted:
+        raise
     except Exception as e:
         logger.error("list_patches error: %s", e)
-        conn.rollback()
         return JSONResponse(status_code=500, content=error_envelope("INTERNAL", str(e)))
-    finally:
-        put_conn(conn)
 
 
 @router.post("/workspaces/{ws_id}/patches", status_code=201)
@@ -2,37 +2,83 @@
 Preflight API routes for Orchestrate OS.
 
 POST /api/preflight/run     - Run preflight analysis on a document (URL)
-POST /api/preflight/upload  - Run preflight on uploaded PDF (base64, internal/Test Lab)
-GET  /api/preflight/{doc_id} - Read cached preflight result
+POST /api/preflight/upload  - Run preflight on uploaded PDF (raw/multipart/base64, internal/Test Lab)
+POST /api/preflight/batch   - Run preflight over many URLs / document ids (NDJSON stream)
+POST /api/preflight/regate  - Recompute gates for the workspace from stored page metrics
+GET  /api/preflight/{doc_id} - Read cached preflight result (LRU + preflight_results)
 POST /api/preflight/action  - Accept Risk / Escalate OCR (internal)
 
+/run and /upload accept "detail": "full" (default) or "gate". Gate detail
+returns only the gate color, stopping extraction once it is provably fixed;
+it has no decision trace and is not cached.
+
+Engine results are also keyed by sha256 of the PDF bytes and RESULT_VERSION
+(engine version plus image coverage estimator, see preflight_pipeline):
+the same PDF under another URL, filename or doc_id reuses the stored result,
+and concurrent runs of identical bytes share one computation.
+
+Full analyses also persist per-page metrics (preflight_page_metrics), so
+/regate can apply new thresholds to every cached result in the workspace
+without re-downloading or re-parsing (see server/preflight_regate.py).
+
+Page extraction runs in the shared PDF extraction pool
+(server/pdf_extract_service.py); a full analysis also caches the page text
+for /api/pdf/text. URL fetches go through the app's shared pooled client
+(server/http_client.fetch_pdf). /batch fetches with
+PREFLIGHT_BATCH_CONCURRENCY requests in flight and emits one line per document as it completes
+({"type": "result"|"error", ...}), then a {"type": "summary"} line with
+gate counts and the worst gate in the batch. While the preflight workers
+are saturated, batch items wait for admission (up to
+PREFLIGHT_BATCH_BUSY_WAIT seconds each) instead of failing as BUSY.
+
 All require:
   - v2.5 Either auth (Bearer or API key)
   - Feature flag PREFLIGHT_GATE_SYNC or alias enabled
   - ADMIN role (sandbox stage)
   - Workspace isolation
 """
+import asyncio
+import copy
 import hashlib
+import json
 import logging
+import os
+import tempfile
 from datetime import datetime, timezone
-from urllib.parse import urlparse, unquote
 
 from fastapi import APIRouter, Request, Query, Depends
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 
 from server.api_v25 import envelope, error_envelope
-from server.auth import AuthClass, require_auth, require_role, get_workspace_role
+from server.auth import AuthClass, require_auth, require_role, get_workspace_role_async
 from server.feature_flags import is_preflight_enabled, require_preflight
-from server.preflight_engine import run_preflight, derive_cache_identity
-from server.db import get_conn, put_conn
+from server.preflight_engine import derive_cache_identity, pack_page_metrics, reduce_page_partials
+from server.preflight_pipeline import RESULT_VERSION, triage_pdf
+from server.pdf_extract_service import extract as extract_pdf
+from server.pdf_text_cache import put_pages as put_text_pages
+from server.doc_executor import run_document_job, ExecutorSaturated
+from server.http_client import FetchError, fetch_pdf
+from server.preflight_cache import (
+    get_result, put_result, get_content_result, put_content_result, put_page_metrics,
+)
+from server.preflight_regate import regate_workspace
+from server.db import PoolExhausted, get_conn, put_conn, release_request_conn
 from server.ulid import generate_id
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/preflight", tags=["preflight"])
 
-_preflight_cache = {}
+RAW_UPLOAD_CONTENT_TYPES = ("application/pdf", "application/octet-stream")
+# Cap on a non-file multipart field (filename, doc_id, detail, ...)
+FORM_FIELD_MAX_BYTES = 64 * 1024
+
+BATCH_MAX_ITEMS = int(os.environ.get("PREFLIGHT_BATCH_MAX_ITEMS", "200"))
+BATCH_CONCURRENCY = max(1, int(os.environ.get("PREFLIGHT_BATCH_CONCURRENCY", "8")))
+BATCH_BUSY_WAIT_SECONDS = float(os.environ.get("PREFLIGHT_BATCH_BUSY_WAIT", "300"))
 
+# (content_hash, detail) -> asyncio.Future of the run computing it
+_inflight = {}
 
 def _resolve_workspace(request, auth, body=None):
     """Resolve workspace_id: auth-bound first, then X-Workspace-Id fallback."""
@@ -49,13 +95,13 @@ def _resolve_workspace(request, auth, body=None):
     return ws_id, None
 
 
-def _require_admin_sandbox(auth, workspace_id):
+async def _require_admin_sandbox(auth, workspace_id):
     """Admin-only sandbox gate. Returns error response or None."""
     if auth.is_api_key:
         return None
     if getattr(auth, 'user_id', None) == 'sandbox_user':
         return None
-    role = get_workspace_role(auth.user_id, workspace_id)
+    role = await get_workspace_role_async(auth.user_id, workspace_id)
     if role != "admin" and role != "architect":
         return JSONResponse(
             status_code=403,
@@ -64,69 +110,177 @@ def _require_admin_sandbox(auth, workspace_id):
     return None
 
 
-def _cache_key(workspace_id, doc_id):
-    return "%s::%s" % (workspace_id, doc_id)
+def _parse_detail(body):
+    """Validate the requested detail level. Returns (detail, error_response)."""
+    detail = (body.get("detail") or "full").strip().lower()
+    if detail not in ("full", "gate"):
+        return None, JSONResponse(
+            status_code=400,
+            content=error_envelope("VALIDATION_ERROR", "detail must be 'full' or 'gate'"),
+        )
+    return detail, None
+
+
+def _lookup_content(source, content_hash=None):
+    """Hash the PDF bytes if needed and look up a stored engine result. Runs off-loop."""
+    if content_hash is None:
+        content_hash = hashlib.sha256(source).hexdigest()
+    return content_hash, get_content_result(content_hash)
+
+
+def _analyze_and_store(source, content_hash):
+    # One extraction pass also fills the /api/pdf/text cache for these bytes
+    page_count, _, records = extract_pdf(source, ("preflight", "text"))
+    partials = [r["preflight"] for r in records]
+    if records:
+        put_text_pages(content_hash, "text", page_count, [r["text"] for r in records])
+    result = reduce_page_partials(partials)
+    result["content_hash"] = content_hash
+    result["engine_version"] = RESULT_VERSION
+    put_content_result(content_hash, result)
+    put_page_metrics(content_hash, pack_page_metrics(partials))
+    return result
+
+
+def _triage(source, content_hash):
+    summary = triage_pdf(source)
+    summary["content_hash"] = content_hash
+    summary["engine_version"] = RESULT_VERSION
+    return summary
+
+
+def _gate_summary_from_result(result):
+    total_pages = result.get("metrics", {}).get("total_pages", 0)
+    return {
+        "gate_color": result["gate_color"],
+        "decided_early": False,
+        "pages_examined": total_pages,
+        "total_pages": total_pages,
+        "content_hash": result.get("content_hash"),
+        "engine_version": result.get("engine_version"),
+    }
+
 
+async def _compute(source, detail, content_hash):
+    try:
+        if detail == "gate":
+            return await run_document_job(_triage, source, content_hash, label="preflight_gate")
+        return await run_document_job(_analyze_and_store, source, content_hash, label="preflight_full")
+    finally:
+        if isinstance(source, str):
+            os.unlink(source)
+
+
+async def _analyze_pdf(source, detail="full", content_hash=None):
+    """Run the preflight pipeline off the event loop.
+
+    source is PDF bytes or the path of a spooled upload (then content_hash
+    must be given). A spooled path is owned by this call from then on: it
+    is deleted here, or, when it starts a computation, by that computation
+    once it finishes, so a shielded run outlives the caller that started
+    it. Identical bytes are analysed once per RESULT_VERSION: stored
+    results are returned immediately, and concurrent requests for the same
+    content hash await a single in-flight computation. Returns a fresh
+    (engine_result, error_response) the caller may mutate.
+    """
+    spool = source if isinstance(source, str) else None
+    try:
+        content_hash, stored = await asyncio.to_thread(_lookup_content, source, content_hash)
+        if stored is not None:
+            logger.info("[PREFLIGHT] content hit: %s (%s)", content_hash[:12], detail)
+            if detail == "gate":
+                return _gate_summary_from_result(stored), None
+            return copy.deepcopy(stored), None
+
+        key = (content_hash, detail)
+        fut = _inflight.get(key)
+        from_full_run = False
+        if fut is None and detail == "gate" and (content_hash, "full") in _inflight:
+            fut = _inflight[(content_hash, "full")]
+            from_full_run = True
+        if fut is None:
+            fut = asyncio.ensure_future(_compute(source, detail, content_hash))
+            spool = None
+            _inflight[key] = fut
+            fut.add_done_callback(lambda _f: _inflight.pop(key, None))
+        else:
+            logger.info("[PREFLIGHT] coalesced onto in-flight run: %s (%s)", content_hash[:12], detail)
+    finally:
+        if spool is not None:
+            os.unlink(spool)
 
-def _extract_pages_from_pdf(pdf_bytes):
-    """Extract page data from PDF bytes using PyMuPDF. Returns (pages_data, error_response)."""
-    import fitz
     try:
-        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-        pages_data = []
-        for i in range(len(doc)):
-            page = doc[i]
-            text = page.get_text("text")
-            page_rect = page.rect
-            page_area = page_rect.width * page_rect.height if page_rect else 1
-            images = page.get_images(full=True)
-            image_area = 0
-            for img in images:
-                try:
-                    xref = img[0]
-                    img_rects = page.get_image_rects(xref)
-                    for r in img_rects:
-                        image_area += r.width * r.height
-                except Exception:
-                    pass
-            image_ratio = min(image_area / page_area, 1.0) if page_area > 0 else 0.0
-            pages_data.append({
-                "page": i + 1,
-                "text": text,
-                "char_count": len(text),
-                "image_coverage_ratio": round(image_ratio, 4),
-                "page_width": round(page_rect.width, 2) if page_rect else 0,
-                "page_height": round(page_rect.height, 2) if page_rect else 0,
-            })
-        doc.close()
-        return pages_data, None
+        # shield: one caller disconnecting must not cancel the shared run
+        result = await asyncio.shield(fut)
+    except ExecutorSaturated as e:
+        return None, JSONResponse(
+            status_code=503,
+            headers={"Retry-After": str(e.retry_after)},
+            content=error_envelope("BUSY", "Preflight workers are saturated, retry later"),
+        )
     except Exception as e:
         return None, JSONResponse(
             status_code=422,
             content=error_envelope("EXTRACTION_ERROR", "PDF analysis failed: %s" % str(e)),
         )
+    if from_full_run:
+        return _gate_summary_from_result(result), None
+    return copy.deepcopy(result), None
+
+
+def _gate_only_result(summary, doc_id, ws_id, file_url):
+    """Stamp a gate-only summary with document identity. Not cached."""
+    summary["doc_id"] = doc_id
+    summary["workspace_id"] = ws_id
+    summary["file_url"] = file_url
+    summary["detail"] = "gate"
+    summary["timestamp"] = datetime.now(timezone.utc).isoformat()
+    return summary
 
 
-def _build_preflight_result(pages_data, doc_id, ws_id, file_url):
-    """Run preflight engine and build cacheable result dict."""
-    result = run_preflight(pages_data)
+def _build_preflight_result(result, doc_id, ws_id, file_url):
+    """Stamp an engine result with document identity and cache it."""
     result["doc_id"] = doc_id
     result["workspace_id"] = ws_id
     result["file_url"] = file_url
     result["timestamp"] = datetime.now(timezone.utc).isoformat()
     result["materialized"] = False
 
-    for pd_item in pages_data:
-        for pr in result.get("page_classifications", []):
-            if pr["page"] == pd_item["page"]:
-                pr["page_width"] = pd_item.get("page_width", 0)
-                pr["page_height"] = pd_item.get("page_height", 0)
+    put_result(ws_id, doc_id, result)
+    return result
+
+
+def _finish_result(engine_result, detail, doc_id, ws_id, file_url, source):
+    """Stamp identity onto an engine result (caching full detail) and log it. Runs off-loop."""
+    if detail == "gate":
+        result = _gate_only_result(engine_result, doc_id, ws_id, file_url)
+        logger.info(
+            "[PREFLIGHT] gate-only %s: doc=%s ws=%s gate=%s pages=%d/%d",
+            source, doc_id, ws_id, result["gate_color"], result["pages_examined"], result["total_pages"],
+        )
+        return result
 
-    ck = _cache_key(ws_id, doc_id)
-    _preflight_cache[ck] = result
+    result = _build_preflight_result(engine_result, doc_id, ws_id, file_url)
+    logger.info(
+        "[PREFLIGHT] %s complete: doc=%s ws=%s gate=%s mode=%s pages=%d",
+        source, doc_id, ws_id, result["gate_color"], result["doc_mode"],
+        result["metrics"].get("total_pages", 0),
+    )
     return result
 
 
+async def _fetch_pdf(file_url):
+    """Validate file_url (allowlist, SSRF) and fetch it. Returns (pdf_bytes, error_response)."""
+    try:
+        pdf_bytes = await fetch_pdf(file_url, label="file_url")
+    except FetchError as e:
+        return None, JSONResponse(
+            status_code=e.status_code,
+            content=error_envelope(e.code, e.message),
+        )
+    return pdf_bytes, None
+
+
 @router.post("/run")
 async def preflight_run(
     request: Request,
@@ -152,13 +306,17 @@ async def preflight_run(
     if ws_err:
         return ws_err
 
-    admin_err = _require_admin_sandbox(auth, ws_id)
+    admin_err = await _require_admin_sandbox(auth, ws_id)
     if admin_err:
         return admin_err
 
     file_url = body.get("file_url", "").strip()
     doc_id = body.get("doc_id", "").strip()
 
+    detail, detail_err = _parse_detail(body)
+    if detail_err:
+        return detail_err
+
     if not file_url:
         return JSONResponse(
             status_code=400,
@@ -168,100 +326,435 @@ async def preflight_run(
     if not doc_id:
         doc_id = derive_cache_identity(ws_id, file_url)
 
-    from server.pdf_proxy import is_host_allowed, is_private_ip, MAX_SIZE_BYTES
-    import httpx
+    await release_request_conn()
+    pdf_bytes, fetch_err = await _fetch_pdf(file_url)
+    if fetch_err:
+        return fetch_err
+
+    engine_result, extract_err = await _analyze_pdf(pdf_bytes, detail)
+    if extract_err:
+        return extract_err
+
+    result = await asyncio.to_thread(_finish_result, engine_result, detail, doc_id, ws_id, file_url, "run")
+    return JSONResponse(status_code=200, content=envelope(result))
+
 
+async def _iter_multipart_file(request, fields, state):
+    """Parse a multipart body as it arrives and yield the data of its "file" part.
+
+    Other text parts are stored in fields; state records whether a "file"
+    part was seen and its filename. Raises ValueError on a malformed body.
+    """
+    from python_multipart.multipart import MultipartParser, parse_options_header
+
+    _, options = parse_options_header(request.headers.get("content-type", ""))
+    boundary = options.get(b"boundary")
+    if not boundary:
+        raise ValueError("multipart boundary missing")
+
+    part = {}
+    file_data = []
+
+    def on_part_begin():
+        part.clear()
+        part.update(disposition=b"", header=b"", value=b"", name="", filename=None, is_file=False, data=bytearray())
+
+    def on_header_field(data, start, end):
+        part["header"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        part["value"] += data[start:end]
+
+    def on_header_end():
+        if part["header"].lower() == b"content-disposition":
+            part["disposition"] = part["value"]
+        part["header"] = part["value"] = b""
+
+    def on_headers_finished():
+        _, opts = parse_options_header(part["disposition"])
+        part["name"] = opts.get(b"name", b"").decode("utf-8", "replace")
+        if b"filename" in opts:
+            part["filename"] = opts[b"filename"].decode("utf-8", "replace")
+        if part["name"] == "file" and not state["file_seen"]:
+            part["is_file"] = True
+            state["file_seen"] = True
+            state["filename"] = part["filename"]
+
+    def on_part_data(data, start, end):
+        if part["is_file"]:
+            file_data.append(data[start:end])
+        elif part["filename"] is None:
+            if len(part["data"]) + end - start > FORM_FIELD_MAX_BYTES:
+                raise ValueError("multipart field too large")
+            part["data"] += data[start:end]
+
+    def on_part_end():
+        if not part["is_file"] and part["filename"] is None and part["name"]:
+            fields[part["name"]] = part["data"].decode("utf-8", "replace")
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+    async for chunk in request.stream():
+        parser.write(chunk)
+        while file_data:
+            yield file_data.pop(0)
+    parser.finalize()
+
+
+async def _spool_upload(chunks):
+    """Stream body chunks to a temp file, hashing and enforcing the size cap as they arrive.
+
+    Returns (path, content_hash, error_response). The caller unlinks path
+    or hands it to _analyze_pdf.
+    """
+    from server.pdf_proxy import MAX_SIZE_BYTES
+
+    fd, path = tempfile.mkstemp(prefix="preflight_upload_", suffix=".pdf")
+    digest = hashlib.sha256()
+    size = 0
+    err = None
     try:
-        decoded_url = unquote(file_url)
-        parsed = urlparse(decoded_url)
+        with os.fdopen(fd, "wb") as f:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > MAX_SIZE_BYTES:
+                    err = JSONResponse(
+                        status_code=413,
+                        content=error_envelope("FILE_TOO_LARGE", "File exceeds size limit"),
+                    )
+                    break
+                digest.update(chunk)
+                f.write(chunk)
+        if err is None and size == 0:
+            err = JSONResponse(
+                status_code=400,
+                content=error_envelope("VALIDATION_ERROR", "Uploaded file is empty"),
+            )
     except Exception:
-        return JSONResponse(
+        os.unlink(path)
+        raise
+    if err is not None:
+        os.unlink(path)
+        return None, None, err
+    return path, digest.hexdigest(), None
+
+
+@router.post("/upload")
+async def preflight_upload(
+    request: Request,
+    auth=Depends(require_auth(AuthClass.EITHER)),
+):
+    """Run preflight on an uploaded PDF. Internal/Test Lab use.
+
+    Accepts, by Content-Type:
+      application/pdf, application/octet-stream — raw PDF body, streamed to
+          disk; filename/doc_id/detail/workspace_id as query params
+      multipart/form-data — "file" part, streamed to disk as it is parsed,
+          plus filename/doc_id/detail fields; workspace_id as a query param
+    Raw and multipart bodies are not read until the admin check passes.
+      application/json — legacy {"pdf_base64": ...} body
+    """
+    if isinstance(auth, JSONResponse):
+        return auth
+
+    flag_check = require_preflight()
+    if flag_check:
+        return flag_check
+
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in RAW_UPLOAD_CONTENT_TYPES or content_type == "multipart/form-data":
+        # The body is only read once the workspace and role are checked, so the
+        # workspace comes from the API key, X-Workspace-Id or the query string
+        params = dict(request.query_params)
+    else:
+        try:
+            params = await request.json()
+        except Exception:
+            return JSONResponse(
+                status_code=400,
+                content=error_envelope("VALIDATION_ERROR", "Invalid JSON body"),
+            )
+
+    return await _handle_upload(request, auth, params, content_type)
+
+
+async def _spool_multipart(request, fields):
+    """Stream the "file" part of a multipart body to disk, through the size cap.
+
+    Other form fields are stored in fields. Returns (path, content_hash,
+    error_response); the caller unlinks path or hands it to _analyze_pdf.
+    """
+    state = {"file_seen": False, "filename": None}
+    try:
+        path, content_hash, spool_err = await _spool_upload(_iter_multipart_file(request, fields, state))
+    except ValueError:
+        return None, None, JSONResponse(
             status_code=400,
-            content=error_envelope("VALIDATION_ERROR", "Invalid file_url format"),
+            content=error_envelope("VALIDATION_ERROR", "Invalid multipart body"),
         )
-
-    if parsed.scheme not in ("http", "https"):
-        return JSONResponse(
+    if not state["file_seen"]:
+        if path is not None:
+            os.unlink(path)
+        return None, None, JSONResponse(
             status_code=400,
-            content=error_envelope("VALIDATION_ERROR", "Only HTTP/HTTPS URLs allowed"),
+            content=error_envelope("VALIDATION_ERROR", "multipart field 'file' is required"),
         )
+    if spool_err:
+        return None, None, spool_err
+    fields.setdefault("filename", state["filename"] or "uploaded.pdf")
+    return path, content_hash, None
 
-    hostname = parsed.hostname
-    if not hostname:
-        return JSONResponse(
+
+async def _handle_upload(request, auth, params, content_type):
+    ws_id, ws_err = _resolve_workspace(request, auth, params)
+    if ws_err:
+        return ws_err
+
+    admin_err = await _require_admin_sandbox(auth, ws_id)
+    if admin_err:
+        return admin_err
+
+    await release_request_conn()
+    path = content_hash = None
+    if content_type == "multipart/form-data":
+        path, content_hash, upload_err = await _spool_multipart(request, params)
+        if upload_err:
+            return upload_err
+
+    try:
+        filename = (params.get("filename") or "uploaded.pdf").strip()
+        doc_id = (params.get("doc_id") or "").strip()
+
+        detail, detail_err = _parse_detail(params)
+        if detail_err:
+            return detail_err
+
+        if not doc_id:
+            doc_id = derive_cache_identity(ws_id, "upload://%s" % filename)
+
+        if content_type in RAW_UPLOAD_CONTENT_TYPES:
+            path, content_hash, spool_err = await _spool_upload(request.stream())
+            if spool_err:
+                return spool_err
+        if path is not None:
+            # _analyze_pdf owns the spooled file from here on
+            spooled, path = path, None
+            engine_result, extract_err = await _analyze_pdf(spooled, detail, content_hash)
+        else:
+            pdf_bytes, decode_err = _decode_base64_upload(params)
+            if decode_err:
+                return decode_err
+            engine_result, extract_err = await _analyze_pdf(pdf_bytes, detail)
+    finally:
+        if path is not None:
+            os.unlink(path)
+    if extract_err:
+        return extract_err
+
+    file_url = "upload://%s" % filename
+    result = await asyncio.to_thread(_finish_result, engine_result, detail, doc_id, ws_id, file_url, "upload")
+    return JSONResponse(status_code=200, content=envelope(result))
+
+
+def _decode_base64_upload(body):
+    """Legacy JSON upload: decode pdf_base64. Returns (pdf_bytes, error_response)."""
+    pdf_base64 = (body.get("pdf_base64") or "").strip()
+    if not pdf_base64:
+        return None, JSONResponse(
             status_code=400,
-            content=error_envelope("VALIDATION_ERROR", "Missing hostname in file_url"),
+            content=error_envelope("VALIDATION_ERROR", "pdf_base64 is required"),
         )
 
-    if not is_host_allowed(hostname):
-        return JSONResponse(
-            status_code=403,
-            content=error_envelope("FORBIDDEN", "Host not in allowlist: %s" % hostname),
+    import base64
+    try:
+        pdf_bytes = base64.b64decode(pdf_base64)
+    except Exception:
+        return None, JSONResponse(
+            status_code=400,
+            content=error_envelope("VALIDATION_ERROR", "Invalid base64 encoding"),
         )
 
-    if is_private_ip(hostname):
-        return JSONResponse(
-            status_code=403,
-            content=error_envelope("FORBIDDEN", "Private/reserved IPs are blocked"),
+    from server.pdf_proxy import MAX_SIZE_BYTES
+    if len(pdf_bytes) > MAX_SIZE_BYTES:
+        return None, JSONResponse(
+            status_code=413,
+            content=error_envelope("FILE_TOO_LARGE", "File exceeds size limit"),
         )
+    return pdf_bytes, None
 
-    async with httpx.AsyncClient(timeout=30.0, follow_redirects=False) as client:
-        try:
-            resp = await client.get(decoded_url)
-            if resp.status_code in (301, 302, 303, 307, 308):
-                redirect_url = resp.headers.get("location")
-                if redirect_url:
-                    redirect_parsed = urlparse(redirect_url)
-                    redirect_host = redirect_parsed.hostname
-                    if not redirect_host or not is_host_allowed(redirect_host) or is_private_ip(redirect_host):
-                        return JSONResponse(
-                            status_code=403,
-                            content=error_envelope("FORBIDDEN", "Redirect to non-allowlisted host blocked"),
-                        )
-                    resp = await client.get(redirect_url)
-            resp.raise_for_status()
-            if len(resp.content) > MAX_SIZE_BYTES:
-                return JSONResponse(
-                    status_code=413,
-                    content=error_envelope("FILE_TOO_LARGE", "File exceeds size limit"),
-                )
-        except httpx.TimeoutException:
-            return JSONResponse(
-                status_code=504,
-                content=error_envelope("UPSTREAM_TIMEOUT", "PDF fetch timed out"),
-            )
-        except httpx.HTTPStatusError as e:
-            return JSONResponse(
-                status_code=e.response.status_code,
-                content=error_envelope("UPSTREAM_ERROR", "Upstream error: %s" % e.response.status_code),
+
+def _lookup_document_urls(ws_id, document_ids):
+    conn = get_conn()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT id, file_url FROM documents WHERE workspace_id = %s AND id = ANY(%s) AND deleted_at IS NULL",
+                (ws_id, document_ids),
             )
-        except httpx.RequestError as e:
-            return JSONResponse(
-                status_code=502,
-                content=error_envelope("UPSTREAM_ERROR", "Upstream request failed: %s" % str(e)),
+            file_urls = dict(cur.fetchall())
+        conn.rollback()
+        return file_urls
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        put_conn(conn)
+
+
+async def _resolve_batch_items(ws_id, body):
+    """Collect batch entries from items[] and document_ids[]. Returns (items, error_response)."""
+    raw_items = body.get("items") or []
+    document_ids = body.get("document_ids") or []
+    if not isinstance(raw_items, list) or not isinstance(document_ids, list):
+        return None, JSONResponse(
+            status_code=400,
+            content=error_envelope("VALIDATION_ERROR", "items and document_ids must be arrays"),
+        )
+
+    items = []
+    for raw in raw_items:
+        if not isinstance(raw, dict):
+            return None, JSONResponse(
+                status_code=400,
+                content=error_envelope("VALIDATION_ERROR", "Each item must be an object with file_url"),
             )
+        file_url = (raw.get("file_url") or "").strip()
+        doc_id = (raw.get("doc_id") or "").strip()
+        if not doc_id and file_url:
+            doc_id = derive_cache_identity(ws_id, file_url)
+        items.append({"doc_id": doc_id, "file_url": file_url})
+
+    document_ids = [d.strip() for d in document_ids if isinstance(d, str) and d.strip()]
+    if document_ids:
+        try:
+            file_urls = await asyncio.to_thread(_lookup_document_urls, ws_id, document_ids)
+        except PoolExhausted:
+            raise
+        except Exception as e:
+            logger.error("preflight_batch document lookup error: %s", e)
+            return None, JSONResponse(status_code=500, content=error_envelope("INTERNAL", str(e)))
+        for d in document_ids:
+            items.append({"doc_id": d, "file_url": file_urls.get(d) or "", "from_document": True})
+
+    if not items:
+        return None, JSONResponse(
+            status_code=400,
+            content=error_envelope("VALIDATION_ERROR", "items or document_ids is required"),
+        )
+    if len(items) > BATCH_MAX_ITEMS:
+        return None, JSONResponse(
+            status_code=400,
+            content=error_envelope("VALIDATION_ERROR", "Batch exceeds %d documents" % BATCH_MAX_ITEMS),
+        )
+    return items, None
 
-    pages_data, extract_err = _extract_pages_from_pdf(resp.content)
-    if extract_err:
-        return extract_err
 
-    result = _build_preflight_result(pages_data, doc_id, ws_id, file_url)
+def _batch_error_line(item, status_code, error):
+    return {
+        "type": "error",
+        "doc_id": item["doc_id"],
+        "file_url": item["file_url"],
+        "status": status_code,
+        "error": error,
+    }
+
+
+def _batch_error_from_response(item, err_response):
+    return _batch_error_line(item, err_response.status_code, json.loads(err_response.body)["error"])
+
+
+async def _analyze_pdf_admitted(pdf_bytes, detail):
+    """_analyze_pdf, waiting out executor saturation for up to BATCH_BUSY_WAIT_SECONDS."""
+    deadline = asyncio.get_running_loop().time() + BATCH_BUSY_WAIT_SECONDS
+    while True:
+        engine_result, err = await _analyze_pdf(pdf_bytes, detail)
+        if err is None or err.status_code != 503:
+            return engine_result, err
+        retry_after = float(err.headers.get("Retry-After", "1"))
+        if asyncio.get_running_loop().time() + retry_after > deadline:
+            return engine_result, err
+        await asyncio.sleep(retry_after)
+
+
+async def _run_batch_item(sem, item, ws_id, detail):
+    """Fetch and analyse one batch entry. Always returns an NDJSON line dict."""
+    if not item["file_url"]:
+        if item.get("from_document"):
+            return _batch_error_line(item, 404, {"code": "NOT_FOUND", "message": "Document not found or has no file_url: %s" % item["doc_id"]})
+        return _batch_error_line(item, 400, {"code": "VALIDATION_ERROR", "message": "file_url is required"})
+    try:
+        async with sem:
+            pdf_bytes, err = await _fetch_pdf(item["file_url"])
+            if err:
+                return _batch_error_from_response(item, err)
+            engine_result, err = await _analyze_pdf_admitted(pdf_bytes, detail)
+            del pdf_bytes
+            if err:
+                return _batch_error_from_response(item, err)
+        result = await asyncio.to_thread(
+            _finish_result, engine_result, detail, item["doc_id"], ws_id, item["file_url"], "batch",
+        )
+        return {"type": "result", "doc_id": item["doc_id"], "status": 200, "data": result}
+    except PoolExhausted:
+        return _batch_error_line(item, 503, {"code": "BUSY", "message": "Database is busy, retry later"})
+    except Exception as e:
+        logger.error("preflight_batch item %s error: %s", item["doc_id"], e)
+        return _batch_error_line(item, 500, {"code": "INTERNAL", "message": str(e)})
+
 
+async def _batch_stream(items, ws_id, detail):
+    """Yield one NDJSON line per document as it completes, then a summary line."""
+    gate_counts = {"GREEN": 0, "YELLOW": 0, "RED": 0}
+    errors = 0
+    sem = asyncio.Semaphore(BATCH_CONCURRENCY)
+    tasks = [asyncio.ensure_future(_run_batch_item(sem, item, ws_id, detail)) for item in items]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            line = await next_done
+            if line["type"] == "result":
+                gate_counts[line["data"]["gate_color"]] += 1
+            else:
+                errors += 1
+            yield json.dumps(line) + "\n"
+    finally:
+        for t in tasks:
+            t.cancel()
+
+    batch_gate = None
+    for color in ("RED", "YELLOW", "GREEN"):
+        if gate_counts[color]:
+            batch_gate = color
+            break
     logger.info(
-        "[PREFLIGHT] run complete: doc=%s ws=%s gate=%s mode=%s pages=%d",
-        doc_id, ws_id, result["gate_color"], result["doc_mode"],
-        result["metrics"]["total_pages"],
+        "[PREFLIGHT] batch complete: ws=%s docs=%d gate=%s counts=%s errors=%d",
+        ws_id, len(items), batch_gate, gate_counts, errors,
     )
-
-    return JSONResponse(status_code=200, content=envelope(result))
+    yield json.dumps({
+        "type": "summary",
+        "workspace_id": ws_id,
+        "total": len(items),
+        "succeeded": len(items) - errors,
+        "failed": errors,
+        "gate_counts": gate_counts,
+        "batch_gate": batch_gate,
+        "complete": errors == 0,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+    }) + "\n"
 
 
-@router.post("/upload")
-async def preflight_upload(
+@router.post("/batch")
+async def preflight_batch(
     request: Request,
     auth=Depends(require_auth(AuthClass.EITHER)),
 ):
-    """Run preflight on an uploaded PDF (base64-encoded). Internal/Test Lab use."""
+    """Run preflight over many documents, streaming NDJSON results as they complete."""
     if isinstance(auth, JSONResponse):
         return auth
 
@@ -281,53 +774,69 @@ async def preflight_upload(
     if ws_err:
         return ws_err
 
-    admin_err = _require_admin_sandbox(auth, ws_id)
+    admin_err = await _require_admin_sandbox(auth, ws_id)
     if admin_err:
         return admin_err
 
-    pdf_base64 = body.get("pdf_base64", "").strip()
-    filename = body.get("filename", "uploaded.pdf").strip()
-    doc_id = body.get("doc_id", "").strip()
+    detail, detail_err = _parse_detail(body)
+    if detail_err:
+        return detail_err
 
-    if not pdf_base64:
-        return JSONResponse(
-            status_code=400,
-            content=error_envelope("VALIDATION_ERROR", "pdf_base64 is required"),
-        )
+    items, items_err = await _resolve_batch_items(ws_id, body)
+    if items_err:
+        return items_err
+
+    return StreamingResponse(_batch_stream(items, ws_id, detail), media_type="application/x-ndjson")
+
+
+@router.post("/regate")
+async def preflight_regate(
+    request: Request,
+    auth=Depends(require_auth(AuthClass.EITHER)),
+):
+    """Recompute gates for every cached result in the workspace from stored page metrics."""
+    if isinstance(auth, JSONResponse):
+        return auth
+
+    flag_check = require_preflight()
+    if flag_check:
+        return flag_check
 
-    import base64
     try:
-        pdf_bytes = base64.b64decode(pdf_base64)
+        body = await request.json()
     except Exception:
+        body = {}
+    if not isinstance(body, dict):
         return JSONResponse(
             status_code=400,
-            content=error_envelope("VALIDATION_ERROR", "Invalid base64 encoding"),
+            content=error_envelope("VALIDATION_ERROR", "Body must be a JSON object"),
         )
 
-    from server.pdf_proxy import MAX_SIZE_BYTES
-    if len(pdf_bytes) > MAX_SIZE_BYTES:
-        return JSONResponse(
-            status_code=413,
-            content=error_envelope("FILE_TOO_LARGE", "File exceeds size limit"),
-        )
-
-    if not doc_id:
-        doc_id = derive_cache_identity(ws_id, "upload://%s" % filename)
-
-    pages_data, extract_err = _extract_pages_from_pdf(pdf_bytes)
-    if extract_err:
-        return extract_err
-
-    file_url = "upload://%s" % filename
-    result = _build_preflight_result(pages_data, doc_id, ws_id, file_url)
+    ws_id, ws_err = _resolve_workspace(request, auth, body)
+    if ws_err:
+        return ws_err
 
-    logger.info(
-        "[PREFLIGHT] upload complete: doc=%s ws=%s gate=%s mode=%s pages=%d",
-        doc_id, ws_id, result["gate_color"], result["doc_mode"],
-        result["metrics"]["total_pages"],
-    )
+    admin_err = await _require_admin_sandbox(auth, ws_id)
+    if admin_err:
+        return admin_err
 
-    return JSONResponse(status_code=200, content=envelope(result))
+    dry_run = bool(body.get("dry_run", False))
+    await release_request_conn()
+    try:
+        summary = await run_document_job(regate_workspace, ws_id, dry_run, label="preflight_regate")
+    except ExecutorSaturated as e:
+        return JSONResponse(
+            status_code=503,
+            headers={"Retry-After": str(e.retry_after)},
+            content=error_envelope("BUSY", "Preflight workers are saturated, retry later"),
+        )
+    except Exception as e:
+        logger.error("[PREFLIGHT-REGATE] failed for ws=%s: %s", ws_id, e)
+        return JSONResponse(
+            status_code=500,
+            content=error_envelope("INTERNAL", "Re-gate failed: %s" % str(e)),
+        )
+    return JSONResponse(status_code=200, content=envelope(summary))
 
 
 @router.get("/{doc_id}")
@@ -348,12 +857,11 @@ async def preflight_read(
     if ws_err:
         return ws_err
 
-    admin_err = _require_admin_sandbox(auth, ws_id)
+    admin_err = await _require_admin_sandbox(auth, ws_id)
     if admin_err:
         return admin_err
 
-    ck = _cache_key(ws_id, doc_id)
-    cached = _preflight_cache.get(ck)
+    cached = await asyncio.to_thread(get_result, ws_id, doc_id)
 
     if not cached:
         return JSONResponse(
@@ -389,7 +897,7 @@ async def preflight_action(
     if ws_err:
         return ws_err
 
-    admin_err = _require_admin_sandbox(auth, ws_id)
+    admin_err = await _require_admin_sandbox(auth, ws_id)
     if admin_err:
         return admin_err
 
@@ -409,13 +917,14 @@ async def preflight_action(
             content=error_envelope("VALIDATION_ERROR", "action must be 'accept_risk' or 'escalate_ocr'"),
         )
 
-    ck = _cache_key(ws_id, doc_id)
-    cached = _preflight_cache.get(ck)
+    cached = await asyncio.to_thread(get_result, ws_id, doc_id)
     if not cached:
         return JSONResponse(
             status_code=404,
             content=error_envelope("NOT_FOUND", "No preflight result for doc_id: %s" % doc_id),
         )
+    # The LRU entry is shared with concurrent readers: update a copy
+    cached = dict(cached)
 
     gate = cached.get("gate_color", "RED")
     if action == "accept_risk" and gate == "RED":
@@ -455,4 +964,6 @@ async def preflight_action(
     else:
         logger.info("[PREFLIGHT] action=%s doc=%s (no patch, cache-only)", action, doc_id)
 
+    await asyncio.to_thread(put_result, ws_id, doc_id, cached)
+
     return JSONResponse(status_code=200, content=envelope(result))
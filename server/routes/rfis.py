@@ -5,7 +5,8 @@ from datetime import datetime, timezone
 from fastapi import APIRouter, Depends, Query, Request
 from fastapi.responses import JSONResponse
 
-from server.db import get_conn, put_conn
+from server import db_async
+from server.db import PoolExhausted, get_conn, put_conn
 from server.ulid import generate_id
 from server.api_v25 import envelope, collection_envelope, error_envelope
 from server.auth import AuthClass, require_auth, get_workspace_role
@@ -74,7 +75,7 @@ def _row_to_dict(row, columns):
 
 
 @router.get("/workspaces/{ws_id}/rfis")
-def list_rfis(
+async def list_rfis(
     ws_id: str,
     cursor: str = Query(None),
     limit: int = Query(50, ge=1, le=200),
@@ -85,10 +86,9 @@ def list_rfis(
     if isinstance(auth, JSONResponse):
         return auth
 
-    conn = get_conn()
     try:
-        with conn.cursor() as cur:
-            cur.execute("SELECT id FROM workspaces WHERE id = %s AND deleted_at IS NULL", (ws_id,))
+        async with db_async.cursor() as cur:
+            await cur.execute("SELECT id FROM workspaces WHERE id = %s AND deleted_at IS NULL", (ws_id,))
             if not cur.fetchone():
                 return JSONResponse(
                     status_code=404,
@@ -111,7 +111,7 @@ def list_rfis(
             sql = "SELECT %s FROM rfis %s ORDER BY id ASC LIMIT %%s" % (RFI_SELECT, where)
             params.append(limit + 1)
 
-            cur.execute(sql, params)
+            await cur.execute(sql, params)
             rows = cur.fetchall()
 
         has_more = len(rows) > limit
@@ -122,12 +122,11 @@ def list_rfis(
         next_cursor = items[-1]["id"] if items and has_more else None
 
         return collection_envelope(items, cursor=next_cursor, has_more=has_more, limit=limit)
+    except PoolExhausted:
+        raise
     except Exception as e:
         logger.error("list_rfis error: %s", e)
-        conn.rollback()
         return JSONResponse(status_code=500, content=error_envelope("INTERNAL", str(e)))
-    finally:
-        put_conn(conn)
 
 
 @router.post("/workspaces/{ws_id}/rfis", status_code=201)
@@ -469,7 +468,7 @@ def update_rfi(
 
 
 @router.get("/batches/{bat_id}/rfis")
-def list_batch_rfis(
+async def list_batch_rfis(
     bat_id: str,
     status: str = Query(None),
     custody_status: str = Query(None),
@@ -485,10 +484,9 @@ def list_batch_rfis(
     if gate:
         return gate
 
-    conn = get_conn()
     try:
-        with conn.cursor() as cur:
-            cur.execute("SELECT id, workspace_id FROM batches WHERE id = %s AND deleted_at IS NULL", (bat_id,))
+        async with db_async.cursor() as cur:
+            await cur.execute("SELECT id, workspace_id FROM batches WHERE id = %s AND deleted_at IS NULL", (bat_id,))
             batch_row = cur.fetchone()
             if not batch_row:
                 return JSONResponse(
@@ -517,7 +515,7 @@ def list_batch_rfis(
             sql = "SELECT %s FROM rfis %s ORDER BY id ASC LIMIT %%s" % (RFI_SELECT, where)
             params.append(limit + 1)
 
-            cur.execute(sql, params)
+            await cur.execute(sql, params)
             rows = cur.fetchall()
 
         has_more = len(rows) > limit
@@ -528,9 +526,8 @@ def list_batch_rfis(
         next_cursor = items[-1]["id"] if items and has_more else None
 
         return collection_envelope(items, cursor=next_cursor, has_more=has_more, limit=limit)
+    except PoolExhausted:
+        raise
     except Exception as e:
         logger.error("list_batch_rfis error: %s", e)
-        conn.rollback()
         return JSONResponse(status_code=500, content=error_envelope("INTERNAL", str(e)))
-    finally:
-        put_conn(conn)
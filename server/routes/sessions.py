@@ -1,3 +1,4 @@
+import asyncio
 import json
 import logging
 from datetime import datetime, timezone
@@ -8,7 +9,7 @@ from fastapi.responses import JSONResponse
 from server.db import get_conn, put_conn
 from server.ulid import generate_id
 from server.api_v25 import envelope, collection_envelope, error_envelope
-from server.auth import AuthClass, require_auth, require_role, Role
+from server.auth import AuthClass, require_auth, require_role, require_role_async, Role
 from server.audit import emit_audit_event
 
 logger = logging.getLogger(__name__)
@@ -80,7 +81,7 @@ async def create_session(ws_id: str, request: Request, auth=Depends(require_auth
     if isinstance(auth, JSONResponse):
         return auth
 
-    role_err = require_role(ws_id, auth, Role.ANALYST)
+    role_err = await require_role_async(ws_id, auth, Role.ANALYST)
     if role_err:
         return role_err
 
@@ -115,6 +116,11 @@ async def create_session(ws_id: str, request: Request, auth=Depends(require_auth
             content=error_envelope("VALIDATION_ERROR", "source_ref is required"),
         )
 
+    return await asyncio.to_thread(_create_session, ws_id, auth, environment, source_type, source_ref, session_data)
+
+
+def _create_session(ws_id, auth, environment, source_type, source_ref, session_data):
+    """Reopen the matching session, or create one."""
     conn = get_conn()
     try:
         with conn.cursor() as cur:
@@ -250,7 +256,7 @@ async def update_session(ws_id: str, session_id: str, request: Request, auth=Dep
     if isinstance(auth, JSONResponse):
         return auth
 
-    role_err = require_role(ws_id, auth, Role.ANALYST)
+    role_err = await require_role_async(ws_id, auth, Role.ANALYST)
     if role_err:
         return role_err
 
@@ -262,6 +268,11 @@ async def update_session(ws_id: str, session_id: str, request: Request, auth=Dep
             content=error_envelope("VALIDATION_ERROR", "Invalid JSON body"),
         )
 
+    return await asyncio.to_thread(_update_session, ws_id, session_id, auth, body)
+
+
+def _update_session(ws_id, session_id, auth, body):
+    """Apply the body's changes to a session owned by the caller."""
     conn = get_conn()
     try:
         with conn.cursor() as cur:
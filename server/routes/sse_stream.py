@@ -1,3 +1,4 @@
+import asyncio
 import json
 import logging
 import time
@@ -7,7 +8,7 @@ from fastapi import APIRouter, Depends, Request, Query
 from fastapi.responses import JSONResponse
 from sse_starlette.sse import EventSourceResponse
 
-from server.db import get_conn, put_conn
+from server import db_async
 from server.api_v25 import error_envelope
 from server.auth import AuthClass, require_auth
 
@@ -33,21 +34,20 @@ def _row_to_dict(row, columns):
     return d
 
 
-def _sse_event_generator(ws_id, last_event_id, auth_user_id):
+async def _sse_event_generator(ws_id, last_event_id, auth_user_id):
     last_id = last_event_id or ""
     poll_interval = 2
 
     while True:
-        conn = get_conn()
         try:
-            with conn.cursor() as cur:
+            async with db_async.cursor() as cur:
                 if last_id:
-                    cur.execute(
+                    await cur.execute(
                         "SELECT %s FROM audit_events WHERE workspace_id = %%s AND id > %%s ORDER BY id ASC LIMIT 50" % AUDIT_SELECT,
                         (ws_id, last_id),
                     )
                 else:
-                    cur.execute(
+                    await cur.execute(
                         "SELECT %s FROM audit_events WHERE workspace_id = %%s ORDER BY id DESC LIMIT 10" % AUDIT_SELECT,
                         (ws_id,),
                     )
@@ -57,13 +57,8 @@ def _sse_event_generator(ws_id, last_event_id, auth_user_id):
                     rows = list(reversed(rows))
         except Exception as e:
             logger.error("SSE poll error: %s", e)
-            conn.rollback()
-            put_conn(conn)
-            time.sleep(poll_interval)
+            await asyncio.sleep(poll_interval)
             continue
-        finally:
-            if conn:
-                put_conn(conn)
 
         if rows:
             for row in rows:
@@ -95,7 +90,7 @@ def _sse_event_generator(ws_id, last_event_id, auth_user_id):
                 }
 
         yield {"event": "heartbeat", "data": json.dumps({"ts": int(time.time())})}
-        time.sleep(poll_interval)
+        await asyncio.sleep(poll_interval)
 
 
 def _infer_resource_type(event_type):
@@ -126,17 +121,13 @@ async def sse_event_stream(
     if isinstance(auth, JSONResponse):
         return auth
 
-    conn = get_conn()
-    try:
-        with conn.cursor() as cur:
-            cur.execute("SELECT id FROM workspaces WHERE id = %s AND deleted_at IS NULL", (ws_id,))
-            if not cur.fetchone():
-                return JSONResponse(
-                    status_code=404,
-                    content=error_envelope("NOT_FOUND", "Workspace not found: %s" % ws_id),
-                )
-    finally:
-        put_conn(conn)
+    async with db_async.cursor() as cur:
+        await cur.execute("SELECT id FROM workspaces WHERE id = %s AND deleted_at IS NULL", (ws_id,))
+        if not cur.fetchone():
+            return JSONResponse(
+                status_code=404,
+                content=error_envelope("NOT_FOUND", "Workspace not found: %s" % ws_id),
+            )
 
     last_event_id = request.headers.get("Last-Event-ID")
 
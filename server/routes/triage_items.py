@@ -5,7 +5,8 @@ from datetime import datetime, timezone
 from fastapi import APIRouter, Depends, Query, Request
 from fastapi.responses import JSONResponse
 
-from server.db import get_conn, put_conn
+from server import db_async
+from server.db import PoolExhausted, get_conn, put_conn
 from server.ulid import generate_id
 from server.api_v25 import envelope, collection_envelope, error_envelope
 from server.auth import AuthClass, require_auth
@@ -38,7 +39,7 @@ def _row_to_dict(row, columns):
 
 
 @router.get("/batches/{bat_id}/triage-items")
-def list_triage_items(
+async def list_triage_items(
     bat_id: str,
     cursor: str = Query(None),
     limit: int = Query(50, ge=1, le=200),
@@ -48,10 +49,9 @@ def list_triage_items(
     if isinstance(auth, JSONResponse):
         return auth
 
-    conn = get_conn()
     try:
-        with conn.cursor() as cur:
-            cur.execute(
+        async with db_async.cursor() as cur:
+            await cur.execute(
                 "SELECT id, workspace_id FROM batches WHERE id = %s AND deleted_at IS NULL",
                 (bat_id,),
             )
@@ -75,7 +75,7 @@ def list_triage_items(
             sql = "SELECT %s FROM triage_items %s ORDER BY id ASC LIMIT %%s" % (TRIAGE_SELECT, where)
             params.append(limit + 1)
 
-            cur.execute(sql, params)
+            await cur.execute(sql, params)
             rows = cur.fetchall()
 
         has_more = len(rows) > limit
@@ -86,12 +86,11 @@ def list_triage_items(
         next_cursor = items[-1]["id"] if items and has_more else None
 
         return collection_envelope(items, cursor=next_cursor, has_more=has_more, limit=limit)
+    except PoolExhausted:
+        raise
     except Exception as e:
         logger.error("list_triage_items error: %s", e)
-        conn.rollback()
         return JSONResponse(status_code=500, content=error_envelope("INTERNAL", str(e)))
-    finally:
-        put_conn(conn)
 
 
 @router.post("/batches/{bat_id}/triage-items", status_code=201)
@@ -5,7 +5,8 @@ from datetime import datetime, timezone
 from fastapi import APIRouter, Depends, Query, Request
 from fastapi.responses import JSONResponse
 
-from server.db import get_conn, put_conn
+from server import db_async
+from server.db import PoolExhausted, get_conn, put_conn
 from server.ulid import generate_id
 from server.api_v25 import envelope, collection_envelope, error_envelope
 from server.auth import AuthClass, require_auth, require_role, Role
@@ -36,7 +37,7 @@ WS_SELECT = ", ".join(WS_COLUMNS)
 
 
 @router.get("/workspaces")
-def list_workspaces(
+async def list_workspaces(
     request: Request,
     cursor: str = Query(None),
     limit: int = Query(50, ge=1, le=200),
@@ -46,9 +47,8 @@ def list_workspaces(
     if isinstance(auth, JSONResponse):
         return auth
 
-    conn = get_conn()
     try:
-        with conn.cursor() as cur:
+        async with db_async.cursor() as cur:
             conditions = []
             params = []
 
@@ -62,7 +62,7 @@ def list_workspaces(
             sql = "SELECT %s FROM workspaces %s ORDER BY id ASC LIMIT %%s" % (WS_SELECT, where)
             params.append(limit + 1)
 
-            cur.execute(sql, params)
+            await cur.execute(sql, params)
             rows = cur.fetchall()
 
         has_more = len(rows) > limit
@@ -73,12 +73,11 @@ def list_workspaces(
         next_cursor = items[-1]["id"] if items and has_more else None
 
         return collection_envelope(items, cursor=next_cursor, has_more=has_more, limit=limit)
+    except PoolExhausted:
+        raise
     except Exception as e:
         logger.error("list_workspaces error: %s", e)
-        conn.rollback()
         return JSONResponse(status_code=500, content=error_envelope("INTERNAL", str(e)))
-    finally:
-        put_conn(conn)
 
 
 @router.post("/workspaces", status_code=201)